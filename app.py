@@ -1,16 +1,357 @@
-import plotly.express as px
 import streamlit as st
 
 import asyncio
+import os
+import time
 import pandas as pd
 import numpy as np
 
-from utils.parsing import parse_job, get_key_words
-from utils.processing import flatten, merge_entries, process_dataframe
-from utils.summarization import summarize
+from utils.parsing import AREA, CrawlStats, iter_pages, get_key_words
+from utils.cache import get_response_cache, get_result_cache, query_key
+from utils.processing import process_page, concat_chunks
+from utils.stats import COUNT_COLUMNS, Aggregates, aggregate
+from utils.geo import RAW_POINTS_LIMIT, bin_points, cell_size, coordinates, fit_zoom
+from utils.history import ALL_LEVELS, TREND_DAYS, get_snapshot_store
+from utils.skills import SkillReport, skill_report
+from utils.metrics import PROFILE_QUERY, PROFILER, PROFILERS, export, profile, span
+
+RENDER_INTERVAL = 1.5
+# Промежуточной отрисовке нужны только координаты, зарплата и счетчики графиков.
+PROGRESS_COLUMNS = ["address_lat", "address_lng", "salary", *COUNT_COLUMNS]
+JOB_POLL_INTERVAL = 0.5
+JOB_STAGES = {
+    "queued": "Задача в очереди на суммаризацию…",
+    "running": "Загружаем модели…",
+    "clusterize": "Кластеризуем навыки и обязанности…",
+    "paraphrase": "Перефразируем выжимки…",
+}
+MODEL_WARM_UP = os.environ.get("MODEL_WARM_UP", "1") == "1"
+
+
+@st.cache_resource
+def start_model_warm_up():
+    # Модели живут в процессах пула задач: пустая задача поднимает воркеры,
+    # и веса грузятся, пока пользователь вводит запрос и смотрит графики.
+    from utils.jobs import get_job_manager
+
+    return get_job_manager().submit("warm_up")
+
+
+def render_overview(stats: Aggregates):
+    import plotly.express as px
+
+    # Графики строятся по маленьким таблицам из utils.stats,
+    # в браузер уходят агрегаты, а не все строки выборки.
+    st.markdown("### График работы")
+    counts = stats.counts["schedule_name"]
+    fig = px.pie(names=counts.index, values=counts.values, title='Распределение вакансий по графику работы')
+    st.plotly_chart(fig)
+
+    st.markdown("### Опыт работы")
+    counts = stats.counts["experience_name"]
+    fig = px.pie(names=counts.index, values=counts.values, title='Распределение вакансий по требуемому опыту работы')
+    st.plotly_chart(fig)
+
+    st.markdown("### Занятость")
+    counts = stats.counts["employment_name"]
+    fig = px.pie(names=counts.index, values=counts.values, title='Распределение вакансий по занятости')
+    st.plotly_chart(fig)
+
+    st.markdown("### Указана ли зарплата?")
+    counts = stats.counts["is_salary_set"]
+    fig = px.bar(x=counts.index, y=counts.values)
+    fig.update_layout(xaxis_title='Указана ли зарплата?', yaxis_title='Количество вакансий')
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def render_salaries(stats: Aggregates):
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    st.markdown("### Распределение зарплат")
+    if stats.salary.empty:
+        st.markdown("Ни в одной вакансии не указана зарплата.")
+        return
+
+    st.markdown("**Общее распределение зарплат**")
+    st.markdown(f"- Медианная зарплата для этой професии составляет: {int(stats.overall['median'])} рублей.")
+    st.markdown(f"- Средняя зарплата для этой професии составляет: {int(stats.overall['mean'])} рублей.")
+
+    fig = px.bar(stats.overall_histogram, x='salary', y='count')
+    fig.update_traces(width=stats.bin_width)
+    fig.update_layout(xaxis_title='Зарплата', yaxis_title='Количество вакансий', bargap=0)
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.markdown("**Распределение зарплат по опыту работы**")
+    for skill_level, row in stats.salary.iterrows():
+        st.markdown(f"**{skill_level}**:")
+        st.markdown(f"- Медианная зарплата для этой профессии составляет: {int(row['median'])} рублей.")
+        st.markdown(f"- Средняя зарплата для этой профессии составляет: {int(row['mean'])} рублей.")
+
+    fig = px.bar(stats.histogram, x='salary', y='count', color='experience_name', title='Распределение зарплаты')
+    fig.update_traces(width=stats.bin_width)
+    fig.update_layout(xaxis_title='Зарплата', yaxis_title='Количество вакансий', legend_title="Опыт работы", bargap=0)
+    st.plotly_chart(fig, use_container_width=True)
+
+    levels = stats.salary.index.tolist()
+    fig = go.Figure(
+        go.Box(
+            x=levels,
+            q1=stats.salary["q1"],
+            median=stats.salary["median"],
+            q3=stats.salary["q3"],
+            lowerfence=stats.salary["lowerfence"],
+            upperfence=stats.salary["upperfence"],
+            mean=stats.salary["mean"],
+        )
+    )
+    fig.update_layout(
+        title="Разброс зарплаты в зависимости от опыта работы", xaxis_title='Опыт работы', yaxis_title='Зарплата'
+    )
+    fig.update_xaxes(categoryorder='array', categoryarray=levels)
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def render_trends(key: str):
+    import plotly.express as px
+
+    # Тренды читаются из дневных агрегатов истории, сырые снимки не загружаются.
+    history = get_snapshot_store()
+    salary = history.trend(key, "median", TREND_DAYS)
+    if len(salary) < 2:
+        st.markdown("История появится, когда этот запрос будет выполнен хотя бы в два разных дня.")
+        return
+
+    demand = history.trend(key, "vacancies", TREND_DAYS)
+    fig = px.line(demand, y=ALL_LEVELS, markers=True, title=f"Число вакансий за {TREND_DAYS} дней")
+    fig.update_layout(xaxis_title='Дата', yaxis_title='Количество вакансий')
+    st.plotly_chart(fig, use_container_width=True)
+
+    fig = px.line(salary, markers=True, title="Медианная зарплата по опыту работы")
+    fig.update_layout(xaxis_title='Дата', yaxis_title='Зарплата', legend_title="Опыт работы")
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def render_skills(report: SkillReport, top: int = 15):
+    import plotly.express as px
+
+    if report.frequencies.empty:
+        st.markdown("В описаниях вакансий не нашлось навыков из словаря.")
+        return
+
+    st.markdown("### Навыки из описаний вакансий")
+    shares = report.shares.head(top)
+    levels = [level for level in shares.columns if level != ALL_LEVELS and report.vacancies[level] > 0]
+    table = shares[levels].rename_axis("skill").reset_index().melt(
+        id_vars="skill", var_name="experience_name", value_name="share"
+    )
+    fig = px.bar(table, x="share", y="skill", color="experience_name", barmode="group", orientation="h")
+    fig.update_layout(
+        xaxis_title='Доля вакансий', yaxis_title='', legend_title="Опыт работы", xaxis_tickformat=".0%"
+    )
+    fig.update_yaxes(categoryorder='array', categoryarray=shares.index[::-1])
+    st.plotly_chart(fig, use_container_width=True)
+
+    names = report.frequencies.index[:top]
+    fig = px.imshow(report.cooccurrence.loc[names, names], title="Какие навыки упоминаются вместе")
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def render_summaries(summaries: dict):
+    for skill_level, summary in summaries.items():
+        st.write(f"{skill_level}:")
+        if len(summary) == 0:
+            st.markdown("\tНет данных =(")
+            continue
+        for sentence in summary:
+            st.markdown(f"- {sentence}")
+
+
+def render_map(df: pd.DataFrame, map_area):
+    if len(df) <= RAW_POINTS_LIMIT:
+        map_area.map(df, latitude="address_lat", longitude="address_lng")
+        return
+
+    import pydeck as pdk
+
+    # Много точек: в браузер уходят ячейки сетки с числом вакансий, а не сами точки.
+    cells = bin_points(df)
+    cells["radius"] = cell_size(cells.attrs["level"]) / 2 * np.sqrt(cells["count"] / cells["count"].max())
+    cells["salary_label"] = cells["median_salary"].map(
+        lambda salary: "не указана" if np.isnan(salary) else f"{int(salary)} руб."
+    )
+    layer = pdk.Layer(
+        "ScatterplotLayer",
+        cells.drop(columns="median_salary"),
+        get_position=["lng", "lat"],
+        get_radius="radius",
+        radius_min_pixels=2,
+        get_fill_color=[255, 75, 75, 160],
+        pickable=True,
+    )
+    lat, lng, _ = coordinates(df)
+    view = pdk.ViewState(latitude=float(np.median(lat)), longitude=float(np.median(lng)), zoom=fit_zoom(lat, lng))
+    map_area.pydeck_chart(
+        pdk.Deck(
+            layers=[layer],
+            initial_view_state=view,
+            tooltip={"text": "Вакансий: {count}\nМедианная зарплата: {salary_label}"},
+        )
+    )
+
+
+def append_progress(progress: pd.DataFrame, chunks: list[pd.DataFrame]) -> pd.DataFrame:
+    # Промежуточная таблица дополняется только новыми кусками и узкими колонками,
+    # без повторной категоризации и сортировки всей выборки.
+    parts = [
+        chunk[[column for column in PROGRESS_COLUMNS if column in chunk.columns]] for chunk in chunks if not chunk.empty
+    ]
+    if not progress.empty:
+        parts.insert(0, progress)
+    return pd.concat(parts, ignore_index=True) if parts else progress
+
+
+def render_progress(df: pd.DataFrame, status, map_area, overview_area):
+    status.markdown(f":hourglass_flowing_sand: Загружено {df.shape[0]} вакансий…")
+    render_map(df, map_area)
+    with overview_area.container():
+        render_overview(aggregate(df))
+
+
+async def crawl(
+    job_query: str, key: str, crawl_stats: CrawlStats, response_cache, status, map_area, overview_area
+) -> pd.DataFrame:
+    # Сырая страница сразу уходит в кэш результатов, в памяти остаются
+    # только обработанные куски таблицы.
+    result_cache = get_result_cache()
+    chunks, pending = [], []
+    progress = pd.DataFrame()
+    started_at = time.time()
+    rendered_at = time.monotonic()
+    status.markdown(":hourglass_flowing_sand: Выполняется поиск вакансий…")
+    async for page in iter_pages(
+        job_query, number_of_pages=100, stats=crawl_stats, cache=response_cache
+    ):
+        result_cache.put_page(key, len(chunks), page)
+        chunks.append(process_page(page))
+        pending.append(chunks[-1])
+        if time.monotonic() - rendered_at > RENDER_INTERVAL:
+            progress, pending = append_progress(progress, pending), []
+            if not progress.empty:
+                render_progress(progress, status, map_area, overview_area)
+            rendered_at = time.monotonic()
+    del progress, pending
+    vacancies = concat_chunks(chunks)
+    if not vacancies.empty:
+        result_cache.finish_pages(key, len(chunks), started_at)
+    return vacancies
+
+
+def cached_pages(key: str) -> pd.DataFrame:
+    pages = get_result_cache().pages(key)
+    if pages is None:
+        return None
+    try:
+        return concat_chunks([process_page(page) for page in pages])
+    except KeyError:
+        return None
+
+
+async def load_vacancies(job_query: str, crawl_stats: CrawlStats, response_cache, status, map_area, overview_area):
+    # Слои проверяются от дешевого к дорогому: готовая таблица, сырые страницы, обход API.
+    # Одинаковый запрос из другой сессии не блокирует поток: он опрашивает кэш,
+    # пока первая сессия обходит API.
+    result_cache = get_result_cache()
+    key = query_key(job_query, AREA)
+    while True:
+        vacancies = result_cache.get("frame", key)
+        if vacancies is not None:
+            return vacancies, True
+        with result_cache.lead(key) as leader:
+            if leader:
+                vacancies = result_cache.get("frame", key)
+                if vacancies is not None:
+                    return vacancies, True
+                vacancies = cached_pages(key)
+                from_cache = vacancies is not None
+                if not from_cache:
+                    vacancies = await crawl(
+                        job_query, key, crawl_stats, response_cache, status, map_area, overview_area
+                    )
+                if not vacancies.empty:
+                    result_cache.put("frame", key, vacancies)
+                return vacancies, from_cache
+        status.markdown(":hourglass_flowing_sand: Такой же поиск уже выполняется в другой сессии, ждем его результат…")
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+
+
+async def load_summaries(job_query: str, df: pd.DataFrame, progress_area, summaries_area):
+    # Суммаризация идет в пуле процессов, страница только опрашивает задачу
+    # и показывает прогресс и уже готовые выжимки.
+    from utils.jobs import QueueFull, get_job_manager
+
+    result_cache = get_result_cache()
+    key = query_key(job_query, AREA)
+    summaries = result_cache.get("summaries", key)
+    if summaries is not None:
+        return summaries, None, None
+
+    # Повторная отправка с тем же key возвращает уже идущую задачу, так что
+    # вторая сессия опрашивает общую задачу и показывает тот же прогресс.
+    try:
+        job = get_job_manager().submit(
+            "summarize_groups",
+            df,
+            "experience_name",
+            ["snippet_requirement", "snippet_responsibility"],
+            n_clusters=3,
+            key=key,
+        )
+    except QueueFull:
+        progress_area.markdown(":x: Сервер занят суммаризацией других запросов, попробуйте позже.")
+        return None, None, None
+
+    shown = None
+    while not job.finished:
+        stage = JOB_STAGES.get(job.stage, job.stage)
+        counter = f" {job.done}/{job.total}" if job.total else ""
+        progress_area.markdown(f":hourglass_flowing_sand: {stage}{counter}")
+        if job.partial is not None and job.partial is not shown:
+            with summaries_area.container():
+                render_all_summaries(job.partial)
+            shown = job.partial
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+
+    try:
+        summaries, paraphrase_stats, embedding_stats = job.result()
+    except Exception as error:
+        # Ошибка модели или упавший воркер: пул пересоздается при следующей задаче.
+        progress_area.empty()
+        st.error(f"Не удалось построить выжимки: {error!r}")
+        return None, None, None
+    result_cache.put("summaries", key, summaries)
+    return summaries, paraphrase_stats, embedding_stats
+
+
+def render_all_summaries(summaries: dict):
+    st.markdown("### Необходимые навыки")
+    render_summaries(summaries["snippet_requirement"])
+
+    st.markdown("### Обязанности")
+    render_summaries(summaries["snippet_responsibility"])
+
+
+def search_profiler() -> str:
+    # ?profile=cprofile или ?profile=pyinstrument в адресе страницы профилирует
+    # этот поиск, если оператор разрешил это через HH_PROFILE_QUERY=1.
+    profiler = st.query_params.get("profile") if PROFILE_QUERY else None
+    return profiler if profiler in PROFILERS else PROFILER
 
 
 async def main():
+    if MODEL_WARM_UP:
+        start_model_warm_up()
+
     st.title(":male-technologist: Анали вакансий hh.ru")
 
     st.header("Поиск вакансий", divider=True)
@@ -27,104 +368,105 @@ async def main():
     find_job_button = st.button("Найти вакансии")
 
     if find_job_button:
-        job_query = jobs
-        if not advanced_search:
-            jobs = list(map(lambda x: x.strip(), jobs.split(',')))
-            job_query = get_key_words(jobs)
-        
-        with st.spinner("Выполняется поиск вакансий…"):
-            data = await parse_job(job_query, number_of_pages=100)
-            flatten_data = list(map(flatten, data))
-            merged_entries = merge_entries(flatten_data)
-            df = pd.DataFrame(merged_entries)
-            df = process_dataframe(df.copy())
-            
-        st.markdown(f":white_check_mark: Было найдено {df.shape[0]} вакансий!")
-
-        st.header("Вакансии на карте", divider=True)
-        st.map(df, latitude="address_lat", longitude="address_lng")
-
-        st.header("Профессия в графиках", divider=True)
-        
-        st.markdown("### График работы")
-        fig = px.pie(df, names='schedule_name', title='Распределение вакансий по графику работы')
-        st.plotly_chart(fig)
-
-        st.markdown("### Опыт работы")
-        fig = px.pie(df, names='experience_name', title='Распределение вакансий по требуемому опыту работы')
-        st.plotly_chart(fig)
-
-        st.markdown("### Занятость")
-        fig = px.pie(df, names='employment_name', title='Распределение вакансий по занятости')
-        st.plotly_chart(fig)
-    
-        st.markdown("### Указана ли зарплата?")
-        fig = px.histogram(df, x='is_salary_set')
-        fig.update_layout(xaxis_title='Указана ли зарплата?', yaxis_title='Количество вакансий')
-        st.plotly_chart(fig, use_container_width=True)
-
-        st.markdown("### Распределение зарплат")
-        
-        salary_df = df[df['salary'] > 0]
-
-        st.markdown("**Общее распределение зарплат**")
-        mid_salary = int(np.median(salary_df['salary']))
-        mean_salary = int(np.mean(salary_df['salary']))
-        st.markdown(f"- Медианная зарплата для этой професии составляет: {mid_salary} рублей.")
-        st.markdown(f"- Средняя зарплата для этой професии составляет: {mean_salary} рублей.")
-        
-        fig = px.histogram(salary_df, x='salary')
-        fig.update_layout(xaxis_title='Зарплата', yaxis_title='Количество вакансий')
-        st.plotly_chart(fig, use_container_width=True)
-
-        st.markdown("**Распределение зарплат по опыту работы**")
-        for skill_level in df['experience_name'].unique():
-            skill_level_data = df[(df['experience_name'] == skill_level) & (df['salary'] > 0)]
-            if not skill_level_data.empty:
-                mid_salary = int(np.median(skill_level_data['salary']))
-                mean_salary = int(np.mean(skill_level_data['salary']))
-                st.markdown(f"**{skill_level}**:")
-                st.markdown(f"- Медианная зарплата для этой профессии составляет: {mid_salary} рублей.")
-                st.markdown(f"- Средняя зарплата для этой профессии составляет: {mean_salary} рублей.")
-
-        experience_uniques = salary_df['experience_name'].unique()
-        fig = px.histogram(df[df['salary'] > 0], x='salary', color='experience_name', title='Распределение зарплаты')
-        fig.update_layout(xaxis_title='Зарплата', yaxis_title='Количество вакансий', legend_title="Опыт работы")
-        fig.update_xaxes(categoryorder='array', categoryarray=experience_uniques)
-        st.plotly_chart(fig, use_container_width=True)
-        
-        fig = px.box(salary_df, y='salary', x='experience_name', title="Разброс зарплаты в зависимости от опыта работы")
-        fig.update_layout(xaxis_title='Опыт работы', yaxis_title='Зарплата')
-        fig.update_xaxes(categoryorder='array', categoryarray=experience_uniques)
-        st.plotly_chart(fig, use_container_width=True)
-
-        st.header("Навыки и обязанности", divider=True)
-
-        st.markdown("### Необходимые навыки")
-        with st.spinner("Собираем данные по навыкам…"):
-            for skill_level in df['experience_name'].unique():
-                requirements = df[df['experience_name'] == skill_level]['snippet_requirement'].dropna()
-                st.write(f"{skill_level}:")
-                if len(requirements) == 0:
-                    st.markdown("\tНет данных =(")
-                    continue
-                else:
-                    requirements_summary = summarize(requirements, n_clusters=3)
-                    for requirement in requirements_summary:
-                        st.markdown(f"- {requirement}") 
-
-        st.markdown("### Обязанности")
-        with st.spinner("Собираем данные по обязанностям…"):
-            for skill_level in df['experience_name'].unique():
-                st.write(f"{skill_level}:")
-                responsibilities = df[df['experience_name'] == skill_level]['snippet_responsibility'].dropna()
-                if len(responsibilities) == 0:
-                    st.markdown("\tНет данных =(")
-                    continue
-                else:
-                    responsibility_summary = summarize(responsibilities, n_clusters=3)
-                    for responsibility in responsibility_summary:
-                        st.markdown(f"- {responsibility}") 
+        with profile("search", search_profiler()):
+            with span("search"):
+                await search(jobs, advanced_search)
+        export()
+
+
+async def search(jobs: str, advanced_search: bool):
+    from utils.dedup import deduplicate
+    from utils.jobs import get_job_manager
+
+    job_query = jobs
+    if not advanced_search:
+        jobs = list(map(lambda x: x.strip(), jobs.split(',')))
+        job_query = get_key_words(jobs)
+
+    status = st.empty()
+    caption = st.empty()
+    st.header("Вакансии на карте", divider=True)
+    map_area = st.empty()
+    st.header("Профессия в графиках", divider=True)
+    overview_area = st.empty()
+
+    crawl_stats = CrawlStats()
+    response_cache = get_response_cache()
+    with span("load_vacancies"):
+        vacancies, from_cache = await load_vacancies(
+            job_query, crawl_stats, response_cache, status, map_area, overview_area
+        )
+    if vacancies.empty:
+        status.markdown(":x: Не удалось найти вакансии по этому запросу.")
+        return
+
+    # Копии одной вакансии (репосты, разные города) остаются на карте,
+    # но не раздувают статистику и выжимки.
+    with span("deduplicate"):
+        df, _ = deduplicate(vacancies)
+    status.markdown(
+        f":white_check_mark: Было найдено {vacancies.shape[0]} вакансий, "
+        f"из них уникальных: {df.shape[0]}!"
+    )
+    if from_cache:
+        caption.caption("Результат взят из общего кэша запросов.")
+    else:
+        caption.caption(
+            f"Запросов к API: {crawl_stats.requests}, "
+            f"сэкономлено по сравнению с фиксированным обходом: {crawl_stats.saved_requests}, "
+            f"скорость: {crawl_stats.requests_per_second:.1f} запросов/с, "
+            f"потеряно страниц: {crawl_stats.lost_pages}, "
+            f"попаданий в кэш: {crawl_stats.cache_hits}/{crawl_stats.cache_hits + crawl_stats.cache_misses}"
+        )
+    with span("render_map"):
+        render_map(vacancies, map_area)
+    with span("aggregate"):
+        stats = aggregate(df)
+    with overview_area.container():
+        render_overview(stats)
+
+    render_salaries(stats)
+
+    # Снимок за день пишется после свежего обхода или если его еще нет;
+    # сохраняются уникальные вакансии, по которым посчитаны агрегаты.
+    history = get_snapshot_store()
+    key = query_key(job_query, AREA)
+    if not from_cache or not history.has(key):
+        history.save(key, df, stats)
+    st.header("Динамика", divider=True)
+    render_trends(key)
+
+    st.header("Навыки и обязанности", divider=True)
+    # Словарные навыки считаются за секунды и видны до выжимок языковой модели.
+    with span("skills"):
+        report = skill_report(df)
+    render_skills(report)
+
+    progress_area = st.empty()
+    summaries_area = st.empty()
+    with span("summaries"):
+        summaries, paraphrase_stats, embedding_stats = await load_summaries(
+            job_query, df, progress_area, summaries_area
+        )
+    if summaries is None:
+        return
+    progress_area.empty()
+    with summaries_area.container():
+        render_all_summaries(summaries)
+
+    if paraphrase_stats is not None:
+        st.caption(
+            f"Перефразирование: {paraphrase_stats.latency_per_summary:.1f} с на выжимку, "
+            f"{paraphrase_stats.tokens_per_second:.1f} токенов/с, "
+            f"из кэша {paraphrase_stats.cached} из {paraphrase_stats.sentences}"
+        )
+    job_stats = get_job_manager().stats()
+    st.caption(
+        f"Очередь суммаризации: {job_stats['queued']} в ожидании, {job_stats['running']} в работе, "
+        f"среднее ожидание {job_stats['mean_wait']:.1f} с, средняя длительность {job_stats['mean_latency']:.1f} с"
+    )
+    if embedding_stats is not None:
+        st.caption(f"Попаданий в кэш эмбеддингов: {embedding_stats['hit_rate']:.0%}")
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main()) 
@@ -0,0 +1,88 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate_items
+from utils.processing import process_page
+from utils.stats import aggregate
+
+
+def legacy_figures(df: pd.DataFrame) -> list:
+    # Графики в том виде, в каком их строил app.py до utils.stats: по сырым строкам.
+    import plotly.express as px
+
+    figures = [
+        px.pie(df, names="schedule_name"),
+        px.pie(df, names="experience_name"),
+        px.pie(df, names="employment_name"),
+        px.histogram(df, x="is_salary_set"),
+    ]
+    salary_df = df[df["salary"] > 0]
+    int(np.median(salary_df["salary"]))
+    int(np.mean(salary_df["salary"]))
+    figures.append(px.histogram(salary_df, x="salary"))
+    for skill_level in df["experience_name"].unique():
+        level_data = df[(df["experience_name"] == skill_level) & (df["salary"] > 0)]
+        if not level_data.empty:
+            int(np.median(level_data["salary"]))
+            int(np.mean(level_data["salary"]))
+    figures.append(px.histogram(df[df["salary"] > 0], x="salary", color="experience_name"))
+    figures.append(px.box(salary_df, y="salary", x="experience_name"))
+    return figures
+
+
+def aggregated_figures(df: pd.DataFrame) -> list:
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    stats = aggregate(df)
+    figures = [
+        px.pie(names=stats.counts[column].index, values=stats.counts[column].values)
+        for column in ["schedule_name", "experience_name", "employment_name"]
+    ]
+    figures.append(px.bar(x=stats.counts["is_salary_set"].index, y=stats.counts["is_salary_set"].values))
+    figures.append(px.bar(stats.overall_histogram, x="salary", y="count"))
+    figures.append(px.bar(stats.histogram, x="salary", y="count", color="experience_name"))
+    figures.append(
+        go.Figure(
+            go.Box(
+                x=stats.salary.index.tolist(),
+                q1=stats.salary["q1"],
+                median=stats.salary["median"],
+                q3=stats.salary["q3"],
+                lowerfence=stats.salary["lowerfence"],
+                upperfence=stats.salary["upperfence"],
+            )
+        )
+    )
+    return figures
+
+
+def measure(build, df: pd.DataFrame) -> tuple[float, int]:
+    # Время включает сериализацию в JSON: именно ее st.plotly_chart отправляет в браузер.
+    started = time.perf_counter()
+    payload = sum(len(figure.to_json()) for figure in build(df))
+    return time.perf_counter() - started, payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Построение графиков по сырым строкам и по агрегатам")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000])
+    args = parser.parse_args()
+
+    # Прогрев: импорт plotly и шаблонов не должен попасть в первое измерение.
+    measure(legacy_figures, process_page(generate_items(100)))
+    for size in args.sizes:
+        df = process_page(generate_items(size))
+        legacy_time, legacy_payload = measure(legacy_figures, df)
+        aggregated_time, aggregated_payload = measure(aggregated_figures, df)
+        print(
+            f"{size:>9} вакансий: до {legacy_time:.2f}s / {legacy_payload / 1024:,.0f} КБ, "
+            f"после {aggregated_time:.2f}s / {aggregated_payload / 1024:,.0f} КБ"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import resource
+import time
+from multiprocessing import get_context
+
+import aiohttp
+import numpy as np
+
+from benchmarks.hh_stub import HOST, add_arguments, config_from_args, make_app
+from utils import parsing
+from utils.parsing import CrawlStats, parse_job
+from utils.ratelimit import RateLimiter
+
+
+def serve(config, port_queue):
+    # Заглушка живет в отдельном процессе, чтобы ее JSON не делил event loop с обходчиком.
+    from aiohttp import web
+
+    async def start():
+        runner = web.AppRunner(make_app(config))
+        await runner.setup()
+        site = web.TCPSite(runner, HOST, 0)
+        await site.start()
+        port_queue.put(runner.addresses[0][1])
+        await asyncio.Event().wait()
+
+    asyncio.run(start())
+
+
+def trace_latencies(latencies: list, statuses: list) -> aiohttp.TraceConfig:
+    # Задержка каждого HTTP-запроса, включая повторы, без правок в parsing.py.
+    trace = aiohttp.TraceConfig()
+
+    async def on_start(session, context, params):
+        context.started = time.perf_counter()
+
+    async def on_end(session, context, params):
+        latencies.append(time.perf_counter() - context.started)
+        statuses.append(params.response.status)
+
+    trace.on_request_start.append(on_start)
+    trace.on_request_end.append(on_end)
+    return trace
+
+
+async def crawl(concurrency: int, rate: float) -> dict:
+    latencies, statuses = [], []
+    stats = CrawlStats()
+    # Потолок параллельности фиксирован, ниже него лимитер адаптируется сам.
+    limiter = RateLimiter(rate=rate, burst=concurrency, concurrency=concurrency, max_concurrency=concurrency)
+    started = time.perf_counter()
+    async with aiohttp.ClientSession(trace_configs=[trace_latencies(latencies, statuses)]) as session:
+        items = await parse_job("python", stats=stats, limiter=limiter, session=session)
+    elapsed = time.perf_counter() - started
+    statuses = np.array(statuses)
+    return {
+        "elapsed": elapsed,
+        "items": len(items),
+        "found": stats.found,
+        "pages": int((statuses == 200).sum()),
+        "requests": len(statuses),
+        "throttled": int((statuses == 429).sum()),
+        "errors": int((statuses >= 500).sum()),
+        "lost_pages": stats.lost_pages,
+        "latency": np.percentile(latencies, [50, 95, 99]) if latencies else np.zeros(3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест обходчика на локальной заглушке API")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--rate", type=float, default=1000.0, help="лимит запросов/с (у hh.ru около 10)")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    context = get_context("spawn")
+    port_queue = context.Queue()
+    server = context.Process(target=serve, args=(config_from_args(args), port_queue), daemon=True)
+    server.start()
+    try:
+        parsing.API_URL = f"http://{HOST}:{port_queue.get(timeout=300)}/vacancies"
+        for concurrency in args.concurrency:
+            result = asyncio.run(crawl(concurrency, args.rate))
+            p50, p95, p99 = result["latency"] * 1000
+            print(
+                f"{concurrency:>3} потоков: {result['elapsed']:.2f}s, {result['pages'] / result['elapsed']:.1f} страниц/с, "
+                f"задержка p50/p95/p99 {p50:.0f}/{p95:.0f}/{p99:.0f} мс, "
+                f"запросов {result['requests']} (429: {result['throttled']}, 5xx: {result['errors']}), "
+                f"потеряно страниц {result['lost_pages']}, вакансий {result['items']} из {result['found']}, "
+                f"пик RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} МБ"
+            )
+    finally:
+        server.terminate()
+        server.join()
+
+
+if __name__ == "__main__":
+    main()
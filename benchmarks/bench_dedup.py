@@ -0,0 +1,64 @@
+import argparse
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import REQUIREMENTS, RESPONSIBILITIES, TITLES
+from utils.dedup import deduplicate
+
+WORDS = ["Python", "Go", "SQL", "Kafka", "Spark", "Airflow", "FastAPI", "Django", "ClickHouse", "Linux"]
+
+
+def snippets(size: int, repost_share: float, seed: int = 0) -> tuple[pd.DataFrame, np.ndarray]:
+    # Каждая "оригинальная" вакансия получает уникальный хвост из слов, а репосты
+    # копируют оригинал с новым id и одной мелкой правкой, как при перепубликации.
+    rng = random.Random(seed)
+    originals = int(size * (1 - repost_share))
+    rows, source = [], []
+    for idx in range(size):
+        if idx < originals:
+            tail = " ".join(rng.choices(WORDS, k=6)) + f" проект {idx}"
+            rows.append(
+                (
+                    str(idx),
+                    rng.choice(TITLES),
+                    f"{rng.choice(REQUIREMENTS)} {rng.choice(REQUIREMENTS)} {tail}",
+                    rng.choice(RESPONSIBILITIES),
+                )
+            )
+            source.append(idx)
+        else:
+            original = rng.randrange(originals)
+            vacancy_id, name, requirement, responsibility = rows[original]
+            rows.append((str(idx), name, requirement + " Удаленно.", responsibility))
+            source.append(original)
+    df = pd.DataFrame(rows, columns=["id", "name", "snippet_requirement", "snippet_responsibility"])
+    return df, np.array(source)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пропускная способность дедупликации MinHash/LSH")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--reposts", type=float, default=0.2)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        df, source = snippets(size, args.reposts)
+        started = time.perf_counter()
+        unique, mapping = deduplicate(df)
+        elapsed = time.perf_counter() - started
+
+        # Репост найден, если он попал в кластер своего оригинала.
+        reposts = np.flatnonzero(source != np.arange(size))
+        clusters = mapping["cluster"].to_numpy()
+        recall = (clusters[reposts] == clusters[source[reposts]]).mean() if len(reposts) else 1.0
+        print(
+            f"{size:>9} сниппетов: {elapsed:.2f}s, {size / elapsed:,.0f} строк/с, "
+            f"уникальных {len(unique)}, найдено репостов {recall:.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import generate_items
+from utils.processing import SELECTED_COLUMNS, compile_extractor, flatten, merge_entries, process_dataframe
+
+
+def legacy_frame(items: list[dict]) -> pd.DataFrame:
+    return pd.DataFrame(merge_entries(list(map(flatten, items))))[SELECTED_COLUMNS]
+
+
+def measure(func, *args) -> tuple[float, object]:
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="flatten + merge_entries против колоночного экстрактора")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000])
+    args = parser.parse_args()
+
+    extract = compile_extractor(SELECTED_COLUMNS)
+    for size in args.sizes:
+        items = generate_items(size)
+        legacy_time, legacy = measure(legacy_frame, items)
+        columnar_time, columnar = measure(extract, items)
+
+        pd.testing.assert_frame_equal(
+            process_dataframe(legacy).reset_index(drop=True),
+            process_dataframe(columnar).reset_index(drop=True),
+            check_dtype=False,
+        )
+        print(
+            f"{size:>9} вакансий: flatten+merge {legacy_time:.3f}s, "
+            f"экстрактор {columnar_time:.3f}s, ускорение x{legacy_time / columnar_time:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
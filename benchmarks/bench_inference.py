@@ -0,0 +1,107 @@
+import argparse
+import random
+import time
+from dataclasses import replace
+
+from benchmarks.bench_dedup import WORDS
+from benchmarks.synthetic import REQUIREMENTS, RESPONSIBILITIES
+from utils.inference import (
+    BACKENDS,
+    LLM_DTYPES,
+    InferenceConfig,
+    drift,
+    encode_texts,
+    load_encoder,
+    load_generator,
+)
+from utils.summarization import EMBEDDING_MODEL_PATH, EMBEDDING_TASK, LLM_PATH, PARAPHRASE_PROMPT
+
+# Максимальная длина jina-embeddings-v3: эталон ничего не обрезает.
+REFERENCE_LENGTH = 8192
+
+
+def sentences(size: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [
+        f"{rng.choice(REQUIREMENTS + RESPONSIBILITIES)} Опыт с {', '.join(rng.choices(WORDS, k=3))}."
+        + (" " + rng.choice(REQUIREMENTS)) * rng.randrange(4)
+        for _ in range(size)
+    ]
+
+
+def bench_encoder(args, base: InferenceConfig, texts: list[str]):
+    # Эталон - fp32 без обрезки длины; остальные бэкенды сравниваются с ним.
+    runs = [("fp32", replace(base, backend="torch", max_seq_length=REFERENCE_LENGTH))]
+    runs += [(backend, replace(base, backend=backend)) for backend in args.backends]
+    reference = None
+    for name, config in runs:
+        try:
+            model = load_encoder(EMBEDDING_MODEL_PATH, config)
+        except (ImportError, OSError, RuntimeError) as error:
+            print(f"{name:<10} недоступен: {error!r}")
+            continue
+        encode_texts(model, texts[:32], EMBEDDING_TASK, config)
+        started = time.perf_counter()
+        vectors = encode_texts(model, texts, EMBEDDING_TASK, config)
+        elapsed = time.perf_counter() - started
+        if name == "fp32":
+            reference = vectors
+        line = f"{name:<10} {len(texts) / elapsed:8.1f} предложений/с"
+        if reference is not None:
+            quality = drift(reference, vectors)
+            line += (
+                f", косинус с fp32 {quality['mean_cosine']:.4f} (мин. {quality['min_cosine']:.4f}), "
+                f"ближайший сосед совпал у {quality['neighbour_agreement']:.1%}"
+            )
+        print(line)
+        del model
+
+
+def bench_generator(args, base: InferenceConfig, texts: list[str]):
+    # Жадная генерация: расхождение с fp32 - доля отличающихся перефразировок.
+    prompts = [PARAPHRASE_PROMPT.format(text=text) for text in texts[: args.prompts]]
+    reference = None
+    for dtype in ["", *[name for name in args.llm if name]]:
+        pipe = load_generator(LLM_PATH, replace(base, llm_dtype=dtype))
+        if pipe.tokenizer.pad_token is None:
+            pipe.tokenizer.pad_token = pipe.tokenizer.eos_token
+        pipe.tokenizer.padding_side = "left"
+        started = time.perf_counter()
+        outputs = pipe(prompts, batch_size=8, max_new_tokens=64, do_sample=False, return_full_text=False)
+        elapsed = time.perf_counter() - started
+        outputs = [output[0]["generated_text"] for output in outputs]
+        tokens = sum(len(pipe.tokenizer(output)["input_ids"]) for output in outputs)
+        if reference is None:
+            reference = outputs
+        same = sum(output == expected for output, expected in zip(outputs, reference)) / len(outputs)
+        print(f"LLM {dtype or 'fp32':<6} {tokens / elapsed:8.1f} токенов/с, совпадает с fp32 {same:.0%}")
+        del pipe
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Скорость и точность CPU-бэкендов энкодера и LLM")
+    parser.add_argument("--sentences", type=int, default=2000)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--max-seq-length", type=int, default=InferenceConfig.max_seq_length)
+    parser.add_argument("--batch-tokens", type=int, default=InferenceConfig.batch_tokens)
+    parser.add_argument("--threads", type=int, default=InferenceConfig.intra_op_threads, help="intra-op потоки")
+    parser.add_argument("--interop-threads", type=int, default=InferenceConfig.inter_op_threads)
+    parser.add_argument("--llm", nargs="*", choices=["fp32", *LLM_DTYPES[1:]], help="сравнить и типы весов LLM")
+    parser.add_argument("--prompts", type=int, default=32)
+    args = parser.parse_args()
+
+    base = InferenceConfig(
+        max_seq_length=args.max_seq_length,
+        batch_tokens=args.batch_tokens,
+        intra_op_threads=args.threads,
+        inter_op_threads=args.interop_threads,
+    )
+    texts = sentences(args.sentences)
+    bench_encoder(args, base, texts)
+    if args.llm is not None:
+        args.llm = [name for name in args.llm if name != "fp32"]
+        bench_generator(args, base, texts)
+
+
+if __name__ == "__main__":
+    main()
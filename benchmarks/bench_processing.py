@@ -0,0 +1,64 @@
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import generate_items
+from utils.processing import EXP_LEVELS, SELECTED_COLUMNS, extract_frame, process_dataframe
+
+
+def legacy_fill_gaps(df: pd.DataFrame) -> pd.DataFrame:
+    df["salary_from"] = pd.to_numeric(df["salary_from"], errors="coerce")
+    df["salary_to"] = pd.to_numeric(df["salary_to"], errors="coerce")
+    df["salary_to"] = df["salary_to"].fillna(df["salary_from"])
+    df["salary_from"] = df["salary_from"].fillna(df["salary_to"])
+    df["salary_currency"] = df["salary_currency"].fillna("RUR")
+    df["salary_from"] = df["salary_from"].fillna(0).astype(int)
+    df["salary"] = df["salary_from"] * df["salary_currency"].apply(lambda x: 1 if x == "RUR" else 100)
+    df = df.drop(["salary_from", "salary_to", "salary_currency"], axis=1)
+    df["address_lat"] = pd.to_numeric(df["address_lat"], errors="coerce")
+    df["address_lng"] = pd.to_numeric(df["address_lng"], errors="coerce")
+    return df.dropna(subset=["address_lat", "address_lng"])
+
+
+def legacy_process_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    # Реализация до векторизации, оставлена для сравнения.
+    df = df[SELECTED_COLUMNS]
+    df = legacy_fill_gaps(df.copy())
+    df["has_test"] = df["has_test"].apply(lambda x: 1 if x == "True" else 0)
+    df["premium"] = df["premium"].apply(lambda x: 1 if x == "True" else 0)
+    df["response_letter_required"] = df["response_letter_required"].apply(lambda x: 1 if x == "True" else 0)
+    df["is_salary_set"] = df["salary"].apply(lambda x: "Не указана" if x == 0 else "Указана")
+    df["exp_sort"] = df["experience_name"].apply(lambda x: EXP_LEVELS[str(x)])
+    df = df.sort_values(by="exp_sort", ascending=True)
+    return df.drop("exp_sort", axis=1)
+
+
+def measure(func, df: pd.DataFrame) -> tuple[float, pd.DataFrame]:
+    started = time.perf_counter()
+    result = func(df)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="process_dataframe до и после векторизации")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000])
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        df = extract_frame(generate_items(size))
+        legacy_time, legacy = measure(legacy_process_dataframe, df)
+        vectorized_time, vectorized = measure(process_dataframe, df)
+
+        # Старая сортировка нестабильна, поэтому сравниваем множества строк и порядок уровней.
+        assert sorted(legacy.index) == sorted(vectorized.index)
+        assert legacy["experience_name"].tolist() == vectorized["experience_name"].astype(object).tolist()
+        memory = vectorized.memory_usage(deep=True).sum() / legacy.memory_usage(deep=True).sum()
+        print(
+            f"{size:>9} вакансий: до {legacy_time:.3f}s, после {vectorized_time:.3f}s, "
+            f"ускорение x{legacy_time / vectorized_time:.1f}, память результата {memory:.0%} от исходной"
+        )
+
+
+if __name__ == "__main__":
+    main()
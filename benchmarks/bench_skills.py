@@ -0,0 +1,48 @@
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from benchmarks.bench_dedup import WORDS
+from benchmarks.synthetic import REQUIREMENTS, RESPONSIBILITIES
+from utils.processing import EXP_LEVELS
+from utils.skills import get_skill_matcher, skill_report
+
+
+def snippets(size: int, seed: int = 0) -> pd.DataFrame:
+    rng = random.Random(seed)
+    levels = list(EXP_LEVELS)
+    return pd.DataFrame(
+        {
+            "snippet_requirement": [
+                f"{rng.choice(REQUIREMENTS)} {rng.choice(REQUIREMENTS)} Опыт с {', '.join(rng.choices(WORDS, k=3))}."
+                for _ in range(size)
+            ],
+            "snippet_responsibility": [
+                f"{rng.choice(RESPONSIBILITIES)} {rng.choice(RESPONSIBILITIES)}" for _ in range(size)
+            ],
+            "experience_name": [rng.choice(levels) for _ in range(size)],
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Скорость словарного извлечения навыков")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    matcher = get_skill_matcher()
+    print(f"Сборка словаря: {(time.perf_counter() - started) * 1000:.1f} ms, навыков {len(matcher.names)}")
+    for size in args.sizes:
+        df = snippets(size)
+        started = time.perf_counter()
+        report = skill_report(df, matcher)
+        elapsed = time.perf_counter() - started
+        top = ", ".join(report.frequencies.index[:5])
+        print(f"{size:>9} вакансий: {elapsed:.2f}s, {size / elapsed:,.0f} строк/с, чаще всего: {top}")
+
+
+if __name__ == "__main__":
+    main()
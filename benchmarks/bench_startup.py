@@ -0,0 +1,58 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["utils.processing", "utils.summarization", "app"]
+SNIPPET = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def import_time(module: str, cwd: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(module=module)],
+            cwd=cwd,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            return None
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+
+def checkout(rev: str, target: str) -> str:
+    archive = os.path.join(target, "tree.tar")
+    subprocess.run(["git", "archive", "-o", archive, rev], cwd=ROOT, check=True)
+    with tarfile.open(archive) as tar:
+        tar.extractall(target)
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время холодного импорта модулей приложения")
+    parser.add_argument("--rev", help="git-ревизия для сравнения, например baseline-коммит")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        trees = {"текущее дерево": ROOT}
+        if args.rev:
+            trees[args.rev] = checkout(args.rev, tmp)
+
+        for module in MODULES:
+            line = [f"{module:<22}"]
+            for name, cwd in trees.items():
+                timing = import_time(module, cwd, args.repeat)
+                value = "ошибка импорта" if timing is None else f"{timing:.2f}s"
+                line.append(f"{name}: {value}")
+            print("  ".join(line))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import argparse
+import asyncio
+import bisect
+import json
+import math
+import random
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from aiohttp import web
+
+from benchmarks.synthetic import generate_item
+from utils.parsing import DATE_FORMAT, MAX_PER_PAGE, RESULT_CAP
+
+HOST = "127.0.0.1"
+PORT = 8765
+ERROR_STATUSES = [500, 502, 503]
+
+
+@dataclass
+class StubConfig:
+    vacancies: int = 20_000
+    seed: int = 0
+    # Задержка ответа логнормальная: latency - медиана, latency_sigma - ширина
+    # хвоста (0 - фиксированная задержка).
+    latency: float = 0.05
+    latency_sigma: float = 0.5
+    error_rate: float = 0.0
+    # С вероятностью throttle_rate начинается серия из throttle_burst ответов 429.
+    throttle_rate: float = 0.0
+    throttle_burst: int = 5
+    retry_after: int = 1
+
+
+class VacancyIndex:
+    # Вакансии за последние 30 дней, отсортированные по дате публикации:
+    # окно date_from/date_to - это два bisect, страница - срез с конца окна.
+    def __init__(self, size: int, seed: int = 0, now: datetime = None):
+        # Час округляется вверх, как окна обхода в parsing.crawl_slice.
+        now = now or datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        rng = random.Random(seed)
+        items = [generate_item(rng, idx, now) for idx in range(size)]
+        items.sort(key=lambda item: item["published_at"])
+        self.items = items
+        self.published = [datetime.strptime(item["published_at"][:19], DATE_FORMAT) for item in items]
+
+    def window(self, date_from: str = None, date_to: str = None) -> tuple[int, int]:
+        lo, hi = 0, len(self.items)
+        if date_from:
+            lo = bisect.bisect_left(self.published, datetime.strptime(date_from, DATE_FORMAT))
+        if date_to:
+            hi = bisect.bisect_right(self.published, datetime.strptime(date_to, DATE_FORMAT))
+        return lo, max(lo, hi)
+
+    def page(self, lo: int, hi: int, page: int, per_page: int) -> list[dict]:
+        # Свежие вакансии первыми, как в выдаче hh.ru.
+        end = hi - page * per_page
+        return self.items[max(lo, end - per_page):max(lo, end)][::-1]
+
+
+class Faults:
+    # Общее для всех запросов состояние отказов: серии 429 идут подряд,
+    # как при срабатывании лимита на стороне API.
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.throttle_left = 0
+
+    def latency(self) -> float:
+        if self.config.latency <= 0:
+            return 0.0
+        if self.config.latency_sigma <= 0:
+            return self.config.latency
+        return self.rng.lognormvariate(math.log(self.config.latency), self.config.latency_sigma)
+
+    def status(self) -> int:
+        if self.throttle_left:
+            self.throttle_left -= 1
+            return 429
+        if self.rng.random() < self.config.throttle_rate:
+            self.throttle_left = self.config.throttle_burst - 1
+            return 429
+        if self.rng.random() < self.config.error_rate:
+            return self.rng.choice(ERROR_STATUSES)
+        return 200
+
+
+async def vacancies(request: web.Request) -> web.Response:
+    index, faults, served = request.app["index"], request.app["faults"], request.app["served"]
+    await asyncio.sleep(faults.latency())
+
+    status = faults.status()
+    if status == 429:
+        served[status] += 1
+        return web.json_response(
+            {"errors": [{"type": "too_many_requests"}]},
+            status=429,
+            headers={"Retry-After": str(faults.config.retry_after)},
+        )
+    if status != 200:
+        served[status] += 1
+        return web.json_response({"errors": [{"type": "server_error"}]}, status=status)
+
+    try:
+        page = int(request.query.get("page", 0))
+        per_page = int(request.query.get("per_page", 20))
+        lo, hi = index.window(request.query.get("date_from"), request.query.get("date_to"))
+    except ValueError:
+        served[400] += 1
+        return web.json_response({"errors": [{"type": "bad_argument"}]}, status=400)
+    # Глубже RESULT_CAP вакансий API не отдает и отвечает 400.
+    if per_page > MAX_PER_PAGE or (page + 1) * per_page > RESULT_CAP:
+        served[400] += 1
+        return web.json_response({"errors": [{"type": "bad_argument", "value": "page"}]}, status=400)
+
+    found = hi - lo
+    body = {
+        "found": found,
+        "pages": math.ceil(min(found, RESULT_CAP) / per_page),
+        "page": page,
+        "per_page": per_page,
+        "items": index.page(lo, hi, page, per_page),
+    }
+    served[200] += 1
+    return web.Response(text=json.dumps(body, ensure_ascii=False), content_type="application/json")
+
+
+def make_app(config: StubConfig = None) -> web.Application:
+    # Текст запроса не фильтрует выдачу: под любой запрос подходят все вакансии.
+    config = config or StubConfig()
+    app = web.Application()
+    app["config"] = config
+    app["index"] = VacancyIndex(config.vacancies, config.seed)
+    app["faults"] = Faults(config)
+    app["served"] = Counter()
+    app.router.add_get("/vacancies", vacancies)
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    defaults = StubConfig()
+    parser.add_argument("--vacancies", type=int, default=defaults.vacancies)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--latency", type=float, default=defaults.latency, help="медиана задержки, с")
+    parser.add_argument("--latency-sigma", type=float, default=defaults.latency_sigma)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="доля ответов 5xx")
+    parser.add_argument("--throttle-rate", type=float, default=defaults.throttle_rate, help="вероятность серии 429")
+    parser.add_argument("--throttle-burst", type=int, default=defaults.throttle_burst)
+    parser.add_argument("--retry-after", type=int, default=defaults.retry_after)
+
+
+def config_from_args(args) -> StubConfig:
+    return StubConfig(
+        vacancies=args.vacancies,
+        seed=args.seed,
+        latency=args.latency,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        throttle_burst=args.throttle_burst,
+        retry_after=args.retry_after,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная замена /vacancies API hh.ru")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    add_arguments(parser)
+    args = parser.parse_args()
+    print(f"HH_API_URL=http://{args.host}:{args.port}/vacancies")
+    web.run_app(make_app(config_from_args(args)), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_startup import ROOT, checkout
+
+SIZES = [1_000, 100_000, 1_000_000]
+BASELINE_DIR = os.path.join(ROOT, "benchmarks", "baselines")
+TOLERANCE = 0.15
+# Маленькие размеры повторяются, в зачет идет лучший прогон.
+REPEAT_BELOW = 10_000
+REPEAT = 5
+
+
+# Стадия получает синтетические вакансии, готовит свои входные данные и
+# возвращает функцию, время которой измеряется. Импорты внутри функций:
+# в дереве старой ревизии части стадий может не быть.
+def flatten_stage(items: list[dict]):
+    from utils.processing import flatten
+
+    return lambda: [flatten(item) for item in items]
+
+
+def merge_entries_stage(items: list[dict]):
+    from utils.processing import flatten, merge_entries
+
+    entries = [flatten(item) for item in items]
+    return lambda: merge_entries(entries)
+
+
+def extract_stage(items: list[dict]):
+    from utils.processing import SELECTED_COLUMNS, compile_extractor
+
+    extract = compile_extractor(SELECTED_COLUMNS)
+    return lambda: extract(items)
+
+
+def raw_frame(items: list[dict]):
+    import pandas as pd
+
+    from utils.processing import SELECTED_COLUMNS
+
+    try:
+        from utils.processing import extract_frame
+    except ImportError:
+        from utils.processing import flatten, merge_entries
+
+        return pd.DataFrame(merge_entries(list(map(flatten, items))))[SELECTED_COLUMNS]
+    return extract_frame(items)
+
+
+def processed_frame(items: list[dict]):
+    from utils.processing import process_dataframe
+
+    return process_dataframe(raw_frame(items))
+
+
+def process_dataframe_stage(items: list[dict]):
+    from utils.processing import process_dataframe
+
+    df = raw_frame(items)
+    return lambda: process_dataframe(df)
+
+
+def clean_text_stage(items: list[dict]):
+    from utils.summarization import clean_text
+
+    texts = [(item.get("snippet") or {}).get("requirement") or "" for item in items]
+    return lambda: [clean_text(text) for text in texts]
+
+
+def clusterize_stage(items: list[dict]):
+    # Энкодер - заглушка из utils.stub_models (HH_STUB_MODELS=1 в дочернем процессе).
+    from utils.summarization import clusterize
+
+    column = processed_frame(items)["snippet_requirement"]
+    return lambda: clusterize(column, n_clusters=5)
+
+
+def aggregate_stage(items: list[dict]):
+    from utils.stats import aggregate
+
+    df = processed_frame(items)
+    return lambda: aggregate(df)
+
+
+def charts_stage(items: list[dict]):
+    # Агрегаты и фигуры app.py вместе с JSON, который уходит в браузер.
+    from benchmarks.bench_charts import aggregated_figures
+
+    df = processed_frame(items)
+    aggregated_figures(df.head(100))
+    return lambda: sum(len(figure.to_json()) for figure in aggregated_figures(df))
+
+
+STAGES = {
+    "flatten": flatten_stage,
+    "merge_entries": merge_entries_stage,
+    "extract": extract_stage,
+    "process_dataframe": process_dataframe_stage,
+    "clean_text": clean_text_stage,
+    "clusterize": clusterize_stage,
+    "aggregate": aggregate_stage,
+    "charts": charts_stage,
+}
+
+
+def memory() -> tuple[float, float]:
+    # (текущий RSS, пиковый RSS) в МБ; пик сбрасывается через reset_peak.
+    try:
+        with open("/proc/self/status") as file:
+            fields = dict(line.split(":", 1) for line in file)
+        return int(fields["VmRSS"].split()[0]) / 1024, int(fields["VmHWM"].split()[0]) / 1024
+    except (OSError, KeyError):
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+        return peak, peak
+
+
+def reset_peak():
+    # Linux сбрасывает VmHWM до текущего RSS; на других системах пик считается от старта.
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        pass
+
+
+def run_child(stage: str, size: int) -> dict:
+    import gc
+
+    from benchmarks.synthetic import tile_items
+
+    items = tile_items(size)
+    best = None
+    for _ in range(REPEAT if size < REPEAT_BELOW else 1):
+        job = STAGES[stage](items)
+        gc.collect()
+        reset_peak()
+        before, _ = memory()
+        started = time.perf_counter()
+        job()
+        seconds = time.perf_counter() - started
+        _, peak = memory()
+        if best is None or seconds < best["seconds"]:
+            best = {"seconds": seconds, "peak_mb": peak, "delta_mb": max(peak - before, 0.0)}
+        del job
+    return best
+
+
+def run_stage(stage: str, size: int, tree: str) -> dict:
+    # Каждая пара (стадия, размер) - отдельный процесс: пик памяти и кэши
+    # одной стадии не влияют на другую.
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = {
+            **os.environ,
+            "HH_STUB_MODELS": "1",
+            "EMBEDDING_CACHE": "0",
+            "PARAPHRASE_CACHE": "0",
+            "HH_CACHE_DIR": cache_dir,
+        }
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.suite", "--child", stage, str(size)],
+            cwd=tree,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"код {result.returncode}"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def revision(rev: str = None) -> tuple[str, bool]:
+    # (коммит, есть ли незакоммиченные правки) для пометки baseline.
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+
+    if rev:
+        return git("rev-parse", rev) or None, False
+    return git("rev-parse", "HEAD") or None, bool(git("status", "--porcelain", "--untracked-files=no"))
+
+
+def format_row(row: dict, base: dict = None) -> str:
+    line = f"{row['stage']:<18} {row['size']:>9}"
+    if "error" in row:
+        return f"{line}  ошибка: {row['error']}"
+    line += (
+        f"  {row['seconds']:>9.3f}s  {row['size'] / row['seconds']:>12,.0f} строк/с"
+        f"  пик {row['peak_mb']:>7.0f} МБ (+{row['delta_mb']:.0f})"
+    )
+    if base is not None and "error" not in base:
+        line += f"  время x{row['seconds'] / base['seconds']:.2f}, пик x{row['peak_mb'] / base['peak_mb']:.2f}"
+    return line
+
+
+def regressions(results: list[dict], baseline: dict, tolerance: float) -> list[dict]:
+    # Регрессия - стадия медленнее baseline больше чем на tolerance.
+    base = {(row["stage"], row["size"]): row for row in baseline["results"]}
+    slower = []
+    for row in results:
+        old = base.get((row["stage"], row["size"]))
+        if old is None or "error" in row or "error" in old:
+            continue
+        if row["seconds"] > old["seconds"] * (1 + tolerance):
+            slower.append(row)
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время и пиковая память CPU-стадий на синтетических вакансиях")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--rev", help="git-ревизия: ее код измеряется тем же набором бенчмарков")
+    parser.add_argument("--save", nargs="?", const="", help="сохранить baseline (по умолчанию baselines/<коммит>.json)")
+    parser.add_argument("--compare", help="baseline для сравнения")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="допустимое замедление, доля")
+    parser.add_argument("--child", nargs=2, metavar=("STAGE", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child[0], int(args.child[1]))))
+        return 0
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+    base = {(row["stage"], row["size"]): row for row in baseline["results"]} if baseline else {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tree = ROOT
+        if args.rev:
+            # Код ревизии, но текущий набор бенчмарков.
+            tree = checkout(args.rev, tmp)
+            shutil.copytree(
+                os.path.join(ROOT, "benchmarks"),
+                os.path.join(tree, "benchmarks"),
+                dirs_exist_ok=True,
+                ignore=shutil.ignore_patterns("__pycache__", "baselines"),
+            )
+        results = []
+        for size in args.sizes:
+            for stage in args.stages:
+                row = {"stage": stage, "size": size, **run_stage(stage, size, tree)}
+                results.append(row)
+                print(format_row(row, base.get((stage, size))), flush=True)
+
+    commit, dirty = revision(args.rev)
+    if args.save is not None:
+        label = args.rev or (commit or "unknown")[:10] + ("-dirty" if dirty else "")
+        path = args.save or os.path.join(BASELINE_DIR, f"{label.replace('/', '_')}.json")
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "rev": args.rev or commit,
+                    "commit": commit,
+                    "dirty": dirty,
+                    "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "python": platform.python_version(),
+                    "machine": platform.platform(),
+                    "results": results,
+                },
+                file,
+                ensure_ascii=False,
+                indent=2,
+            )
+        print(f"baseline сохранен в {path}")
+
+    if baseline is not None:
+        slower = regressions(results, baseline, args.tolerance)
+        for row in slower:
+            print(f"регрессия: {row['stage']} на {row['size']} вакансиях", file=sys.stderr)
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
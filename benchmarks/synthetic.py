@@ -0,0 +1,109 @@
+import random
+from datetime import datetime, timedelta
+
+from utils.processing import EXP_LEVELS
+
+AREAS = [("1", "Москва"), ("2", "Санкт-Петербург"), ("4", "Новосибирск"), ("88", "Казань"), ("3", "Екатеринбург")]
+CENTERS = {"1": (55.75, 37.62), "2": (59.93, 30.33), "4": (55.03, 82.92), "88": (55.79, 49.12), "3": (56.84, 60.6)}
+SCHEDULES = [("fullDay", "Полный день"), ("remote", "Удаленная работа"), ("flexible", "Гибкий график"), ("shift", "Сменный график")]
+EMPLOYMENTS = [("full", "Полная занятость"), ("part", "Частичная занятость"), ("project", "Проектная работа"), ("probation", "Стажировка")]
+EXPERIENCE_IDS = ["noExperience", "between1And3", "between3And6", "moreThan6"]
+ROLES = [("96", "Программист, разработчик"), ("104", "Руководитель группы разработки"), ("124", "Тестировщик"), ("10", "Аналитик")]
+CURRENCIES = ["RUR"] * 18 + ["USD", "EUR"]
+TITLES = ["Python-разработчик", "Backend developer", "Data Scientist", "Аналитик данных", "QA инженер", "DevOps инженер"]
+REQUIREMENTS = [
+    "Опыт коммерческой разработки на <highlighttext>Python</highlighttext> от 3 лет.",
+    "Знание SQL, опыт работы с PostgreSQL и Redis.",
+    "Понимание принципов ООП, SOLID, паттернов проектирования.",
+    "Опыт работы с Docker, Kubernetes, CI/CD.",
+    "Знание pandas, numpy, scikit-learn.",
+    "Английский язык на уровне чтения технической документации.",
+    "Высшее техническое образование.",
+]
+RESPONSIBILITIES = [
+    "Разработка и поддержка backend-сервисов.",
+    "Проектирование архитектуры новых модулей.",
+    "Написание unit- и интеграционных тестов.",
+    "Участие в code review.",
+    "Оптимизация производительности SQL-запросов.",
+    "Взаимодействие с командой аналитиков и продакт-менеджерами.",
+]
+
+
+def generate_item(rng: random.Random, idx: int, now: datetime) -> dict:
+    area_id, area_name = rng.choice(AREAS)
+    experience = rng.randrange(len(EXP_LEVELS))
+    published = now - timedelta(minutes=rng.randrange(30 * 24 * 60))
+
+    salary = None
+    if rng.random() < 0.6:
+        low = rng.randrange(30, 400) * 1000
+        salary = {
+            "from": low if rng.random() < 0.8 else None,
+            "to": low + rng.randrange(0, 200) * 1000 if rng.random() < 0.6 else None,
+            "currency": rng.choice(CURRENCIES),
+            "gross": rng.random() < 0.5,
+        }
+        if salary["from"] is None and salary["to"] is None:
+            salary["from"] = low
+
+    address = None
+    if rng.random() < 0.7:
+        lat, lng = CENTERS[area_id]
+        address = {
+            "city": area_name,
+            "street": "улица Льва Толстого",
+            "building": str(rng.randrange(1, 100)),
+            "lat": lat + rng.gauss(0, 0.08),
+            "lng": lng + rng.gauss(0, 0.12),
+            "metro_stations": [{"station_name": "Парк культуры", "line_name": "Сокольническая"}],
+        }
+
+    roles = [dict(zip(("id", "name"), rng.choice(ROLES))) for _ in range(rng.choice([1, 1, 1, 2]))]
+    schedule_id, schedule_name = rng.choice(SCHEDULES)
+    employment_id, employment_name = rng.choice(EMPLOYMENTS)
+
+    return {
+        "id": str(10_000_000 + idx),
+        "premium": rng.random() < 0.05,
+        "name": rng.choice(TITLES),
+        "department": None,
+        "has_test": rng.random() < 0.1,
+        "response_letter_required": rng.random() < 0.2,
+        "area": {"id": area_id, "name": area_name, "url": f"https://api.hh.ru/areas/{area_id}"},
+        "salary": salary,
+        "type": {"id": "open", "name": "Открытая"},
+        "address": address,
+        "published_at": published.strftime("%Y-%m-%dT%H:%M:%S+0300"),
+        "created_at": published.strftime("%Y-%m-%dT%H:%M:%S+0300"),
+        "archived": False,
+        "url": f"https://api.hh.ru/vacancies/{10_000_000 + idx}",
+        "employer": {"id": str(rng.randrange(10_000)), "name": "ООО Ромашка", "trusted": True},
+        "snippet": {
+            "requirement": " ".join(rng.sample(REQUIREMENTS, 2)) if rng.random() < 0.95 else None,
+            "responsibility": " ".join(rng.sample(RESPONSIBILITIES, 2)) if rng.random() < 0.95 else None,
+        },
+        "schedule": {"id": schedule_id, "name": schedule_name},
+        "working_days": [],
+        "professional_roles": roles,
+        "experience": {"id": EXPERIENCE_IDS[experience], "name": list(EXP_LEVELS)[experience]},
+        "employment": {"id": employment_id, "name": employment_name},
+    }
+
+
+def generate_items(size: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 31)
+    return [generate_item(rng, idx, now) for idx in range(size)]
+
+
+def tile_items(size: int, pool: int = 100_000, seed: int = 0) -> list[dict]:
+    # Для миллионов вакансий: первые pool генерируются честно, остальные - копии
+    # верхнего уровня с новым id. Вложенные объекты общие, так что генерация
+    # и память не растут с size, а обработке копии обходятся как настоящие.
+    items = generate_items(min(size, pool), seed)
+    for idx in range(len(items), size):
+        source = items[idx % pool]
+        key = str(10_000_000 + idx)
+        items.append({**source, "id": key, "url": f"https://api.hh.ru/vacancies/{key}"})
+    return items
@@ -0,0 +1,256 @@
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import aiohttp
+
+from utils.cache import get_response_cache, query_key
+from utils.jobs import JOB_WORKERS, TORCH_THREADS, limit_threads
+from utils.metrics import METRICS_FILE, PROFILER, get_registry, profile
+from utils.parsing import AREA, CrawlStats, get_key_words, parse_job
+from utils.ratelimit import get_rate_limiter
+from utils.store import STORE_PATH, VacancyStore
+
+CONCURRENCY = 4
+CONNECTION_LIMIT = 16
+NUMBER_OF_PAGES = 100
+DONE_FILE = "meta.json"
+ITEMS_FILE = "items.json.gz"
+
+
+def read_queries(path: str) -> list[dict]:
+    # Строка - JSON-объект с полем query (язык запросов hh.ru) или keywords
+    # (список, как в обычном поиске приложения); title подходит как запасной вариант.
+    queries = []
+    with open(path, encoding="utf-8") as file:
+        for number, line in enumerate(file):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if record.get("query"):
+                query = record["query"]
+            elif record.get("keywords"):
+                query = get_key_words([keyword.strip() for keyword in record["keywords"]])
+            else:
+                query = record["title"]
+            name = str(record.get("id") or record.get("request_id") or number)
+            queries.append({"name": name, "query": query})
+    return queries
+
+
+def output_dir(root: str, name: str, query: str) -> str:
+    slug = re.sub(r"[^\w-]+", "_", name)[:48]
+    digest = hashlib.sha256(query.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(root, f"{slug}-{digest}")
+
+
+def write_atomic(path: str, write):
+    # Запись во временный файл и os.replace: прерванный запуск не оставит полфайла.
+    tmp = f"{path}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def write_json(path: str, data):
+    def write(tmp):
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False, indent=2, default=float)
+
+    write_atomic(path, write)
+
+
+def analyze(items: list[dict], target: str, summarize: bool, n_clusters: int, history_key: str = None) -> dict:
+    # Выполняется в процессе пула: обработка, дедупликация, агрегаты и выжимки.
+    from utils.dedup import deduplicate
+    from utils.history import get_snapshot_store
+    from utils.skills import skill_report
+    from utils.processing import concat_chunks, process_page
+    from utils.stats import aggregate
+
+    # Метрики процесса пула возвращаются вместе с результатом и
+    # складываются в реестр основного процесса.
+    registry = get_registry()
+    started = time.perf_counter()
+    vacancies = concat_chunks([process_page(items)])
+    if vacancies.empty:
+        return {"vacancies": 0, "unique": 0, "seconds": time.perf_counter() - started, "metrics": registry.drain()}
+    with registry.span("deduplicate"):
+        df, _ = deduplicate(vacancies)
+    with registry.span("aggregate"):
+        stats = aggregate(df)
+
+    write_atomic(os.path.join(target, "vacancies.parquet"), lambda tmp: df.to_parquet(tmp, index=False))
+    write_atomic(os.path.join(target, "salary.parquet"), lambda tmp: stats.salary.to_parquet(tmp))
+    write_atomic(
+        os.path.join(target, "histogram.parquet"), lambda tmp: stats.histogram.to_parquet(tmp, index=False)
+    )
+    write_json(
+        os.path.join(target, "counts.json"),
+        {column: counts.to_dict() for column, counts in stats.counts.items()},
+    )
+    write_json(os.path.join(target, "salary_overall.json"), stats.overall.to_dict())
+    with registry.span("skills"):
+        skills = skill_report(df)
+    write_atomic(os.path.join(target, "skills.parquet"), lambda tmp: skills.frequencies.to_parquet(tmp))
+    write_atomic(
+        os.path.join(target, "skill_pairs.parquet"), lambda tmp: skills.cooccurrence.to_parquet(tmp)
+    )
+    if history_key is not None:
+        get_snapshot_store().save(history_key, df, stats)
+
+    if summarize:
+        from utils.summarization import summarize_groups
+
+        summaries = summarize_groups(
+            df,
+            "experience_name",
+            ["snippet_requirement", "snippet_responsibility"],
+            n_clusters=n_clusters,
+        )
+        write_json(os.path.join(target, "summaries.json"), summaries)
+    return {
+        "vacancies": len(vacancies),
+        "unique": len(df),
+        "seconds": time.perf_counter() - started,
+        "metrics": registry.drain(),
+    }
+
+
+async def run_query(
+    query: dict, root: str, session, pool, semaphore: asyncio.Semaphore, args
+) -> dict:
+    target = output_dir(root, query["name"], query["query"])
+    # В инкрементальном режиме каждый запуск - это ежедневное обновление,
+    # поэтому готовые запросы не пропускаются, а обход не берется из items.json.gz.
+    store = getattr(args, "vacancy_store", None)
+    if store is None and not args.force and os.path.exists(os.path.join(target, DONE_FILE)):
+        print(f"[skip] {query['name']}: уже обработан", file=sys.stderr)
+        return None
+    os.makedirs(target, exist_ok=True)
+
+    # Сырые вакансии сохраняются сразу после обхода: после прерывания
+    # незавершенный запрос продолжается с обработки, без повторного обхода.
+    crawl_stats = CrawlStats()
+    started = time.perf_counter()
+    items_path = os.path.join(target, ITEMS_FILE)
+    if store is None and os.path.exists(items_path):
+        with gzip.open(items_path, "rt", encoding="utf-8") as file:
+            items = json.load(file)
+    else:
+        async with semaphore:
+            items = await parse_job(
+                query["query"],
+                number_of_pages=args.pages,
+                stats=crawl_stats,
+                cache=get_response_cache(),
+                session=session,
+                store=store,
+            )
+
+        def write(tmp):
+            with gzip.open(tmp, "wt", encoding="utf-8") as file:
+                json.dump(items, file, ensure_ascii=False)
+
+        write_atomic(items_path, write)
+    crawl_seconds = time.perf_counter() - started
+
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(
+        pool, analyze, items, target, not args.no_summaries, args.clusters,
+        None if args.no_history else query_key(query["query"], AREA),
+    )
+    get_registry().merge(result.pop("metrics"))
+    meta = {
+        **query,
+        **result,
+        "items": len(items),
+        "crawl_seconds": crawl_seconds,
+        "requests": crawl_stats.requests,
+        "found": crawl_stats.found,
+        "lost_pages": crawl_stats.lost_pages,
+        "new": crawl_stats.new,
+        "closed": crawl_stats.closed,
+        "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    # meta.json пишется последним и служит отметкой о завершении: при повторном
+    # запуске такие запросы пропускаются, если не передан --force.
+    write_json(os.path.join(target, DONE_FILE), meta)
+    print(f"[done] {query['name']}: {result['unique']} уникальных из {result['vacancies']}", file=sys.stderr)
+    return meta
+
+
+async def run(args) -> list:
+    queries = read_queries(args.queries)
+    os.makedirs(args.output, exist_ok=True)
+    if args.incremental:
+        args.vacancy_store = VacancyStore(args.store)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    connector = aiohttp.TCPConnector(limit=CONNECTION_LIMIT)
+    pool = ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=get_context("spawn"),
+        initializer=limit_threads,
+        initargs=(args.threads,),
+    )
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            results = await asyncio.gather(
+                *(run_query(query, args.output, session, pool, semaphore, args) for query in queries),
+                return_exceptions=True,
+            )
+    finally:
+        pool.shutdown(wait=True)
+
+    if args.metrics:
+        get_registry().write_prometheus(args.metrics)
+    for query, result in zip(queries, results):
+        if isinstance(result, Exception):
+            print(f"[fail] {query['name']}: {result!r}", file=sys.stderr)
+    limiter = get_rate_limiter().stats()
+    print(
+        f"Запросов к API: {limiter['requests']}, {limiter['requests_per_second']} запросов/с, "
+        f"429: {limiter['throttled']}, ошибок: {limiter['errors']}",
+        file=sys.stderr,
+    )
+    return results
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Пакетный анализ вакансий hh.ru без интерфейса")
+    parser.add_argument("queries", help="JSONL-файл с запросами")
+    parser.add_argument("-o", "--output", default="reports")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="сколько запросов обходить одновременно")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS, help="процессов для обработки и суммаризации")
+    parser.add_argument("--threads", type=int, default=TORCH_THREADS, help="потоков torch на процесс")
+    parser.add_argument("--pages", type=int, default=NUMBER_OF_PAGES)
+    parser.add_argument("--clusters", type=int, default=3)
+    parser.add_argument("--no-summaries", action="store_true")
+    parser.add_argument("--no-history", action="store_true", help="не сохранять дневной снимок для трендов")
+    parser.add_argument("--force", action="store_true", help="пересчитать уже готовые запросы")
+    parser.add_argument(
+        "--incremental", action="store_true", help="запрашивать только новые вакансии и вести локальную базу"
+    )
+    parser.add_argument("--store", default=STORE_PATH, help="путь к базе вакансий для --incremental")
+    parser.add_argument("--metrics", default=METRICS_FILE, help="записать метрики в файл формата Prometheus")
+    parser.add_argument(
+        "--profile", choices=["cprofile", "pyinstrument"], default=PROFILER or None,
+        help="профилировать основной процесс (обход и планирование)",
+    )
+    args = parser.parse_args(argv)
+
+    with profile("cli", args.profile or ""):
+        results = asyncio.run(run(args))
+    return 1 if any(isinstance(result, Exception) for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
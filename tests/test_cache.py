@@ -0,0 +1,163 @@
+import re
+import time
+import pytest
+import aiohttp
+from aioresponses import aioresponses
+import threading
+import numpy as np
+import pandas as pd
+from utils.cache import EmbeddingCache, ResponseCache, ResultCache, SQLiteStore, cache_key, query_key
+from utils.parsing import get_key_words
+from utils.parsing import fetch_page
+from utils.ratelimit import RateLimiter
+
+API_PATTERN = re.compile(r"^https://api\.hh\.ru/vacancies\?.*$")
+URL = "https://api.hh.ru/vacancies"
+PARAMS = {"text": "developer", "area": "113", "per_page": "100", "page": 0}
+
+
+def test_cache_key_is_normalized():
+    assert cache_key("https://API.hh.ru/vacancies/", {"page": 0, "text": "x"}) == cache_key(
+        "https://api.hh.ru/vacancies?text=x", {"page": "0"}
+    )
+    assert cache_key(URL, {"page": 0}) != cache_key(URL, {"page": 1})
+
+
+def test_store_ttl_and_lru_eviction(tmp_path):
+    store = SQLiteStore(str(tmp_path / "store.sqlite"), max_bytes=250)
+    store.put("a", b"x" * 100, ttl=60)
+    store.put("b", b"x" * 100, ttl=-1)
+    time.sleep(0.01)
+    store.get("a")
+    store.put("c", b"x" * 100, ttl=60)
+
+    assert store.get("b") is None
+    assert store.get("a") is not None
+    assert store.evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_uses_cache_and_revalidates(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), ttl=60)
+    limiter = RateLimiter(retry_base=0)
+
+    with aioresponses() as m:
+        m.get(API_PATTERN, payload={"items": [1]}, headers={"ETag": '"v1"'})
+        async with aiohttp.ClientSession() as session:
+            first = await fetch_page(session, URL, PARAMS, limiter, cache)
+            second = await fetch_page(session, URL, PARAMS, limiter, cache)
+
+    assert first == second == {"items": [1]}
+    assert cache.hits == 1 and cache.misses == 1
+    assert limiter.requests == 1
+
+    cache.ttl = -1
+    cache.save(URL, PARAMS, {"items": [1]}, {"ETag": '"v1"'})
+    with aioresponses() as m:
+        m.get(API_PATTERN, status=304)
+        async with aiohttp.ClientSession() as session:
+            third = await fetch_page(session, URL, PARAMS, limiter, cache)
+        request = list(m.requests.values())[0][0]
+
+    assert third == {"items": [1]}
+    assert request.kwargs["headers"]["If-None-Match"] == '"v1"'
+    assert cache.revalidated == 1
+
+
+@pytest.mark.asyncio
+async def test_offline_mode_serves_only_from_cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), ttl=-1, offline=True)
+    cache.save(URL, PARAMS, {"items": [1]})
+
+    with aioresponses():
+        async with aiohttp.ClientSession() as session:
+            cached = await fetch_page(session, URL, PARAMS, RateLimiter(), cache)
+            missing = await fetch_page(session, URL, {**PARAMS, "page": 1}, RateLimiter(), cache)
+
+    assert cached == {"items": [1]}
+    assert missing is None
+
+
+def test_embedding_cache_keys_include_model_and_task(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), model_id="jina", task="text-matching")
+    cache.add(["python"], np.ones((1, 4)))
+
+    vectors, missing = cache.lookup(["python", "sql"])
+    other_task = EmbeddingCache(str(tmp_path), model_id="jina", task="retrieval.query")
+
+    assert missing == [1]
+    assert vectors.dtype == np.float16
+    assert vectors[0].tolist() == [1, 1, 1, 1]
+    assert other_task.lookup(["python"])[1] == [0]
+    assert cache.stats()["vectors"] == 1
+
+
+def test_query_key_ignores_case_spacing_and_term_order():
+    assert query_key(get_key_words(["Python", "Go"]), "113") == query_key("'go'  OR 'python'", "113")
+    assert query_key("Python NOT Java", "113") == query_key("python  NOT java", "113")
+    assert query_key("NAME:Python", "113") == query_key("NAME:python", "113")
+    # Операторы и префиксы полей в нижнем регистре - это просто слова запроса.
+    assert query_key("python NOT java", "113") != query_key("python not java", "113")
+    assert query_key("NAME:python", "113") != query_key("name:python", "113")
+    assert query_key("python", "113") != query_key("python", "1")
+    assert query_key("python NOT java", "113") != query_key("java NOT python", "113")
+
+
+def test_result_layers_have_own_ttl(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite"), ttls={"pages": -1})
+    frame = pd.DataFrame({"name": ["a", "b"], "salary": [1, 2]}, index=[3, 7])
+    cache.put("frame", "k", frame)
+    cache.put("pages", "k", [[{"id": "1"}]])
+    cache.put("summaries", "k", {"snippet_requirement": {"Нет опыта": ["Python"]}})
+
+    assert cache.get("frame", "k").equals(frame)
+    assert cache.get("pages", "k") is None
+    assert cache.get("summaries", "k") == {"snippet_requirement": {"Нет опыта": ["Python"]}}
+    assert cache.hits["frame"] == 1 and cache.misses["pages"] == 1
+
+
+def test_concurrent_identical_requests_are_coalesced(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite"))
+    computed = []
+
+    def request():
+        if cache.get("summaries", "k") is not None:
+            return
+        with cache.coalesce("k"):
+            if cache.get("summaries", "k") is None:
+                computed.append(1)
+                time.sleep(0.05)
+                cache.put("summaries", "k", {"done": True})
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert computed == [1]
+
+
+def test_lead_does_not_block_followers(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite"))
+
+    with cache.lead("k") as leader:
+        with cache.lead("k") as follower:
+            assert leader and not follower
+    with cache.lead("k") as leader:
+        assert leader
+
+
+def test_pages_are_streamed_into_cache(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite"))
+    started_at = time.time()
+    cache.put_page("k", 0, [{"id": "1"}])
+    assert cache.pages("k") is None
+
+    cache.put_page("k", 1, [{"id": "2"}])
+    cache.finish_pages("k", 2, started_at)
+    assert list(cache.pages("k")) == [[{"id": "1"}], [{"id": "2"}]]
+
+    cache.finish_pages("k", 3, started_at)
+    with pytest.raises(KeyError):
+        list(cache.pages("k"))
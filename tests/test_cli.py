@@ -0,0 +1,91 @@
+import json
+import os
+import re
+from datetime import datetime
+import pandas as pd
+from aioresponses import aioresponses
+import cli
+from benchmarks.synthetic import generate_items
+
+API_PATTERN = re.compile(r"^https://api\.hh\.ru/vacancies\?.*$")
+
+
+def test_read_queries_accepts_query_keywords_and_title(tmp_path):
+    path = tmp_path / "queries.jsonl"
+    path.write_text(
+        "\n".join(
+            [
+                json.dumps({"id": "py", "query": "python NOT junior"}),
+                json.dumps({"keywords": ["Go ", "Rust"]}),
+                "",
+                json.dumps({"request_id": "r-1", "title": "аналитик"}),
+            ]
+        ),
+        encoding="utf-8",
+    )
+
+    queries = cli.read_queries(str(path))
+
+    assert [query["name"] for query in queries] == ["py", "1", "r-1"]
+    assert queries[0]["query"] == "python NOT junior"
+    assert "'Go'" in queries[1]["query"] and "'Rust'" in queries[1]["query"]
+    assert queries[2]["query"] == "аналитик"
+
+
+def test_batch_run_writes_reports_and_resumes(tmp_path, monkeypatch):
+    monkeypatch.setenv("HH_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(cli, "get_response_cache", lambda: None)
+    queries = tmp_path / "queries.jsonl"
+    queries.write_text(json.dumps({"id": "python", "query": "python"}) + "\n", encoding="utf-8")
+    output = tmp_path / "reports"
+    argv = [str(queries), "-o", str(output), "--workers", "1", "--threads", "1", "--pages", "1", "--no-summaries"]
+    metrics = tmp_path / "metrics.prom"
+
+    with aioresponses() as m:
+        m.get(API_PATTERN, payload={"found": 50, "pages": 1, "items": generate_items(50)}, repeat=True)
+        assert cli.main([*argv, "--metrics", str(metrics)]) == 0
+
+    (target,) = output.iterdir()
+    meta = json.loads((target / "meta.json").read_text(encoding="utf-8"))
+    assert meta["items"] == 50
+    assert 0 < meta["unique"] <= meta["vacancies"] <= 50
+    assert len(pd.read_parquet(target / "vacancies.parquet")) == meta["unique"]
+    assert "schedule_name" in json.loads((target / "counts.json").read_text(encoding="utf-8"))
+    assert list((tmp_path / "cache" / "history" / "snapshots").glob("*/*.parquet"))
+    # Стадии из процесса пула попадают в общий файл метрик.
+    assert 'hh_stage_seconds_count{stage="process_dataframe"}' in metrics.read_text(encoding="utf-8")
+
+    # Готовый запрос пропускается, незавершенный продолжается с сохраненных вакансий.
+    modified = os.path.getmtime(target / "meta.json")
+    assert cli.main(argv) == 0
+    assert os.path.getmtime(target / "meta.json") == modified
+    (target / "meta.json").unlink()
+    assert cli.main(argv) == 0
+    assert json.loads((target / "meta.json").read_text(encoding="utf-8"))["requests"] == 0
+
+
+def test_incremental_run_refreshes_from_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("HH_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(cli, "get_response_cache", lambda: None)
+    queries = tmp_path / "queries.jsonl"
+    queries.write_text(json.dumps({"id": "python", "query": "python"}) + "\n", encoding="utf-8")
+    output = tmp_path / "reports"
+    argv = [
+        str(queries), "-o", str(output), "--workers", "1", "--threads", "1", "--pages", "1",
+        "--no-summaries", "--incremental", "--store", str(tmp_path / "vacancies.sqlite"),
+    ]
+    # Синтетические вакансии датированы прошлым, а в базе устаревшие закрываются.
+    published = datetime.now().strftime("%Y-%m-%dT%H:%M:%S+0300")
+    items = [{**item, "published_at": published} for item in generate_items(50)]
+
+    with aioresponses() as m:
+        m.get(API_PATTERN, payload={"found": 50, "pages": 1, "items": items}, repeat=True)
+        assert cli.main(argv) == 0
+        (target,) = output.iterdir()
+        assert json.loads((target / "meta.json").read_text(encoding="utf-8"))["new"] == 50
+        # Готовый запрос не пропускается: повторный запуск дозапрашивает новые вакансии.
+        assert cli.main(argv) == 0
+
+    meta = json.loads((target / "meta.json").read_text(encoding="utf-8"))
+    assert meta["new"] == 0
+    assert meta["items"] == 50
@@ -0,0 +1,51 @@
+import numpy as np
+from utils import clustering
+from utils.clustering import cluster_embeddings, representative_indices, reservoir_sample
+
+
+def blobs(per_blob: int = 50, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = np.eye(3, 8) * 10
+    return np.vstack([center + rng.normal(0, 0.3, (per_blob, 8)) for center in centers])
+
+
+def test_reservoir_sample_has_no_duplicates():
+    sample = reservoir_sample(range(1000), 100, seed=1)
+
+    assert len(sample) == 100
+    assert len(set(sample)) == 100
+    assert reservoir_sample(range(5), 10) == [0, 1, 2, 3, 4]
+    assert sample == reservoir_sample(range(1000), 100, seed=1)
+
+
+def test_tiny_group_is_clustered_exactly():
+    embeddings = np.array([[1.0, 0.0], [0.0, 1.0], [1.0, 0.0]])
+
+    labels, centers = cluster_embeddings(embeddings, n_clusters=5)
+
+    assert len(centers) == 2
+    assert labels[0] == labels[2] != labels[1]
+
+
+def test_representatives_are_closest_to_centers():
+    embeddings = blobs()
+
+    labels, centers = cluster_embeddings(embeddings, n_clusters=3)
+    representatives = representative_indices(embeddings, labels, centers)
+
+    assert sorted(labels[representatives].tolist()) == [0, 1, 2]
+    for idx in representatives:
+        members = np.flatnonzero(labels == labels[idx])
+        distances = np.linalg.norm(clustering.normalize(embeddings[members]) - centers[labels[idx]], axis=1)
+        assert np.isclose(distances.min(), np.linalg.norm(clustering.normalize(embeddings[[idx]])[0] - centers[labels[idx]]))
+
+
+def test_auto_k_and_minibatch_backend(monkeypatch):
+    embeddings = blobs(per_blob=200)
+    monkeypatch.setattr(clustering, "MINIBATCH_THRESHOLD", 100)
+    monkeypatch.setattr(clustering, "CHUNK_SIZE", 128)
+
+    labels, centers = cluster_embeddings(embeddings, n_clusters=None)
+
+    assert len(centers) == 3
+    assert len(set(labels[:200])) == len(set(labels[200:400])) == len(set(labels[400:])) == 1
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from utils.dedup import deduplicate, near_duplicate_labels
+
+
+def frame(rows: list[tuple]) -> pd.DataFrame:
+    return pd.DataFrame(
+        rows, columns=["id", "name", "snippet_requirement", "snippet_responsibility", "salary"]
+    )
+
+
+def test_exact_and_near_duplicates_are_merged():
+    requirement = "Опыт коммерческой разработки на Python от 3 лет, знание SQL, PostgreSQL, Redis и Docker"
+    df = frame(
+        [
+            ("1", "Python-разработчик", requirement, "Разработка backend-сервисов", 200_000),
+            ("1", "Python-разработчик", requirement, "Разработка backend-сервисов", 200_000),
+            ("2", "Python-разработчик", requirement + ".", "Разработка backend-сервисов", 210_000),
+            ("3", "QA инженер", "Опыт ручного тестирования", "Написание тест-кейсов", 90_000),
+        ],
+    )
+
+    unique, mapping = deduplicate(df)
+
+    assert unique.index.tolist() == [0, 3]
+    assert unique["duplicates"].tolist() == [3, 1]
+    assert mapping["representative"].tolist() == [0, 0, 0, 3]
+    assert mapping["cluster"].nunique() == 2
+
+
+def test_empty_texts_are_not_merged():
+    labels = near_duplicate_labels(pa.array(["", "", "совсем другой текст вакансии"]))
+
+    assert len(np.unique(labels)) == 3
+
+
+def test_missing_ids_are_not_treated_as_equal():
+    df = frame([(None, "Аналитик", "SQL", "Отчеты", 0), (None, "Тестировщик", "Selenium", "Автотесты", 0)])
+
+    unique, mapping = deduplicate(df)
+
+    assert len(unique) == 2
+    assert mapping["representative"].tolist() == [0, 1]
+
+
+def test_empty_frame():
+    unique, mapping = deduplicate(frame([]))
+
+    assert unique.empty and mapping.empty
+    assert "duplicates" in unique.columns
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+from utils.geo import bin_points, cell_keys, fit_zoom, grid_level
+
+
+def points(size: int = 2_000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    centers = np.array([[55.75, 37.62], [59.93, 30.33], [55.03, 82.92]])
+    city = rng.integers(0, len(centers), size)
+    coords = centers[city] + rng.normal(0, 0.05, (size, 2))
+    salary = rng.integers(50, 300, size) * 1000.0
+    salary[rng.random(size) < 0.4] = 0
+    return pd.DataFrame({"address_lat": coords[:, 0], "address_lng": coords[:, 1], "salary": salary})
+
+
+def test_cells_preserve_counts_and_centroids():
+    df = points()
+    df.loc[0, "address_lat"] = np.nan
+
+    cells = bin_points(df, max_cells=50)
+
+    assert len(cells) <= 50
+    assert cells["count"].sum() == len(df) - 1
+    assert np.isclose((cells["lat"] * cells["count"]).sum(), df["address_lat"].sum())
+
+
+def test_median_salary_per_cell():
+    df = points()
+    cells = bin_points(df, level=4)
+
+    keys = cell_keys(df["address_lat"].to_numpy(), df["address_lng"].to_numpy(), 4)
+    paid = df[df["salary"] > 0].assign(key=keys[df["salary"] > 0])
+    expected = paid.groupby("key")["salary"].median().sort_index().to_numpy()
+    assert np.allclose(np.sort(cells["median_salary"].dropna()), np.sort(expected))
+
+
+def test_level_follows_zoom_and_point_count():
+    df = points()
+    lat, lng = df["address_lat"].to_numpy(), df["address_lng"].to_numpy()
+
+    assert grid_level(lat, lng, zoom=5) < grid_level(lat, lng, zoom=10)
+    assert grid_level(lat, lng, max_cells=10) < grid_level(lat, lng, max_cells=1_000)
+    assert 1 <= fit_zoom(lat, lng) <= 14
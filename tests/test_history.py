@@ -0,0 +1,64 @@
+import time
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from utils.history import ALL_LEVELS, SnapshotStore
+from utils.processing import EXPERIENCE_DTYPE
+
+
+def frame(size: int = 300, shift: float = 0.0, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    salary = rng.lognormal(12 + shift, 0.3, size).round()
+    salary[rng.random(size) < 0.3] = 0
+    return pd.DataFrame(
+        {
+            "id": np.arange(size).astype(str),
+            "experience_name": pd.Categorical(
+                rng.choice(list(EXPERIENCE_DTYPE.categories), size), dtype=EXPERIENCE_DTYPE
+            ),
+            "schedule_name": pd.Categorical(rng.choice(["Полный день", "Удаленная работа"], size)),
+            "salary": salary,
+        }
+    )
+
+
+def test_snapshot_roundtrip_and_daily_aggregates(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    df = frame()
+    store.save("q", df, day=date(2024, 5, 1))
+
+    assert store.has("q", date(2024, 5, 1))
+    assert store.days("q") == ["2024-05-01"]
+    pd.testing.assert_frame_equal(store.load("q", "2024-05-01"), df)
+
+    median = store.trend("q", "median", until=date(2024, 5, 1))
+    paid = df[df["salary"] > 0]
+    expected = paid.groupby("experience_name", observed=True)["salary"].median()
+    assert median.columns.tolist() == [*expected.index, ALL_LEVELS]
+    assert np.allclose(median.iloc[0][expected.index], expected)
+    assert median.iloc[0][ALL_LEVELS] == paid["salary"].median()
+    assert store.trend("q", "vacancies", until=date(2024, 5, 1)).iloc[0][ALL_LEVELS] == len(df)
+
+
+def test_trend_window_and_same_day_replacement(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    today = date(2024, 5, 1)
+    for offset in range(120):
+        store.save("q", frame(50, shift=offset / 100, seed=offset), day=today - timedelta(days=offset))
+    store.save("q", frame(10), day=today)
+
+    trend = store.trend("q", "vacancies", days=90, until=today)
+    assert len(trend) == 90
+    assert trend.index[0] == pd.Timestamp(today - timedelta(days=89))
+    assert trend.iloc[-1][ALL_LEVELS] == 10
+
+    # Тренд строится по агрегатам, без чтения снимков.
+    for path in (tmp_path / "snapshots").rglob("*.parquet"):
+        path.unlink()
+    started = time.perf_counter()
+    assert len(store.trend("q", "median", days=90, until=today)) == 90
+    assert time.perf_counter() - started < 0.1
+
+    with pytest.raises(ValueError):
+        store.trend("q", "salary")
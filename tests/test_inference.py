@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from utils.inference import (
+    DEFAULT_MAX_SEQ_LENGTH,
+    InferenceConfig,
+    drift,
+    encode_texts,
+    inference_mode,
+    length_buckets,
+    load_encoder,
+)
+from utils.stub_models import StubEncoder
+
+
+def test_length_buckets_cover_all_rows_within_token_budget():
+    texts = ["x" * length for length in [5, 400, 12, 2000, 30, 7, 900, 60]] * 20
+
+    batches = length_buckets(texts, max_seq_length=128, batch_tokens=512, max_batch_size=16)
+
+    rows = np.concatenate(batches)
+    assert sorted(rows.tolist()) == list(range(len(texts)))
+    for batch in batches:
+        lengths = [len(texts[idx]) for idx in batch]
+        assert lengths == sorted(lengths)
+        # Оценка длины самого длинного текста, обрезанная до max_seq_length, в пределах бюджета.
+        longest = min(max(lengths) // 4 + 2, 128)
+        assert len(batch) <= 16
+        assert len(batch) * longest <= 512 or len(batch) == 1
+    # Короткие тексты идут большими батчами, длинные - маленькими.
+    assert len(batches[0]) == 16
+    assert len(batches[-1]) == 4
+
+
+def test_encode_texts_keeps_row_order():
+    texts = ["python sql", "очень длинный текст про docker и kubernetes " * 10, "", "python"]
+    encoder = StubEncoder()
+
+    result = encode_texts(encoder, texts, config=InferenceConfig(batch_tokens=16))
+
+    np.testing.assert_allclose(result, encoder.encode(texts))
+    assert encode_texts(encoder, []).shape == (0, 0)
+
+
+def test_drift_against_reference():
+    rng = np.random.default_rng(0)
+    reference = rng.normal(size=(50, 16)).astype(np.float32)
+
+    same = drift(reference, reference * 3)
+    assert same["mean_cosine"] == pytest.approx(1.0)
+    assert same["neighbour_agreement"] == 1.0
+
+    noisy = drift(reference, reference + rng.normal(scale=0.5, size=reference.shape))
+    assert noisy["min_cosine"] <= noisy["mean_cosine"] < 1.0
+    assert noisy["neighbour_agreement"] < 1.0
+
+
+def test_config_cache_suffixes():
+    assert InferenceConfig(backend="torch", max_seq_length=DEFAULT_MAX_SEQ_LENGTH).encoder_suffix == ""
+    assert InferenceConfig(backend="int8", max_seq_length=64).encoder_suffix == "-int8-len64"
+    assert InferenceConfig(llm_dtype="").llm_suffix == ""
+    assert InferenceConfig(llm_dtype="bf16").llm_suffix == "-bf16"
+
+
+def test_unknown_backend_and_inference_mode():
+    with pytest.raises(ValueError):
+        load_encoder("/nonexistent", InferenceConfig(backend="fp8"))
+    with inference_mode():
+        pass
@@ -0,0 +1,58 @@
+import multiprocessing
+import time
+import pandas as pd
+import pytest
+from utils.jobs import JobManager, QueueFull
+
+
+@pytest.fixture
+def manager(monkeypatch, tmp_path):
+    # Воркеры стартуют через spawn и читают настройки из окружения.
+    monkeypatch.setenv("HH_STUB_MODELS", "1")
+    monkeypatch.setenv("HH_CACHE_DIR", str(tmp_path))
+    manager = JobManager(workers=1, threads=1, max_pending=2)
+    yield manager
+    manager.shutdown()
+
+
+def test_summarize_groups_job_streams_progress(manager):
+    df = pd.DataFrame(
+        {
+            "experience_name": ["Нет опыта"] * 3 + ["Более 6 лет"] * 3,
+            "snippet_requirement": ["знание python", "знание sql", "знание python", "опыт go", "опыт go", "опыт k8s"],
+        }
+    )
+
+    job = manager.submit("summarize_groups", df, "experience_name", ["snippet_requirement"], n_clusters=2, key="q")
+    assert manager.submit("summarize_groups", df, key="q") is job
+
+    summaries, stats, _ = job.result(timeout=120)
+
+    assert set(summaries["snippet_requirement"]) == {"Нет опыта", "Более 6 лет"}
+    assert stats.sentences > 0
+    time.sleep(0.2)
+    assert job.stage == "done"
+    assert job.started_at is not None
+    assert manager.stats()["completed"] == 1
+
+
+def test_queue_is_bounded(manager):
+    jobs = [manager.submit("paraphrase", ["a"]), manager.submit("paraphrase", ["b"])]
+    with pytest.raises(QueueFull):
+        manager.submit("paraphrase", ["c"])
+
+    for job in jobs:
+        job.result(timeout=120)
+    time.sleep(0.2)
+    assert manager.stats()["queued"] == 0
+
+
+def test_broken_pool_is_recreated(manager):
+    manager.submit("warm_up").result(timeout=120)
+    # Воркер убит, как при OOM: пул сломан, следующая задача поднимает новый.
+    for process in multiprocessing.active_children():
+        process.kill()
+    time.sleep(1)
+
+    assert manager.submit("warm_up").result(timeout=120) is None
+    assert manager.stats()["restarts"] == 1
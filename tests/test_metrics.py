@@ -0,0 +1,138 @@
+import json
+import logging
+import re
+import pytest
+import aiohttp
+from aioresponses import aioresponses
+from utils import metrics
+from utils.cache import ResponseCache
+from utils.metrics import JSONFormatter, Registry, profile
+from utils.parsing import fetch_page
+from utils.ratelimit import RateLimiter
+
+API_PATTERN = re.compile(r"^https://api\.hh\.ru/vacancies\?.*$")
+
+
+def test_registry_counters_and_histograms():
+    registry = Registry(buckets=(0.1, 1.0))
+    registry.inc("requests_total", status="2xx")
+    registry.inc("requests_total", 2, status="2xx")
+    registry.inc("bytes_total", 100)
+    registry.observe("latency_seconds", 0.05)
+    registry.observe("latency_seconds", 0.5)
+    registry.observe("latency_seconds", 5)
+
+    assert registry.counter("requests_total", status="2xx") == 3
+    assert registry.counter("requests_total", status="4xx") == 0
+    assert registry.histogram("latency_seconds") == (3, 5.55)
+
+    text = registry.prometheus()
+    assert "# TYPE hh_requests_total counter" in text
+    assert 'hh_requests_total{status="2xx"} 3' in text
+    assert "hh_bytes_total 100" in text
+    # Корзины гистограммы накопительные.
+    assert 'hh_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'hh_latency_seconds_bucket{le="1.0"} 2' in text
+    assert 'hh_latency_seconds_bucket{le="+Inf"} 3' in text
+    assert "hh_latency_seconds_count 3" in text
+
+
+def test_registry_merge_and_drain():
+    worker, main = Registry(), Registry()
+    worker.inc("sentences_encoded_total", 10)
+    worker.observe("stage_seconds", 0.2, stage="embeddings")
+    main.inc("sentences_encoded_total", 5)
+
+    snapshot = json.loads(json.dumps(worker.drain()))
+    main.merge(snapshot)
+    main.merge(snapshot)
+
+    assert worker.counter("sentences_encoded_total") == 0
+    assert main.counter("sentences_encoded_total") == 25
+    assert main.histogram("stage_seconds", stage="embeddings") == (2, 0.4)
+
+
+def test_span_records_time_failures_and_json_log(caplog):
+    registry = Registry()
+    with caplog.at_level(logging.INFO, logger="hh.metrics"):
+        with registry.span("parse_job", query="python"):
+            pass
+        with pytest.raises(ValueError):
+            with registry.span("kmeans"):
+                raise ValueError
+
+    assert registry.histogram("stage_seconds", stage="parse_job")[0] == 1
+    assert registry.counter("stage_failures_total", stage="kmeans") == 1
+    assert registry.counter("stage_failures_total", stage="parse_job") == 0
+    events = [json.loads(JSONFormatter().format(record)) for record in caplog.records]
+    assert events[0]["stage"] == "parse_job" and events[0]["query"] == "python"
+    assert events[1]["failed"] is True
+
+
+def test_write_prometheus(tmp_path):
+    registry = Registry()
+    registry.inc("http_requests_total", status="429")
+    path = tmp_path / "metrics" / "hh.prom"
+    registry.write_prometheus(str(path))
+    assert 'hh_http_requests_total{status="429"} 1' in path.read_text(encoding="utf-8")
+
+
+def test_profile_is_noop_when_disabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "PROFILE_DIR", str(tmp_path))
+    with profile("search", "") as path:
+        assert path is None
+    assert not list(tmp_path.iterdir())
+
+    with profile("search", "cprofile") as path:
+        sum(range(1000))
+    assert path.endswith(".prof")
+    assert list(tmp_path.glob("search-*.prof"))
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_counts_requests_retries_and_bytes():
+    registry = metrics.get_registry()
+    registry.reset()
+    url = "https://api.hh.ru/vacancies"
+    params = {"text": "developer", "page": 0}
+    payload = {"items": [{"id": 1}]}
+
+    with aioresponses() as m:
+        m.get(API_PATTERN, status=429, headers={"Retry-After": "0"})
+        m.get(API_PATTERN, status=500)
+        m.get(API_PATTERN, payload=payload)
+        async with aiohttp.ClientSession() as session:
+            assert await fetch_page(session, url, params, RateLimiter(retry_base=0)) == payload
+
+    assert registry.counter("http_requests_total", status="429") == 1
+    assert registry.counter("http_requests_total", status="5xx") == 1
+    assert registry.counter("http_requests_total", status="2xx") == 1
+    assert registry.counter("http_retries_total") == 2
+    assert registry.counter("http_response_bytes_total") == len(json.dumps(payload))
+    assert registry.histogram("http_request_seconds")[0] == 3
+    registry.reset()
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_counts_cache_hits_misses_and_revalidations(tmp_path):
+    registry = metrics.get_registry()
+    registry.reset()
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), ttl=60)
+    url = "https://api.hh.ru/vacancies"
+    params = {"text": "developer", "page": 0}
+    limiter = RateLimiter(retry_base=0)
+
+    with aioresponses() as m:
+        m.get(API_PATTERN, payload={"items": [1]}, headers={"ETag": '"v1"'})
+        m.get(API_PATTERN, status=304)
+        async with aiohttp.ClientSession() as session:
+            await fetch_page(session, url, params, limiter, cache)
+            await fetch_page(session, url, params, limiter, cache)
+            cache.ttl = -1
+            cache.save(url, params, {"items": [1]}, {"ETag": '"v1"'})
+            await fetch_page(session, url, params, limiter, cache)
+
+    assert registry.counter("http_cache_total", result="miss") == 1
+    assert registry.counter("http_cache_total", result="hit") == 1
+    assert registry.counter("http_cache_total", result="revalidated") == 1
+    registry.reset()
@@ -1,9 +1,14 @@
+import re
+from datetime import datetime, timedelta
 import pytest
 import asyncio
 import aiohttp
 from unittest.mock import patch
-from aioresponses import aioresponses
-from utils.parsing import fetch_page, parse_job, get_key_words
+from aioresponses import aioresponses, CallbackResult
+from utils.ratelimit import RateLimiter, parse_retry_after
+from utils.parsing import CrawlStats, fetch_page, iter_pages, parse_job, plan_pages, get_key_words
+
+API_PATTERN = re.compile(r"^https://api\.hh\.ru/vacancies\?.*$")
 
 @pytest.mark.asyncio
 async def test_fetch_page_success():
@@ -11,10 +16,10 @@ async def test_fetch_page_success():
     params = {"text": "developer", "area": "113", "per_page": "10", "page": 1}
     
     with aioresponses() as m:
-        m.get(url, payload={"items": [{"id": 1, "name": "Job 1"}, {"id": 2, "name": "Job 2"}]})
+        m.get(API_PATTERN, payload={"items": [{"id": 1, "name": "Job 1"}, {"id": 2, "name": "Job 2"}]})
         
         async with aiohttp.ClientSession() as session:
-            result = await fetch_page(session, url, params, asyncio.Semaphore(1))
+            result = await fetch_page(session, url, params, RateLimiter(retry_base=0))
     
     assert result == {"items": [{"id": 1, "name": "Job 1"}, {"id": 2, "name": "Job 2"}]}
 
@@ -24,10 +29,10 @@ async def test_fetch_page_rate_limit():
     params = {"text": "developer", "area": "113", "per_page": "10", "page": 1}
     
     with aioresponses() as m:
-        m.get(url, status=429)
+        m.get(API_PATTERN, status=429, headers={"Retry-After": "0"}, repeat=True)
         
         async with aiohttp.ClientSession() as session:
-            result = await fetch_page(session, url, params, asyncio.Semaphore(1))
+            result = await fetch_page(session, url, params, RateLimiter(retry_base=0))
     
     assert result is None
 
@@ -37,15 +42,62 @@ async def test_fetch_page_forbidden():
     params = {"text": "developer", "area": "113", "per_page": "10", "page": 1}
     
     with aioresponses() as m:
-        m.get(url, status=403)
+        m.get(API_PATTERN, status=403)
         
         async with aiohttp.ClientSession() as session:
-            result = await fetch_page(session, url, params, asyncio.Semaphore(1))
+            result = await fetch_page(session, url, params, RateLimiter(retry_base=0))
     
 
     assert result is None
 
 
+@pytest.mark.asyncio
+async def test_fetch_page_retries_invalid_json():
+    url = "https://api.hh.ru/vacancies"
+    params = {"text": "developer", "area": "113", "per_page": "10", "page": 1}
+
+    with aioresponses() as m:
+        m.get(API_PATTERN, body="<html>", content_type="application/json")
+        m.get(API_PATTERN, body="<html>", content_type="text/html")
+        m.get(API_PATTERN, payload={"items": [{"id": 1}]})
+
+        async with aiohttp.ClientSession() as session:
+            result = await fetch_page(session, url, params, RateLimiter(retry_base=0))
+
+    assert result == {"items": [{"id": 1}]}
+
+
+@pytest.mark.asyncio
+async def test_parse_job_counts_invalid_json_page_as_lost():
+    stats = CrawlStats()
+    with aioresponses() as m:
+        m.get(API_PATTERN, body="{", content_type="application/json", repeat=True)
+        result = await parse_job("developer", 1, stats=stats, limiter=RateLimiter(retry_base=0))
+
+    assert result == []
+    assert stats.lost_pages == 1
+
+
+@pytest.mark.asyncio
+async def test_crawl_stats_count_requests_and_cache_of_one_crawl(tmp_path):
+    from utils.cache import ResponseCache
+
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), ttl=60)
+    limiter = RateLimiter(retry_base=0)
+    with aioresponses() as m:
+        m.get(API_PATTERN, status=500)
+        m.get(API_PATTERN, payload={"found": 1, "pages": 1, "items": [{"id": "1"}]}, repeat=True)
+        await parse_job("developer", 1, stats=CrawlStats(), limiter=limiter, cache=cache)
+        stats = CrawlStats()
+        await parse_job("developer", 1, stats=stats, limiter=limiter, cache=cache)
+
+    # Второй обход видит только свои обращения, а не накопленные лимитером.
+    assert limiter.requests == 2
+    assert stats.http_requests == 0
+    assert (stats.cache_hits, stats.cache_misses) == (1, 0)
+    assert stats.seconds > 0
+
+
 @pytest.mark.asyncio
 async def test_parse_job():
     job_title = "developer"
@@ -53,14 +105,162 @@ async def test_parse_job():
     url = "https://api.hh.ru/vacancies"
 
     with aioresponses() as m:
-        m.get(url, payload={"items": [{"id": 1, "name": "Job 1"}]})
+        m.get(API_PATTERN, payload={"items": [{"id": 1, "name": "Job 1"}]})
         
-        result = await parse_job(job_title, number_of_pages)
+        result = await parse_job(job_title, number_of_pages, limiter=RateLimiter(retry_base=0))
     
     assert len(result) == 1
     assert result[0]["name"] == "Job 1"
 
 
+@pytest.mark.asyncio
+async def test_fetch_page_honors_retry_after():
+    url = "https://api.hh.ru/vacancies"
+    params = {"text": "developer", "area": "113", "per_page": "10", "page": 1}
+    limiter = RateLimiter(retry_base=0, concurrency=4)
+
+    with aioresponses() as m:
+        m.get(API_PATTERN, status=429, headers={"Retry-After": "1"})
+        m.get(API_PATTERN, payload={"items": []})
+
+        async with aiohttp.ClientSession() as session:
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            result = await fetch_page(session, url, params, limiter)
+            elapsed = loop.time() - started
+
+    assert result == {"items": []}
+    assert elapsed >= 1
+    assert limiter.throttled == 1
+    assert limiter.requests == 2
+    assert limiter.concurrency < 4
+
+
+@pytest.mark.asyncio
+async def test_parse_job_requeues_failed_pages():
+    stats = CrawlStats()
+    limiter = RateLimiter(retry_base=0)
+
+    with aioresponses() as m:
+        m.get(API_PATTERN, payload={"found": 200, "pages": 2, "items": [{"id": "0"}]})
+        for _ in range(3):
+            m.get(API_PATTERN, status=503)
+        m.get(API_PATTERN, payload={"found": 200, "pages": 2, "items": [{"id": "1"}]})
+
+        result = await parse_job("developer", stats=stats, limiter=limiter)
+
+    assert [item["id"] for item in result] == ["0", "1"]
+    assert stats.requeued == 1
+    assert stats.lost_pages == 0
+    assert limiter.errors == 3
+    assert limiter.requests_per_second > 0
+
+
+@pytest.mark.asyncio
+async def test_parse_job_counts_lost_pages():
+    stats = CrawlStats()
+
+    with aioresponses() as m:
+        m.get(API_PATTERN, status=500, repeat=True)
+        result = await parse_job("developer", stats=stats, limiter=RateLimiter(retry_base=0))
+
+    assert result == []
+    assert stats.lost_pages == 1
+
+
+@pytest.mark.asyncio
+async def test_iter_pages_yields_pages_as_they_complete():
+    def callback(url, **kwargs):
+        page = int(kwargs["params"]["page"])
+        return CallbackResult(payload={"found": 250, "pages": 3, "items": [{"id": str(page)}, {"id": "0"}]})
+
+    with aioresponses() as m:
+        m.get(API_PATTERN, callback=callback, repeat=True)
+        pages = [page async for page in iter_pages("developer", limiter=RateLimiter(retry_base=0))]
+
+    assert len(pages) == 3
+    assert sorted(item["id"] for page in pages for item in page) == ["0", "1", "2"]
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after(None) is None
+
+
+def test_plan_pages():
+    assert list(plan_pages(pages=1, per_page=100)) == []
+    assert list(plan_pages(pages=4, per_page=100)) == [1, 2, 3]
+    assert list(plan_pages(pages=200, per_page=100)) == list(range(1, 20))
+    assert list(plan_pages(pages=4, per_page=100, max_pages=2)) == [1]
+
+
+@pytest.mark.asyncio
+async def test_parse_job_fetches_only_existing_pages():
+    stats = CrawlStats()
+
+    def callback(url, **kwargs):
+        page = int(kwargs["params"]["page"])
+        return CallbackResult(
+            payload={"found": 150, "pages": 2, "items": [{"id": f"{page}-{i}"} for i in range(3)]}
+        )
+
+    with aioresponses() as m:
+        m.get(API_PATTERN, callback=callback, repeat=True)
+        result = await parse_job("developer", number_of_pages=100, stats=stats, limiter=RateLimiter(retry_base=0))
+
+    assert len(result) == 6
+    assert stats.requests == 2
+    assert stats.saved_requests == 98
+
+
+@pytest.mark.asyncio
+async def test_parse_job_splits_capped_query():
+    stats = CrawlStats()
+
+    def callback(url, **kwargs):
+        params = kwargs["params"]
+        if "date_from" not in params:
+            return CallbackResult(payload={"found": 5000, "pages": 20, "items": [{"id": "root"}]})
+        span = datetime.fromisoformat(params["date_to"]) - datetime.fromisoformat(params["date_from"])
+        found = 3000 if span > timedelta(days=20) else 1000
+        items = [{"id": f"{params['date_from']}-{params['page']}"}, {"id": "root"}]
+        return CallbackResult(payload={"found": found, "pages": 1, "items": items})
+
+    with aioresponses() as m:
+        m.get(API_PATTERN, callback=callback, repeat=True)
+        result = await parse_job("developer", stats=stats, limiter=RateLimiter(retry_base=0))
+
+    ids = [item["id"] for item in result]
+    assert len(ids) == len(set(ids))
+    assert stats.found == 5000
+    assert stats.slices > 0
+    assert stats.duplicates > 0
+
+
+@pytest.mark.asyncio
+async def test_parse_job_against_stub_server(monkeypatch):
+    # Полный обход локальной заглушки API: нарезка по датам, 429 и 5xx по пути.
+    from aiohttp.test_utils import TestServer
+    from benchmarks.hh_stub import StubConfig, make_app
+    from utils import parsing
+
+    config = StubConfig(
+        vacancies=3000, latency=0, error_rate=0.05, throttle_rate=0.2, throttle_burst=2, retry_after=0
+    )
+    app = make_app(config)
+    stats = CrawlStats()
+    async with TestServer(app) as server:
+        monkeypatch.setattr(parsing, "API_URL", str(server.make_url("/vacancies")))
+        result = await parse_job("python", stats=stats, limiter=RateLimiter(rate=1000, burst=100, retry_base=0))
+
+    assert stats.found == 3000
+    assert stats.slices > 0
+    assert stats.lost_pages == 0
+    assert len({item["id"] for item in result}) == 3000
+    assert app["served"][429] > 0 and app["served"][200] > 0
+
+
 def test_get_key_words():
     keywords = ["developer", "engineer"]
     
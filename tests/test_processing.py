@@ -0,0 +1,140 @@
+import pandas as pd
+from utils.processing import (
+    EXPERIENCE_DTYPE,
+    SELECTED_COLUMNS,
+    column_paths,
+    compile_extractor,
+    concat_chunks,
+    fill_gaps,
+    flatten,
+    merge_entries,
+    process_dataframe,
+    process_page,
+)
+
+
+def make_item(idx: int, experience: str, salary: dict = None, address: dict = None) -> dict:
+    return {
+        "id": str(idx),
+        "premium": False,
+        "name": f"Job {idx}",
+        "has_test": False,
+        "response_letter_required": False,
+        "area": {"id": "1", "name": "Москва"},
+        "salary": salary,
+        "address": address,
+        "published_at": "2025-01-01T00:00:00+0300",
+        "created_at": "2025-01-01T00:00:00+0300",
+        "snippet": {"requirement": "Python", "responsibility": "Писать код"},
+        "schedule": {"id": "fullDay", "name": "Полный день"},
+        "professional_roles": [{"id": "96", "name": "Программист, разработчик"}],
+        "experience": {"id": "between1And3", "name": experience},
+        "employment": {"id": "full", "name": "Полная занятость"},
+    }
+
+
+def test_process_page_handles_missing_columns():
+    chunk = process_page([make_item(1, "Нет опыта", address={"lat": 55.7, "lng": 37.6})])
+
+    assert len(chunk) == 1
+    assert chunk["salary"].tolist() == [0]
+    assert set(SELECTED_COLUMNS) - {"salary_from", "salary_to", "salary_currency"} <= set(chunk.columns)
+
+
+def test_concat_chunks_keeps_experience_order():
+    address = {"lat": 55.7, "lng": 37.6}
+    salary = {"from": 100000, "to": None, "currency": "RUR"}
+    chunks = [
+        process_page([make_item(1, "Более 6 лет", salary, address)]),
+        process_page([make_item(2, "Нет опыта", salary, address)]),
+        process_page([make_item(3, "От 3 до 6 лет")]),
+    ]
+
+    df = concat_chunks(chunks)
+
+    assert df["experience_name"].tolist() == ["Нет опыта", "Более 6 лет"]
+    assert df["salary"].tolist() == [100000, 100000]
+    assert concat_chunks([]).empty
+
+
+def test_column_paths():
+    assert column_paths("salary_from") == [("salary_from",), ("salary", "from")]
+    assert ("response_letter_required",) in column_paths("response_letter_required")
+
+
+def test_extractor_matches_flatten_semantics():
+    items = [
+        make_item(1, "Нет опыта", {"from": 1000, "to": None, "currency": "USD"}, {"lat": 55.7, "lng": 37.6}),
+        make_item(2, "Более 6 лет"),
+    ]
+    items[1]["professional_roles"].append({"id": "124", "name": "Тестировщик"})
+    items[1]["premium"] = None
+
+    legacy = pd.DataFrame(merge_entries(list(map(flatten, items))))[SELECTED_COLUMNS]
+    result = compile_extractor(SELECTED_COLUMNS)(items)
+
+    assert result["professional_roles_name"].tolist() == ["Программист, разработчик", "Тестировщик"]
+    assert result["premium"].tolist() == [False, None]
+    assert result["salary_from"].tolist()[0] == 1000
+    assert pd.isna(result["salary_to"]).tolist() == [True, True]
+    pd.testing.assert_frame_equal(
+        process_dataframe(legacy).reset_index(drop=True),
+        process_dataframe(result).reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_fill_gaps_uses_currency_rates():
+    df = pd.DataFrame(
+        {
+            "salary_from": [1000, None, 2000, 500, None],
+            "salary_to": [None, 3000, None, None, None],
+            "salary_currency": ["RUR", "USD", "EUR", "XXX", None],
+            "address_lat": [55.0, 56.0, None, 54.0, 53.0],
+            "address_lng": [37.0, 38.0, 38.0, 38.0, 39.0],
+        }
+    )
+
+    result = fill_gaps(df)
+
+    assert result.index.tolist() == [0, 1, 3, 4]
+    assert result["salary"].tolist() == [1000, 300000, 0, 0]
+    assert "salary_currency" not in result.columns
+
+
+def test_process_dataframe_types_and_order():
+    items = [
+        make_item(1, "Более 6 лет", address={"lat": 55.7, "lng": 37.6}),
+        make_item(2, "Нет опыта", {"from": 1000, "to": None, "currency": "RUR"}, {"lat": 55.7, "lng": 37.6}),
+    ]
+    items[0]["has_test"] = True
+    df = compile_extractor(SELECTED_COLUMNS)(items)
+
+    result = process_dataframe(df)
+
+    assert result["experience_name"].dtype == EXPERIENCE_DTYPE
+    assert result["schedule_name"].dtype == "category"
+    assert result["experience_name"].tolist() == ["Нет опыта", "Более 6 лет"]
+    assert result["has_test"].tolist() == [0, 1]
+    assert result["is_salary_set"].tolist() == ["Указана", "Не указана"]
+
+
+def test_synthetic_items_cover_selected_columns():
+    # Бенчмарки имеют смысл, только если генератор заполняет все колонки SELECTED_COLUMNS.
+    from benchmarks.synthetic import tile_items
+
+    df = compile_extractor(SELECTED_COLUMNS)(tile_items(300, pool=100))
+
+    assert list(df.columns) == SELECTED_COLUMNS
+    assert not df.isna().all().any()
+    assert df["id"].is_unique
+    assert len(process_dataframe(df)) > 0
+
+
+def test_process_dataframe_without_id_column():
+    df = compile_extractor(SELECTED_COLUMNS)([make_item(1, "Нет опыта", address={"lat": 55.7, "lng": 37.6})])
+
+    result = process_dataframe(df.drop(columns="id"))
+
+    assert len(result) == 1
+    assert "id" not in result.columns
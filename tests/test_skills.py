@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from utils.history import ALL_LEVELS
+from utils import skills
+from utils.skills import SkillMatcher, skill_report, tokenize
+
+SKILLS = {
+    "Python": ["питон"],
+    "C++": [],
+    ".NET": ["asp.net"],
+    "CI/CD": [],
+    "Машинное обучение": ["machine learning", "машинного обучения"],
+    "Работа с Git": ["опыт работы с git"],
+}
+STOPWORDS = ["и", "с", "на"]
+
+
+def matcher() -> SkillMatcher:
+    return SkillMatcher(SKILLS, stopwords=STOPWORDS)
+
+
+def matches(texts: list[str]) -> list[tuple[int, str]]:
+    m = matcher()
+    rows, skills = m.match(pa.array(texts, type=pa.string()))
+    return [(int(row), m.names[skill]) for row, skill in zip(rows, skills)]
+
+
+def test_tokenize_normalizes_words():
+    rows, _, codes, words = tokenize(
+        pa.array(["<highlighttext>Python</highlighttext>, C++ и ASP.NET.", None, "CI/CD; http://hh.ru"]),
+        STOPWORDS,
+    )
+    assert rows.tolist() == [0, 0, 0, 2, 2]
+    assert words.take(pa.array(codes)).to_pylist() == ["python", "c++", "asp.net", "ci", "cd"]
+
+
+def test_matcher_finds_synonyms_and_phrases():
+    found = matches(
+        [
+            "Опыт с Питон и C++; знание ASP.NET.",
+            "Опыт работы с Git, CI/CD, основы Machine Learning",
+            "Python, python и снова PYTHON",
+            "Машинного, а не обучения",
+        ]
+    )
+    assert found == [
+        (0, "Python"),
+        (0, "C++"),
+        (0, ".NET"),
+        (1, "CI/CD"),
+        (1, "Машинное обучение"),
+        (1, "Работа с Git"),
+        (2, "Python"),
+    ]
+
+
+def test_phrases_do_not_cross_texts_or_gaps():
+    # Конец одного текста и начало следующего не образуют фразу,
+    # как и слова фразы, разделенные посторонним словом.
+    assert matches(["machine", "learning", "machine deep learning"]) == []
+
+
+def test_default_skills_ignore_generic_words():
+    m = SkillMatcher(skills.SKILLS, stopwords=STOPWORDS)
+    texts = [
+        "Написание тестов, тесты, unit",
+        "Высшее образование, ML-подход, TS, node, pg",
+        "Опыт с GitLab, Grafana, Confluence, Bash и Hive",
+        "Покрытие unit-тестами, unit-тестов",
+    ]
+    rows, found = m.match(pa.array(texts, type=pa.string()))
+    found = [(int(row), m.names[skill]) for row, skill in zip(rows, found)]
+
+    assert [name for row, name in found if row < 2] == []
+    assert (3, "Unit-тесты") in found
+    assert {name for row, name in found if row == 2} == {"GitLab", "Grafana", "Confluence", "Bash", "Hive"}
+
+
+def test_skill_report_frequencies_and_cooccurrence():
+    df = pd.DataFrame(
+        {
+            "snippet_requirement": ["Python, C++", "Python", None, "CI/CD"],
+            "snippet_responsibility": ["machine learning", None, "Python", "Python"],
+            "experience_name": ["Нет опыта", "Нет опыта", "От 3 до 6 лет", None],
+        }
+    )
+    report = skill_report(df, matcher())
+
+    assert report.frequencies.index.tolist() == ["Python", "C++", "CI/CD", "Машинное обучение"]
+    assert report.frequencies.loc["Python", "Нет опыта"] == 2
+    assert report.frequencies.loc["Python", "От 3 до 6 лет"] == 1
+    assert report.frequencies.loc["Python", ALL_LEVELS] == 4
+    assert report.vacancies[ALL_LEVELS] == 4
+    assert report.shares.loc["Python", "Нет опыта"] == 1.0
+    assert report.shares.loc["Python", "Более 6 лет"] == 0.0
+    assert report.cooccurrence.loc["Python", "C++"] == 1
+    assert report.cooccurrence.loc["Python", "CI/CD"] == 1
+    assert report.cooccurrence.loc["C++", "CI/CD"] == 0
+    assert np.array_equal(np.diag(report.cooccurrence), report.frequencies[ALL_LEVELS])
+
+
+def test_skill_report_without_matches():
+    df = pd.DataFrame({"snippet_requirement": ["ничего"], "experience_name": ["Нет опыта"]})
+    report = skill_report(df, matcher())
+    assert report.frequencies.empty
+    assert report.cooccurrence.empty
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+from utils.processing import EXPERIENCE_DTYPE
+from utils.stats import aggregate
+
+
+def frame(size: int = 500, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    levels = list(EXPERIENCE_DTYPE.categories)
+    salary = rng.lognormal(12, 0.5, size).round()
+    salary[rng.random(size) < 0.3] = 0
+    return pd.DataFrame(
+        {
+            "experience_name": pd.Categorical(rng.choice(levels, size), dtype=EXPERIENCE_DTYPE),
+            "schedule_name": pd.Categorical(rng.choice(["Полный день", "Удаленная работа"], size)),
+            "employment_name": pd.Categorical(rng.choice(["Полная занятость", "Стажировка"], size)),
+            "salary": salary,
+            "is_salary_set": np.where(salary == 0, "Не указана", "Указана"),
+        }
+    )
+
+
+def test_salary_stats_match_groupby():
+    df = frame()
+    stats = aggregate(df)
+
+    paid = df[df["salary"] > 0]
+    expected = paid.groupby("experience_name", observed=True)["salary"].agg(["count", "mean", "median"])
+    assert stats.salary.index.tolist() == expected.index.tolist()
+    assert np.allclose(stats.salary[["count", "mean", "median"]], expected)
+    assert stats.overall["median"] == paid["salary"].median()
+    assert stats.overall["q1"] == paid["salary"].quantile(0.25)
+
+
+def test_box_fences_stay_inside_whiskers():
+    df = frame()
+    stats = aggregate(df)
+
+    iqr = stats.salary["q3"] - stats.salary["q1"]
+    assert (stats.salary["lowerfence"] >= stats.salary["q1"] - 1.5 * iqr).all()
+    assert (stats.salary["upperfence"] <= stats.salary["q3"] + 1.5 * iqr).all()
+    assert (stats.salary["lowerfence"] <= stats.salary["q1"]).all()
+
+
+def test_counts_and_histograms_cover_every_row():
+    df = frame()
+    df.loc[:9, "experience_name"] = np.nan
+    stats = aggregate(df, bins=10)
+
+    assert stats.counts["schedule_name"].sum() == len(df)
+    assert stats.counts["experience_name"].sum() == len(df) - 10
+    assert stats.counts["is_salary_set"]["Указана"] == (df["salary"] > 0).sum()
+    assert stats.overall_histogram["count"].sum() == (df["salary"] > 0).sum()
+    known = df["experience_name"].notna() & (df["salary"] > 0)
+    assert stats.histogram["count"].sum() == known.sum()
+    assert len(stats.overall_histogram) <= 10
+
+
+def test_no_salaries():
+    df = frame()
+    df["salary"] = 0.0
+    stats = aggregate(df)
+
+    assert stats.salary.empty
+    assert stats.histogram.empty and stats.overall_histogram.empty
@@ -0,0 +1,120 @@
+import re
+from datetime import datetime, timedelta
+import pytest
+from aioresponses import aioresponses, CallbackResult
+from utils.ratelimit import RateLimiter
+from utils.parsing import CrawlStats, parse_job, sync_job
+from utils.store import VacancyStore, utc_published
+
+API_PATTERN = re.compile(r"^https://api\.hh\.ru/vacancies\?.*$")
+
+
+def vacancy(key: str, published: datetime) -> dict:
+    return {"id": key, "name": f"Вакансия {key}", "published_at": published.strftime("%Y-%m-%dT%H:%M:%S+0300")}
+
+
+def test_utc_published():
+    assert utc_published("2024-03-01T12:30:00+0300") == "2024-03-01T09:30:00"
+    assert utc_published(None) is None
+
+
+def test_store_merges_by_id_and_reopens(tmp_path):
+    store = VacancyStore(str(tmp_path / "vacancies.sqlite"))
+    now = datetime.now()
+
+    assert store.merge("q", [vacancy("1", now), vacancy("2", now - timedelta(days=1))]) == 2
+    assert store.merge("q", [{**vacancy("1", now), "name": "Новое название"}]) == 0
+    assert store.close_missing("q", {"1"}) == 1
+    assert [item["id"] for item in store.items("q")] == ["1"]
+    assert store.items("q")[0]["name"] == "Новое название"
+
+    # Вакансия снова в выдаче - она снова открыта.
+    store.merge("q", [vacancy("2", now)])
+    assert sorted(item["id"] for item in store.items("q")) == ["1", "2"]
+    assert store.items("other") == []
+
+
+def test_store_tracks_open_vacancies_per_query(tmp_path):
+    store = VacancyStore(str(tmp_path / "vacancies.sqlite"))
+    now = datetime.now()
+
+    assert store.merge("a", [vacancy("1", now), vacancy("2", now)]) == 2
+    # Вакансия, уже сохраненная другим запросом, для этого запроса новая.
+    assert store.merge("b", [vacancy("1", now)]) == 1
+    assert store.close_missing("a", {"2"}) == 1
+
+    assert [item["id"] for item in store.items("a")] == ["2"]
+    assert [item["id"] for item in store.items("b")] == ["1"]
+    assert store.stats()["open"] == 2
+
+
+def test_store_watermark_and_expiry(tmp_path):
+    store = VacancyStore(str(tmp_path / "vacancies.sqlite"))
+    now = datetime.now()
+    store.merge("q", [vacancy("1", now - timedelta(days=40)), vacancy("2", now - timedelta(hours=2))])
+    store.advance("q", reconciled=True)
+
+    watermark, synced_at, reconciled_at = store.watermark("q")
+    expected = datetime.strptime(vacancy("2", now - timedelta(hours=2))["published_at"], "%Y-%m-%dT%H:%M:%S%z")
+    assert watermark == expected.astimezone().replace(tzinfo=None)
+    assert synced_at == reconciled_at
+    assert store.close_expired("q", timedelta(days=30)) == 1
+    assert store.stats() == {"vacancies": 2, "open": 1, "closed": 1, "queries": 1}
+
+
+@pytest.mark.asyncio
+async def test_parse_job_incremental_requests_only_new_vacancies(tmp_path):
+    store = VacancyStore(str(tmp_path / "vacancies.sqlite"))
+    now = datetime.now()
+    listing = [vacancy(str(idx), now - timedelta(days=idx)) for idx in range(1, 6)]
+    windows = []
+
+    def callback(url, **kwargs):
+        params = kwargs["params"]
+        windows.append(params.get("date_from"))
+        items = listing if "date_from" not in params else [vacancy("new", now)]
+        return CallbackResult(payload={"found": len(items), "pages": 1, "items": items})
+
+    limiter = RateLimiter(retry_base=0)
+    with aioresponses() as m:
+        m.get(API_PATTERN, callback=callback, repeat=True)
+        first = await parse_job("python", stats=CrawlStats(), limiter=limiter, store=store)
+        stats = CrawlStats()
+        second = await parse_job("python", stats=stats, limiter=limiter, store=store)
+
+    assert len(first) == 5
+    assert windows[0] is None
+    # Второй обход начинается от самой свежей вакансии за вычетом перекрытия.
+    date_from = datetime.fromisoformat(windows[1])
+    watermark = datetime.strptime(listing[0]["published_at"], "%Y-%m-%dT%H:%M:%S%z").astimezone()
+    assert date_from == watermark.replace(tzinfo=None) - timedelta(hours=1)
+    assert stats.requests == 1
+    assert stats.found == 1
+    assert stats.new == 1
+    assert [item["id"] for item in second][0] == "new"
+    assert len(second) == 6
+
+
+@pytest.mark.asyncio
+async def test_parse_job_reconciliation_closes_missing(tmp_path):
+    store = VacancyStore(str(tmp_path / "vacancies.sqlite"))
+    now = datetime.now()
+    listings = [
+        [vacancy("1", now), vacancy("2", now - timedelta(days=1))],
+        [vacancy("1", now)],
+    ]
+
+    def callback(url, **kwargs):
+        items = listings[0] if len(listings) == 1 else listings.pop(0)
+        return CallbackResult(payload={"found": len(items), "pages": 1, "items": items})
+
+    limiter = RateLimiter(retry_base=0)
+    with aioresponses() as m:
+        m.get(API_PATTERN, callback=callback, repeat=True)
+        await parse_job("python", limiter=limiter, store=store)
+        stats = CrawlStats()
+        # Нулевой интервал сверки: каждый обход полный и закрывает пропавшие.
+        result = await sync_job("python", store, stats=stats, limiter=limiter, reconcile_interval=0)
+
+    assert [item["id"] for item in result] == ["1"]
+    assert stats.closed == 1
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils import summarization
+from utils.cache import EmbeddingCache, SQLiteStore
+from utils.stub_models import StubEncoder, StubGenerator
+
+
+class FakeEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, task=None):
+        self.calls.append(list(texts))
+        return np.array([[len(text), text.count("a"), 1.0] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    fake = FakeEncoder()
+    monkeypatch.setattr(summarization, "get_embedding_model", lambda: fake)
+    return fake
+
+
+def test_generate_embeddings_deduplicates_batch(encoder, tmp_path):
+    cache = EmbeddingCache(str(tmp_path), model_id="fake", task="text-matching")
+
+    result = summarization.generate_embeddings(["aa", "b", "aa", "aa"], cache=cache)
+
+    assert encoder.calls == [["b", "aa"]]
+    assert result.shape == (4, 3)
+    assert np.array_equal(result[0], result[2])
+    assert cache.misses == 2
+
+
+def test_generate_embeddings_encodes_only_misses(encoder, tmp_path):
+    cache = EmbeddingCache(str(tmp_path), model_id="fake", task="text-matching")
+    first = summarization.generate_embeddings(["aa", "b"], cache=cache)
+
+    reopened = EmbeddingCache(str(tmp_path), model_id="fake", task="text-matching")
+    second = summarization.generate_embeddings(["b", "ccc", "aa"], cache=reopened)
+
+    assert encoder.calls == [["b", "aa"], ["ccc"]]
+    assert np.array_equal(second[[2, 0]], first)
+    assert reopened.hits == 2 and reopened.misses == 1
+    assert reopened.hit_rate == pytest.approx(2 / 3)
+
+
+def test_summarize_groups_encodes_each_column_once(encoder, monkeypatch):
+    monkeypatch.setattr(summarization, "EMBEDDING_CACHE", False)
+    monkeypatch.setattr(
+        summarization, "paraphrase_batch", lambda texts, stats=None: [text.upper() for text in texts]
+    )
+    df = pd.DataFrame(
+        {
+            "experience_name": ["Нет опыта", "Более 6 лет", "Нет опыта", "Более 6 лет", "Нет опыта"],
+            "snippet_requirement": ["a", "bbbb", "aa", "bbbbbb", None],
+            "snippet_responsibility": ["x", "y", "z", None, "w"],
+        }
+    )
+
+    result = summarization.summarize_groups(
+        df, "experience_name", ["snippet_requirement", "snippet_responsibility"], n_clusters=1
+    )
+
+    assert len(encoder.calls) == 2
+    assert sorted(encoder.calls[0]) == ["a", "aa", "bbbb", "bbbbbb"]
+    assert list(result["snippet_requirement"]) == ["Нет опыта", "Более 6 лет"]
+    assert result["snippet_requirement"]["Нет опыта"][0] in {"A", "AA"}
+    assert result["snippet_requirement"]["Более 6 лет"][0] in {"BBBB", "BBBBBB"}
+    assert result["snippet_responsibility"]["Более 6 лет"] == ["Y"]
+
+
+def test_summarize_groups_reports_partial_results(encoder, monkeypatch):
+    monkeypatch.setattr(summarization, "EMBEDDING_CACHE", False)
+    monkeypatch.setattr(summarization, "PARAPHRASE_BATCH_SIZE", 1)
+    monkeypatch.setattr(
+        summarization, "paraphrase_batch", lambda texts, stats=None: [text.upper() for text in texts]
+    )
+    df = pd.DataFrame({"experience_name": ["Нет опыта", "Более 6 лет"], "snippet_requirement": ["a", "b"]})
+    events = []
+
+    result = summarization.summarize_groups(
+        df, "experience_name", ["snippet_requirement"], n_clusters=1,
+        progress=lambda stage, done, total, partial: events.append((stage, done, total, partial)),
+    )
+
+    assert [event[:3] for event in events] == [("clusterize", 1, 1), ("paraphrase", 1, 2), ("paraphrase", 2, 2)]
+    first = events[1][3]["snippet_requirement"]
+    assert sorted(first["Нет опыта"] + first["Более 6 лет"]) == ["A", "b"]
+    assert events[-1][3] == result
+
+
+def test_paraphrase_batch_dedupes_and_caches(monkeypatch, tmp_path):
+    calls = []
+    generator = StubGenerator()
+
+    def pipe(prompts, **kwargs):
+        calls.append((len(prompts), kwargs["max_new_tokens"]))
+        return generator(prompts, **kwargs)
+
+    pipe.tokenizer = generator.tokenizer
+    store = SQLiteStore(str(tmp_path / "paraphrases.sqlite"))
+    monkeypatch.setattr(summarization, "get_pipe", lambda: pipe)
+    monkeypatch.setattr(summarization, "get_paraphrase_cache", lambda: store)
+    stats = summarization.ParaphraseStats()
+
+    first = summarization.paraphrase_batch(["знание sql", "опыт python", "знание sql"], stats=stats)
+    second = summarization.paraphrase_batch(["опыт python"], stats=stats)
+    # Другой лимит длины - другие выходы модели, кэш их не подменяет.
+    summarization.paraphrase_batch(["опыт python"], max_new_tokens=8)
+
+    assert first == ["Знание sql", "Опыт python", "Знание sql"]
+    assert second == ["Опыт python"]
+    assert calls == [(2, summarization.PARAPHRASE_MAX_NEW_TOKENS), (1, 8)]
+    assert stats.sentences == 3 and stats.cached == 1
+    assert stats.generated_tokens == 4
+    assert stats.tokens_per_second > 0
+
+
+def test_stub_encoder_is_deterministic():
+    encoder = StubEncoder()
+
+    first = encoder.encode(["опыт python", "знание sql"])
+    second = encoder.encode(["опыт python"])
+
+    assert np.array_equal(first[0], second[0])
+    assert np.linalg.norm(first, axis=1) == pytest.approx([1.0, 1.0])
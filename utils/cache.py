@@ -0,0 +1,504 @@
+import hashlib
+import io
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from urllib.parse import urlsplit, urlunsplit
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: остается только блокировка внутри процесса
+    fcntl = None
+
+CACHE_DIR = os.environ.get("HH_CACHE_DIR", os.path.join(tempfile.gettempdir(), "hh_cache"))
+CACHE_TTL = 15 * 60
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+OFFLINE = os.environ.get("HH_OFFLINE", "0") == "1"
+RESULT_TTLS = {
+    "pages": float(os.environ.get("HH_PAGES_TTL", 15 * 60)),
+    "frame": float(os.environ.get("HH_FRAME_TTL", 30 * 60)),
+    "summaries": float(os.environ.get("HH_SUMMARIES_TTL", 24 * 60 * 60)),
+}
+# Операторы языка запросов hh.ru и префиксы полей, вроде NAME:.
+QUERY_SYNTAX = re.compile(r"(\b(?:AND|OR|NOT)\b|\b[A-Z_]+:)")
+
+
+def dumps(data) -> bytes:
+    return zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+
+def loads(blob: bytes):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class SQLiteStore:
+    # Хранилище ключ-значение с TTL на запись и LRU-вытеснением по суммарному
+    # размеру. WAL позволяет читать базу из нескольких процессов одновременно.
+    def __init__(self, path: str, max_bytes: int = CACHE_MAX_BYTES, table: str = "entries"):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                meta TEXT
+            )"""
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed_at)"
+        )
+        self._conn.commit()
+        self.evictions = 0
+
+    def get(self, key: str) -> tuple[bytes, float, dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at, meta FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+        value, expires_at, meta = row
+        return value, expires_at, json.loads(meta) if meta else {}
+
+    def put(self, key: str, value: bytes, ttl: float, meta: dict = None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?, ?, ?)",
+                (key, value, len(value), now + ttl, now, json.dumps(meta) if meta else None),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def touch(self, key: str, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE {self.table} SET expires_at = ?, accessed_at = ? WHERE key = ?",
+                (now + ttl, now, key),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM {self.table}"
+            ).fetchone()[0]
+
+    def _evict(self):
+        total = self._conn.execute(
+            f"SELECT COALESCE(SUM(size), 0) FROM {self.table}"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            f"SELECT key, size FROM {self.table} ORDER BY accessed_at ASC"
+        ).fetchall()
+        stale = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self._conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", stale)
+        self.evictions += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+@dataclass
+class CacheEntry:
+    data: dict
+    fresh: bool
+    etag: str = None
+    last_modified: str = None
+
+    def conditional_headers(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def normalize_url(url: str) -> str:
+    parts = urlsplit(url)
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, "", ""))
+
+
+def cache_key(url: str, params: dict = None) -> str:
+    parts = urlsplit(url)
+    query = [tuple(pair.split("=", 1)) for pair in parts.query.split("&") if "=" in pair]
+    query += [(str(key), str(value)) for key, value in (params or {}).items()]
+    normalized = normalize_url(url) + "?" + "&".join(f"{k}={v}" for k, v in sorted(query))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def max_age(headers) -> float:
+    match = re.search(r"max-age=(\d+)", headers.get("Cache-Control", ""))
+    return float(match.group(1)) if match else None
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: str = os.path.join(CACHE_DIR, "responses.sqlite"),
+        ttl: float = CACHE_TTL,
+        max_bytes: int = CACHE_MAX_BYTES,
+        offline: bool = OFFLINE,
+    ):
+        self.store = SQLiteStore(path, max_bytes=max_bytes)
+        self.ttl = ttl
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+    def lookup(self, url: str, params: dict = None) -> CacheEntry:
+        row = self.store.get(cache_key(url, params))
+        if row is None:
+            self.misses += 1
+            return None
+        value, expires_at, meta = row
+        entry = CacheEntry(
+            data=loads(value),
+            fresh=expires_at > time.time(),
+            etag=meta.get("etag"),
+            last_modified=meta.get("last_modified"),
+        )
+        if entry.fresh or self.offline:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return entry
+
+    def save(self, url: str, params: dict, data: dict, headers=None):
+        headers = headers or {}
+        meta = {
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+        }
+        ttl = max_age(headers)
+        self.store.put(cache_key(url, params), dumps(data), ttl or self.ttl, meta)
+
+    def revalidate(self, url: str, params: dict, headers=None):
+        # Сервер ответил 304: тело в кэше актуально, продлеваем срок жизни.
+        self.revalidated += 1
+        self.hits += 1
+        self.misses -= 1
+        ttl = max_age(headers or {})
+        self.store.touch(cache_key(url, params), ttl or self.ttl)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "evictions": self.store.evictions,
+            "hit_rate": round(self.hit_rate, 3),
+            "size_bytes": self.store.size(),
+        }
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache()
+        return _shared_cache
+
+
+class EmbeddingCache:
+    # Векторы лежат в одной float16-матрице на диске (memmap), а SQLite-индекс
+    # хранит только ключ -> номер строки. Ключ адресует содержимое:
+    # хэш очищенного текста вместе с моделью и задачей.
+    def __init__(self, path: str = os.path.join(CACHE_DIR, "embeddings"), model_id: str = "", task: str = ""):
+        os.makedirs(path, exist_ok=True)
+        self.model_id = model_id
+        self.task = task
+        self.vectors_path = os.path.join(path, "vectors.f16")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(path, "index.sqlite"), check_same_thread=False, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+        self._matrix = None
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_id}\0{self.task}\0{text}".encode("utf-8")).hexdigest()
+
+    def _meta(self, name: str) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def _open(self, rows: int, dim: int, mode: str = "r") -> np.memmap:
+        if (
+            mode == "r"
+            and self._matrix is not None
+            and self._matrix.shape[0] >= rows
+        ):
+            return self._matrix
+        matrix = np.memmap(self.vectors_path, dtype=np.float16, mode=mode, shape=(rows, dim))
+        if mode == "r":
+            self._matrix = matrix
+        return matrix
+
+    def lookup(self, texts: list[str]) -> tuple[np.ndarray, list[int]]:
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            dim = self._meta("dim")
+            found = {}
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                marks = ",".join("?" * len(chunk))
+                found.update(
+                    self._conn.execute(
+                        f"SELECT key, row FROM vectors WHERE key IN ({marks})", chunk
+                    ).fetchall()
+                )
+            rows = self._meta("rows")
+
+        missing = [idx for idx, key in enumerate(keys) if key not in found]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if not dim or not found:
+            return None, missing
+
+        vectors = np.zeros((len(keys), dim), dtype=np.float16)
+        hit_idx = [idx for idx, key in enumerate(keys) if key in found]
+        vectors[hit_idx] = self._open(rows, dim)[[found[keys[idx]] for idx in hit_idx]]
+        return vectors, missing
+
+    def add(self, texts: list[str], vectors: np.ndarray):
+        if len(texts) == 0:
+            return
+        vectors = np.asarray(vectors, dtype=np.float16)
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            # BEGIN IMMEDIATE резервирует строки матрицы и между процессами.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                dim = self._meta("dim") or vectors.shape[1]
+                if vectors.shape[1] != dim:
+                    raise ValueError(f"Ожидалась размерность {dim}, получено {vectors.shape[1]}")
+                start = self._meta("rows")
+                new = [(key, start + idx) for idx, key in enumerate(keys)]
+                total = start + len(new)
+
+                with open(self.vectors_path, "ab") as file:
+                    file.truncate(total * dim * 2)
+                matrix = self._open(total, dim, mode="r+")
+                matrix[start:total] = vectors
+                matrix.flush()
+                del matrix
+
+                self._conn.executemany("INSERT OR REPLACE INTO vectors VALUES (?, ?)", new)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO meta VALUES (?, ?)", [("dim", dim), ("rows", total)]
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._meta("rows")
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 3),
+            "vectors": rows,
+        }
+
+
+def query_key(query: str, area: str) -> str:
+    # Пробелы и регистр слов не важны для поиска hh.ru, а операторы AND/OR/NOT
+    # и префиксы полей (NAME:) значимы только заглавными, поэтому они не
+    # приводятся к нижнему регистру. Запрос из get_key_words - это термы в
+    # кавычках через OR, их порядок зависит от обхода set, такие термы сортируются.
+    parts = QUERY_SYNTAX.split(re.sub(r"\s+", " ", query.strip()))
+    query = "".join(part if idx % 2 else part.lower() for idx, part in enumerate(parts))
+    terms = [term.strip() for term in query.split(" OR ")]
+    if all(re.fullmatch(r"'[^']*'", term) for term in terms):
+        query = " OR ".join(sorted(set(terms)))
+    return hashlib.sha256(f"{area}\0{query}".encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    # Готовые результаты поиска по слоям: сырые страницы, обработанная таблица
+    # и выжимки, у каждого слоя свой TTL. Общий SQLite-файл делят все сессии
+    # и процессы Streamlit, одинаковые запросы склеиваются через coalesce().
+    def __init__(
+        self,
+        path: str = os.path.join(CACHE_DIR, "results.sqlite"),
+        ttls: dict = None,
+        max_bytes: int = CACHE_MAX_BYTES,
+    ):
+        self.store = SQLiteStore(path, max_bytes=max_bytes, table="results")
+        self.ttls = {**RESULT_TTLS, **(ttls or {})}
+        self.lock_dir = os.path.join(os.path.dirname(path) or ".", "locks")
+        os.makedirs(self.lock_dir, exist_ok=True)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self.hits = dict.fromkeys(self.ttls, 0)
+        self.misses = dict.fromkeys(self.ttls, 0)
+
+    def get(self, layer: str, key: str):
+        row = self.store.get(f"{layer}:{key}")
+        if row is None or row[1] <= time.time():
+            self.misses[layer] += 1
+            return None
+        self.hits[layer] += 1
+        value, _, meta = row
+        if meta.get("format") == "parquet":
+            import pandas as pd
+
+            return pd.read_parquet(io.BytesIO(value))
+        return loads(value)
+
+    def put(self, layer: str, key: str, value):
+        if hasattr(value, "to_parquet"):
+            buffer = io.BytesIO()
+            value.to_parquet(buffer, compression="zstd")
+            blob, meta = buffer.getvalue(), {"format": "parquet"}
+        else:
+            blob, meta = dumps(value), {"format": "json"}
+        self.store.put(f"{layer}:{key}", blob, self.ttls[layer], meta)
+
+    @contextmanager
+    def coalesce(self, name: str):
+        # Первый запрос держит блокировку и считает результат, остальные ждут
+        # и затем находят его в кэше. threading.Lock склеивает сессии внутри
+        # процесса, flock на файле - воркеры в разных процессах.
+        with self._locks_guard:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.lock_dir, f"{name}.lock"), "a") as file:
+                fcntl.flock(file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def lead(self, name: str):
+        # Неблокирующий вариант coalesce: True - этот запрос считает результат,
+        # False - его уже считает другой, и ждать стоит, опрашивая кэш.
+        with self._locks_guard:
+            lock = self._locks.setdefault(name, threading.Lock())
+        if not lock.acquire(blocking=False):
+            yield False
+            return
+        try:
+            if fcntl is None:
+                yield True
+                return
+            with open(os.path.join(self.lock_dir, f"{name}.lock"), "a") as file:
+                try:
+                    fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield False
+                    return
+                try:
+                    yield True
+                finally:
+                    fcntl.flock(file, fcntl.LOCK_UN)
+        finally:
+            lock.release()
+
+    def put_page(self, key: str, index: int, page: list):
+        # Сырые страницы пишутся по мере обхода и не копятся в памяти.
+        self.put("pages", f"{key}:{index}", page)
+
+    def finish_pages(self, key: str, count: int, started_at: float):
+        # Опись пишется последней: без нее набор страниц считается неполным.
+        self.put("pages", key, {"count": count, "started_at": started_at})
+
+    def pages(self, key: str):
+        # Итератор по страницам запроса или None, если полного набора нет.
+        # Страница, вытесненная из кэша по размеру, дает KeyError при чтении.
+        manifest = self.get("pages", key)
+        if manifest is None or time.time() > manifest["started_at"] + self.ttls["pages"]:
+            return None
+
+        def read():
+            for index in range(manifest["count"]):
+                page = self.get("pages", f"{key}:{index}")
+                if page is None:
+                    raise KeyError(f"{key}:{index}")
+                yield page
+
+        return read()
+
+    def stats(self) -> dict:
+        return {"hits": dict(self.hits), "misses": dict(self.misses), "size_bytes": self.store.size()}
+
+
+_shared_results = None
+
+
+def get_result_cache() -> ResultCache:
+    global _shared_results
+    with _shared_lock:
+        if _shared_results is None:
+            _shared_results = ResultCache()
+        return _shared_results
@@ -0,0 +1,129 @@
+import random
+from itertools import islice
+from math import exp, floor, log
+
+import numpy as np
+
+SEED = 0
+N_INIT = 3
+MINIBATCH_THRESHOLD = 10_000
+MINIBATCH_SIZE = 2048
+CHUNK_SIZE = 65_536
+AUTO_K_RANGE = range(2, 9)
+SILHOUETTE_SAMPLE = 2_000
+INIT_SAMPLE = 10_000
+
+
+def reservoir_sample(items, size: int, seed: int = SEED) -> list:
+    # Алгоритм L: выборка без возвращения за один проход по потоку любой длины.
+    rng = random.Random(seed)
+    iterator = iter(items)
+    reservoir = list(islice(iterator, size))
+    if len(reservoir) < size or size == 0:
+        return reservoir
+
+    weight = exp(log(rng.random()) / size)
+    while True:
+        skip = floor(log(rng.random()) / log(1 - weight))
+        item = next(islice(iterator, skip, skip + 1), None)
+        if item is None:
+            return reservoir
+        reservoir[rng.randrange(size)] = item
+        weight *= exp(log(rng.random()) / size)
+
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def exact_clusters(embeddings: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Уникальных точек не больше, чем кластеров: каждая точка - свой кластер.
+    centers, labels = np.unique(embeddings, axis=0, return_inverse=True)
+    return labels.reshape(-1), normalize(centers)
+
+
+def spherical_kmeans(embeddings: np.ndarray, n_clusters: int, seed: int = SEED):
+    from sklearn.cluster import KMeans
+
+    vectors = normalize(embeddings)
+    kmeans = KMeans(n_clusters=n_clusters, n_init=N_INIT, random_state=seed).fit(vectors)
+    return kmeans.labels_, normalize(kmeans.cluster_centers_)
+
+
+def minibatch_kmeans(embeddings: np.ndarray, n_clusters: int, seed: int = SEED):
+    from sklearn.cluster import MiniBatchKMeans
+
+    # Начальные центры берутся из k-means по равномерной выборке всей матрицы,
+    # иначе первый кусок (часто одна группа подряд) задал бы все центры.
+    sample = np.sort(reservoir_sample(range(len(embeddings)), INIT_SAMPLE, seed))
+    _, init = spherical_kmeans(embeddings[sample], n_clusters, seed)
+
+    # partial_fit и predict идут кусками: в float32 одновременно живет
+    # только CHUNK_SIZE строк, а не вся матрица.
+    kmeans = MiniBatchKMeans(
+        n_clusters=n_clusters,
+        init=init,
+        n_init=1,
+        batch_size=MINIBATCH_SIZE,
+        reassignment_ratio=0.0,
+        random_state=seed,
+    )
+    starts = np.random.default_rng(seed).permutation(np.arange(0, len(embeddings), CHUNK_SIZE))
+    for start in starts:
+        chunk = normalize(embeddings[start : start + CHUNK_SIZE])
+        if len(chunk) >= n_clusters:
+            kmeans.partial_fit(chunk)
+    labels = np.concatenate(
+        [
+            kmeans.predict(normalize(embeddings[start : start + CHUNK_SIZE]))
+            for start in range(0, len(embeddings), CHUNK_SIZE)
+        ]
+    )
+    return labels, normalize(kmeans.cluster_centers_)
+
+
+def choose_k(embeddings: np.ndarray, k_range: range = AUTO_K_RANGE, seed: int = SEED) -> int:
+    from sklearn.metrics import silhouette_score
+
+    sample = np.array(reservoir_sample(range(len(embeddings)), SILHOUETTE_SAMPLE, seed))
+    vectors = normalize(embeddings[np.sort(sample)])
+    best_k, best_score = k_range[0], -1.0
+    for k in k_range:
+        if k >= len(np.unique(vectors, axis=0)):
+            break
+        labels, _ = spherical_kmeans(vectors, k, seed)
+        score = silhouette_score(vectors, labels, metric="cosine")
+        if score > best_score:
+            best_k, best_score = k, score
+    return best_k
+
+
+def cluster_embeddings(
+    embeddings: np.ndarray, n_clusters: int = None, seed: int = SEED
+) -> tuple[np.ndarray, np.ndarray]:
+    if len(embeddings) > MINIBATCH_THRESHOLD:
+        n_clusters = n_clusters or choose_k(embeddings, seed=seed)
+        return minibatch_kmeans(embeddings, n_clusters, seed)
+
+    unique = len(np.unique(embeddings, axis=0))
+    if n_clusters is None:
+        n_clusters = choose_k(embeddings, seed=seed) if unique > AUTO_K_RANGE[0] else unique
+    if unique <= n_clusters:
+        return exact_clusters(embeddings)
+    return spherical_kmeans(embeddings, n_clusters, seed)
+
+
+def representative_indices(
+    embeddings: np.ndarray, labels: np.ndarray, centers: np.ndarray
+) -> np.ndarray:
+    distances = np.empty(len(embeddings), dtype=np.float32)
+    for start in range(0, len(embeddings), CHUNK_SIZE):
+        chunk = normalize(embeddings[start : start + CHUNK_SIZE])
+        own = centers[labels[start : start + CHUNK_SIZE]]
+        distances[start : start + CHUNK_SIZE] = np.einsum("ij,ij->i", chunk - own, chunk - own)
+    # Сортировка по (кластер, расстояние): первая строка каждого кластера - ближайшая к центру.
+    order = np.lexsort((distances, labels))
+    first = np.flatnonzero(np.r_[True, labels[order][1:] != labels[order][:-1]])
+    return order[first]
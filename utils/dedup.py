@@ -0,0 +1,208 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+TEXT_COLUMNS = ["name", "snippet_requirement", "snippet_responsibility"]
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_SIZE = 2
+THRESHOLD = 0.7
+SEED = 0
+EMPTY = 2**32 - 1
+WINDOW = 2
+PAIR_CHUNK = 1_000_000
+SIGNATURE_CHUNK = 16_384
+PUNCTUATION = r"[!-/:-@\[-`{-~«»„“”‘’—–…№•·]"
+
+
+def clean_texts(texts: pa.Array) -> pa.Array:
+    # Аналог clean_text целой колонкой: регулярки выполняются в Arrow, а не в цикле Python.
+    # Юникодный класс \w в RE2 медленный, поэтому пунктуация перечислена явно,
+    # а пробелы нормализует разбиение на слова.
+    texts = pc.replace_substring_regex(texts, r"<[^<]+?>", "")
+    texts = pc.replace_substring_regex(texts, r"http\S+", "")
+    texts = pc.utf8_lower(texts)
+    return pc.replace_substring_regex(texts, PUNCTUATION, "")
+
+
+def shingle_hashes(texts: pa.Array, size: int = SHINGLE_SIZE) -> tuple[np.ndarray, np.ndarray]:
+    # Слова кодируются целыми числами через словарь Arrow, n-граммы - комбинацией
+    # соседних кодов. Повторы шинглов внутри строки не мешают: минимум от них не меняется.
+    tokens = pc.utf8_split_whitespace(texts)
+    rows = pc.list_parent_indices(tokens).to_numpy().astype(np.int64)
+    words = pc.list_flatten(tokens)
+    present = pc.not_equal(words, "").to_numpy(zero_copy_only=False)
+    encoded = pc.dictionary_encode(words.filter(present))
+    codes = encoded.indices.to_numpy().astype(np.uint64)
+    rows = rows[present]
+    if len(rows) == 0:
+        return rows, codes
+
+    vocabulary = np.uint64(len(encoded.dictionary) + 1)
+    grams = codes.copy()
+    for offset in range(1, size):
+        following = np.full(len(codes), vocabulary - np.uint64(1), dtype=np.uint64)
+        same_row = rows[offset:] == rows[:-offset]
+        following[:-offset][same_row] = codes[offset:][same_row]
+        grams = grams * vocabulary + following
+    # Последние слова строки дают неполные n-граммы; они нужны только строкам короче size.
+    lengths = np.bincount(rows)
+    position = np.arange(len(rows)) - (np.cumsum(lengths) - lengths)[rows]
+    keep = (position <= lengths[rows] - size) | (position == 0)
+    return rows[keep], mix(grams[keep])
+
+
+def mix(values: np.ndarray) -> np.ndarray:
+    # Перемешивание 64-битного кода n-граммы в 32 бита (финализатор splitmix64).
+    values = values ^ (values >> np.uint64(31))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    return values >> np.uint64(32)
+
+
+def minhash_signatures(
+    rows: np.ndarray, hashes: np.ndarray, size: int, num_perm: int = NUM_PERM, seed: int = SEED
+) -> np.ndarray:
+    # Перестановки multiply-shift вида (a * x + b) >> 32. Шинглы обрабатываются
+    # кусками по границам строк, чтобы временный буфер помещался в кэш процессора.
+    rng = np.random.default_rng(seed)
+    coefficients = rng.integers(1, 2**64 - 1, size=(num_perm, 2), dtype=np.uint64)
+    signatures = np.full((size, num_perm), EMPTY, dtype=np.uint32)
+    if len(rows) == 0:
+        return signatures
+
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    shift = np.uint64(32)
+    for first in range(0, len(starts), SIGNATURE_CHUNK):
+        chunk_starts = starts[first : first + SIGNATURE_CHUNK]
+        end = starts[first + SIGNATURE_CHUNK] if first + SIGNATURE_CHUNK < len(starts) else len(rows)
+        chunk = hashes[chunk_starts[0] : end]
+        offsets = chunk_starts - chunk_starts[0]
+        present = rows[chunk_starts]
+        buffer = np.empty_like(chunk)
+        block = np.empty((len(chunk_starts), num_perm), dtype=np.uint32)
+        for perm, (a, b) in enumerate(coefficients):
+            np.multiply(chunk, a, out=buffer)
+            np.add(buffer, b, out=buffer)
+            np.right_shift(buffer, shift, out=buffer)
+            block[:, perm] = np.minimum.reduceat(buffer, offsets)
+        signatures[present] = block
+    return signatures
+
+
+def band_keys(signatures: np.ndarray, bands: int = BANDS) -> np.ndarray:
+    rows_per_band = signatures.shape[1] // bands
+    multipliers = np.random.default_rng(SEED).integers(1, 2**63, size=rows_per_band, dtype=np.uint64)
+    keys = np.empty((bands, len(signatures)), dtype=np.uint64)
+    for band in range(bands):
+        chunk = signatures[:, band * rows_per_band : (band + 1) * rows_per_band].astype(np.uint64)
+        keys[band] = (chunk * multipliers).sum(axis=1)
+    return keys
+
+
+def lsh_pairs(
+    signatures: np.ndarray, bands: int = BANDS, threshold: float = THRESHOLD, window: int = WINDOW
+) -> tuple[np.ndarray, np.ndarray]:
+    keys = band_keys(signatures, bands)
+    candidates = []
+    for band in range(bands):
+        # Внутри корзины строки упорядочены по ключу следующей полосы, так что
+        # почти-дубликаты оказываются рядом и сравниваются только с window соседями:
+        # число пар линейно даже для огромных корзин шаблонного текста.
+        order = np.argsort(keys[(band + 1) % bands])
+        order = order[np.argsort(keys[band][order], kind="stable")]
+        sorted_keys = keys[band][order]
+        for offset in range(1, window + 1):
+            same = sorted_keys[offset:] == sorted_keys[:-offset]
+            a, b = order[:-offset][same], order[offset:][same]
+            candidates.append(np.minimum(a, b) * len(signatures) + np.maximum(a, b))
+
+    # Одна и та же пара обычно находится в нескольких полосах, проверяем ее один раз.
+    pairs = np.sort(np.concatenate(candidates))
+    pairs = pairs[np.r_[True, pairs[1:] != pairs[:-1]]] if len(pairs) else pairs
+    left, right = [], []
+    for start in range(0, len(pairs), PAIR_CHUNK):
+        a, b = np.divmod(pairs[start : start + PAIR_CHUNK], len(signatures))
+        similar = np.count_nonzero(signatures[a] == signatures[b], axis=1) >= threshold * signatures.shape[1]
+        left.append(a[similar])
+        right.append(b[similar])
+    if not left:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    return np.concatenate(left), np.concatenate(right)
+
+
+def near_duplicate_labels(
+    texts: pa.Array,
+    threshold: float = THRESHOLD,
+    num_perm: int = NUM_PERM,
+    bands: int = BANDS,
+    seed: int = SEED,
+) -> np.ndarray:
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    # Одинаковые тексты хэшируются один раз.
+    encoded = pc.dictionary_encode(texts)
+    codes = encoded.indices.to_numpy()
+    unique = encoded.dictionary
+    rows, hashes = shingle_hashes(unique)
+    signatures = minhash_signatures(rows, hashes, len(unique), num_perm, seed)
+    left, right = lsh_pairs(signatures, bands, threshold)
+
+    # Пустые тексты не склеиваются между собой: у них одинаковая "пустая" сигнатура,
+    # поэтому каждая такая строка получает свою метку.
+    empty = np.ones(len(unique), dtype=bool)
+    empty[rows] = False
+    keep = ~(empty[left] | empty[right])
+    graph = coo_matrix(
+        (np.ones(keep.sum(), dtype=np.int8), (left[keep], right[keep])), shape=(len(unique), len(unique))
+    )
+    count, labels = connected_components(graph, directed=False)
+    labels = labels[codes]
+    blank = np.flatnonzero(empty[codes])
+    labels[blank] = count + np.arange(len(blank))
+    return labels
+
+
+def dedup_text(df: pd.DataFrame, columns: list[str] = TEXT_COLUMNS) -> pa.Array:
+    parts = [
+        pa.array(df[column].astype(object), type=pa.string(), from_pandas=True)
+        for column in columns
+        if column in df.columns
+    ]
+    if not parts:
+        return pa.array([""] * len(df), type=pa.string())
+    joined = pc.binary_join_element_wise(*parts, " ", null_handling="replace", null_replacement="")
+    return clean_texts(joined)
+
+
+def deduplicate(
+    df: pd.DataFrame, threshold: float = THRESHOLD, num_perm: int = NUM_PERM, bands: int = BANDS
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    if df.empty:
+        return df.assign(duplicates=pd.Series(dtype=np.int64)), pd.DataFrame(
+            {"cluster": pd.Series(dtype=np.int64), "representative": pd.Series(dtype=df.index.dtype)}
+        )
+
+    positions = np.arange(len(df))
+    if "id" in df.columns:
+        # Точные дубликаты по id сначала склеиваются без всякого хэширования.
+        id_codes, _ = pd.factorize(df["id"])
+        id_codes = np.where(id_codes < 0, len(df) + positions, id_codes)
+        _, first, id_inverse = np.unique(id_codes, return_index=True, return_inverse=True)
+    else:
+        first, id_inverse = positions, positions
+
+    labels = near_duplicate_labels(dedup_text(df.iloc[first]), threshold, num_perm, bands)[id_inverse]
+
+    # Представитель кластера - его первая строка во входном порядке.
+    _, first_rows, clusters, counts = np.unique(
+        labels, return_index=True, return_inverse=True, return_counts=True
+    )
+    mapping = pd.DataFrame(
+        {"cluster": clusters, "representative": df.index[first_rows[clusters]]}, index=df.index
+    )
+    representatives = np.sort(first_rows)
+    unique = df.iloc[representatives].assign(duplicates=counts[clusters[representatives]])
+    return unique, mapping
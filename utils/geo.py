@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+RAW_POINTS_LIMIT = 2_000
+MAX_CELLS = 1_500
+MIN_LEVEL = 2
+MAX_LEVEL = 18
+ZOOM_OFFSET = 3  # на тайл карты приходится примерно 8x8 ячеек
+METERS_PER_DEGREE = 111_320
+
+
+def coordinates(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    lat = pd.to_numeric(df["address_lat"], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    lng = pd.to_numeric(df["address_lng"], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = ~(np.isnan(lat) | np.isnan(lng))
+    return lat[valid], lng[valid], valid
+
+
+def cell_keys(lat: np.ndarray, lng: np.ndarray, level: int) -> np.ndarray:
+    # Сетка как у geohash: на уровне level широта и долгота делятся на 2**level полос.
+    size = 2**level
+    rows = np.clip(((lat + 90) / 180 * size).astype(np.int64), 0, size - 1)
+    cols = np.clip(((lng + 180) / 360 * size).astype(np.int64), 0, size - 1)
+    return rows * size + cols
+
+
+def grid_level(
+    lat: np.ndarray, lng: np.ndarray, zoom: float = None, max_cells: int = MAX_CELLS
+) -> int:
+    if zoom is not None:
+        return int(np.clip(round(zoom) + ZOOM_OFFSET, MIN_LEVEL, MAX_LEVEL))
+    # Самый мелкий уровень, на котором занятых ячеек не больше max_cells.
+    # Число ячеек монотонно по уровню, поэтому хватает двоичного поиска.
+    low, high = MIN_LEVEL, MAX_LEVEL
+    while low < high:
+        middle = (low + high + 1) // 2
+        if len(np.unique(cell_keys(lat, lng, middle))) <= max_cells:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def cell_size(level: int) -> float:
+    return 180 / 2**level * METERS_PER_DEGREE
+
+
+def group_medians(groups: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    medians = np.full(size, np.nan)
+    if len(values) == 0:
+        return medians
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    counts = np.diff(np.r_[starts, len(groups)])
+    medians[groups[starts]] = (values[starts + (counts - 1) // 2] + values[starts + counts // 2]) / 2
+    return medians
+
+
+def bin_points(
+    df: pd.DataFrame, level: int = None, zoom: float = None, max_cells: int = MAX_CELLS
+) -> pd.DataFrame:
+    lat, lng, valid = coordinates(df)
+    if level is None:
+        level = grid_level(lat, lng, zoom, max_cells)
+    cells, inverse, counts = np.unique(cell_keys(lat, lng, level), return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+
+    # Точка ячейки - центр масс ее вакансий, а не геометрический центр:
+    # так одиночные адреса остаются на своих местах.
+    result = pd.DataFrame(
+        {
+            "lat": np.bincount(inverse, weights=lat, minlength=len(cells)) / np.maximum(counts, 1),
+            "lng": np.bincount(inverse, weights=lng, minlength=len(cells)) / np.maximum(counts, 1),
+            "count": counts,
+        }
+    )
+    if "salary" in df.columns:
+        salary = df["salary"].to_numpy(dtype=np.float64)[valid]
+        paid = salary > 0
+        result["median_salary"] = group_medians(inverse[paid], salary[paid], len(cells))
+    result.attrs["level"] = level
+    return result
+
+
+def fit_zoom(lat: np.ndarray, lng: np.ndarray) -> float:
+    if len(lat) == 0:
+        return 3.0
+    # Берем 1-99 перцентили, чтобы единичные выбросы не отдаляли всю карту.
+    lat_low, lat_high = np.percentile(lat, [1, 99])
+    lng_low, lng_high = np.percentile(lng, [1, 99])
+    span = max((lat_high - lat_low) * 2, lng_high - lng_low, 0.01)
+    return float(np.clip(np.log2(360 / span), 1, 14))
@@ -0,0 +1,131 @@
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+import pandas as pd
+
+from .cache import CACHE_DIR
+from .processing import EXP_LEVELS
+from .stats import Aggregates, aggregate
+
+HISTORY_DIR = os.environ.get("HH_HISTORY_DIR", os.path.join(CACHE_DIR, "history"))
+ALL_LEVELS = "Все уровни"
+TREND_DAYS = 90
+METRICS = ["vacancies", "paid", "mean", "q1", "median", "q3"]
+
+
+def daily_rows(query: str, day: str, stats: Aggregates) -> list[tuple]:
+    # Строка на уровень опыта плюс общая строка ALL_LEVELS; зарплатные поля
+    # считаются только по вакансиям с указанной зарплатой.
+    levels = stats.counts.get("experience_name", pd.Series(dtype=int))
+    salaries = {ALL_LEVELS: stats.overall, **{level: row for level, row in stats.salary.iterrows()}}
+    rows = []
+    for level, vacancies in [(ALL_LEVELS, stats.total), *levels.items()]:
+        salary = salaries.get(level)
+        paid = int(salary["count"]) if salary is not None and "median" in salary else 0
+        values = [float(salary[name]) if paid else None for name in ("mean", "q1", "median", "q3")]
+        rows.append((query, day, level, int(vacancies), paid, *values))
+    return rows
+
+
+class SnapshotStore:
+    # Ежедневные снимки обработанных вакансий: сами строки лежат в сжатых
+    # Parquet-файлах snapshots/<запрос>/<дата>.parquet, а дневные агрегаты -
+    # в маленькой SQLite-таблице, поэтому тренды строятся без чтения строк.
+    def __init__(self, root: str = HISTORY_DIR):
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "daily.sqlite"), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS daily (
+                query TEXT NOT NULL,
+                day TEXT NOT NULL,
+                level TEXT NOT NULL,
+                vacancies INTEGER NOT NULL,
+                paid INTEGER NOT NULL,
+                mean REAL,
+                q1 REAL,
+                median REAL,
+                q3 REAL,
+                PRIMARY KEY (query, day, level)
+            )"""
+        )
+        self._conn.commit()
+
+    def snapshot_path(self, query: str, day: str) -> str:
+        return os.path.join(self.root, "snapshots", query, f"{day}.parquet")
+
+    def save(self, query: str, df: pd.DataFrame, stats: Aggregates = None, day: date = None) -> str:
+        # Повторный снимок за тот же день заменяет предыдущий.
+        day = (day or date.today()).isoformat()
+        if stats is None:
+            stats = aggregate(df)
+        path = self.snapshot_path(query, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_parquet(f"{path}.tmp", index=False, compression="zstd")
+        os.replace(f"{path}.tmp", path)
+
+        with self._lock:
+            self._conn.execute("DELETE FROM daily WHERE query = ? AND day = ?", (query, day))
+            self._conn.executemany(
+                "INSERT INTO daily VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", daily_rows(query, day, stats)
+            )
+            self._conn.commit()
+        return path
+
+    def has(self, query: str, day: date = None) -> bool:
+        day = (day or date.today()).isoformat()
+        with self._lock:
+            return (
+                self._conn.execute(
+                    "SELECT 1 FROM daily WHERE query = ? AND day = ? LIMIT 1", (query, day)
+                ).fetchone()
+                is not None
+            )
+
+    def days(self, query: str) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT day FROM daily WHERE query = ? ORDER BY day", (query,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def load(self, query: str, day: str) -> pd.DataFrame:
+        return pd.read_parquet(self.snapshot_path(query, day))
+
+    def trend(self, query: str, metric: str = "median", days: int = TREND_DAYS, until: date = None) -> pd.DataFrame:
+        # Таблица день x уровень опыта со значением metric за последние days дней.
+        if metric not in METRICS:
+            raise ValueError(f"Неизвестная метрика {metric!r}, доступны: {', '.join(METRICS)}")
+        until = until or date.today()
+        since = (until - timedelta(days=days - 1)).isoformat()
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT day, level, {metric} FROM daily WHERE query = ? AND day BETWEEN ? AND ? ORDER BY day",
+                (query, since, until.isoformat()),
+            ).fetchall()
+        table = pd.DataFrame(rows, columns=["day", "level", metric])
+        table["day"] = pd.to_datetime(table["day"])
+        table = table.pivot(index="day", columns="level", values=metric)
+        # Уровни в порядке опыта, общая колонка в конце.
+        order = [level for level in [*EXP_LEVELS, ALL_LEVELS] if level in table.columns]
+        return table.reindex(columns=order).rename_axis(columns=None)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+def get_snapshot_store() -> SnapshotStore:
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = SnapshotStore()
+        return _shared_store
@@ -0,0 +1,262 @@
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import nullcontext
+from dataclasses import dataclass
+
+import numpy as np
+
+from .cache import CACHE_DIR
+
+# torch - исходная модель в fp32, int8 - динамическая квантизация Linear-слоев,
+# onnx - экспорт модели в ONNX Runtime, onnx-int8 - он же после квантизации.
+BACKENDS = ["torch", "int8", "onnx", "onnx-int8"]
+ENCODER_BACKEND = os.environ.get("HH_ENCODER_BACKEND", "torch")
+DEFAULT_MAX_SEQ_LENGTH = 256
+MAX_SEQ_LENGTH = int(os.environ.get("HH_MAX_SEQ_LENGTH", DEFAULT_MAX_SEQ_LENGTH))
+BATCH_TOKENS = int(os.environ.get("HH_BATCH_TOKENS", 4096))
+INTRA_OP_THREADS = int(os.environ.get("HH_INTRA_OP_THREADS", 0))
+INTER_OP_THREADS = int(os.environ.get("HH_INTER_OP_THREADS", 0))
+# Пусто - fp32, bf16 - половина памяти, int8 - динамическая квантизация.
+LLM_DTYPES = ["", "bf16", "int8"]
+LLM_DTYPE = os.environ.get("HH_LLM_DTYPE", "")
+ONNX_PATH = os.environ.get("HH_ONNX_PATH")
+ONNX_DIR = os.path.join(CACHE_DIR, "onnx")
+# Длина в токенах оценивается по символам: токенизатор для группировки не нужен.
+CHARS_PER_TOKEN = 4
+MIN_BUCKET = 8
+# Порядок LoRA-адаптеров jina-embeddings-v3, если его нет в config.json.
+TASKS = ["retrieval.query", "retrieval.passage", "separation", "classification", "text-matching"]
+
+logger = logging.getLogger("hh.inference")
+
+
+@dataclass
+class InferenceConfig:
+    backend: str = ENCODER_BACKEND
+    max_seq_length: int = MAX_SEQ_LENGTH
+    batch_tokens: int = BATCH_TOKENS
+    intra_op_threads: int = INTRA_OP_THREADS
+    inter_op_threads: int = INTER_OP_THREADS
+    llm_dtype: str = LLM_DTYPE
+
+    @property
+    def encoder_suffix(self) -> str:
+        # Векторы разных бэкендов и длин обрезки не должны смешиваться в кэше.
+        suffix = "" if self.backend == "torch" else f"-{self.backend}"
+        if self.max_seq_length != DEFAULT_MAX_SEQ_LENGTH:
+            suffix += f"-len{self.max_seq_length}"
+        return suffix
+
+    @property
+    def llm_suffix(self) -> str:
+        return f"-{self.llm_dtype}" if self.llm_dtype else ""
+
+
+def inference_mode():
+    # torch не импортируется ради заглушек: если его еще нет в процессе,
+    # значит, и модели на нем не загружены.
+    torch = sys.modules.get("torch")
+    return torch.inference_mode() if torch is not None else nullcontext()
+
+
+def configure_threads(config: InferenceConfig):
+    import torch
+
+    if config.intra_op_threads:
+        torch.set_num_threads(config.intra_op_threads)
+    if config.inter_op_threads:
+        try:
+            torch.set_interop_threads(config.inter_op_threads)
+        except RuntimeError:
+            # Задается один раз до первой параллельной операции.
+            logger.warning("inter-op потоки torch уже заданы, HH_INTER_OP_THREADS не применен")
+
+
+def quantize(model):
+    # Веса Linear-слоев хранятся в int8, активации квантуются на лету.
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def length_buckets(
+    texts: list[str],
+    max_seq_length: int = MAX_SEQ_LENGTH,
+    batch_tokens: int = BATCH_TOKENS,
+    max_batch_size: int = 64,
+) -> list[np.ndarray]:
+    # Тексты делятся на корзины по оценке длины (степени двойки), батч внутри
+    # корзины набирается до batch_tokens токенов: короткие сниппеты идут
+    # большими батчами, а паддинг не превышает двукратного.
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    tokens = np.minimum(lengths // CHARS_PER_TOKEN + 2, max_seq_length)
+    buckets = np.maximum(2 ** np.ceil(np.log2(np.maximum(tokens, 1))).astype(np.int64), MIN_BUCKET)
+    buckets = np.minimum(buckets, max_seq_length)
+    order = np.argsort(lengths, kind="stable")
+    batches = []
+    for bucket in np.unique(buckets):
+        rows = order[buckets[order] == bucket]
+        size = int(min(max(batch_tokens // bucket, 1), max_batch_size))
+        batches.extend(rows[start : start + size] for start in range(0, len(rows), size))
+    return batches
+
+
+def encode_texts(
+    model, texts: list[str], task: str = None, config: InferenceConfig = None, batch_size: int = 64
+) -> np.ndarray:
+    config = config or InferenceConfig()
+    vectors = None
+    with inference_mode():
+        for batch in length_buckets(texts, config.max_seq_length, config.batch_tokens, batch_size):
+            encoded = np.asarray(model.encode([texts[idx] for idx in batch], task=task), dtype=np.float32)
+            if vectors is None:
+                vectors = np.zeros((len(texts), encoded.shape[1]), dtype=np.float32)
+            vectors[batch] = encoded
+    return vectors if vectors is not None else np.zeros((0, 0), dtype=np.float32)
+
+
+class TorchEncoder:
+    # Обертка над encode модели: обрезка длины и батч, уже собранный length_buckets.
+    def __init__(self, model, config: InferenceConfig):
+        self.model = model
+        self.config = config
+
+    def encode(self, texts: list[str], task: str = None, **kwargs) -> np.ndarray:
+        with inference_mode():
+            return self.model.encode(
+                texts, task=task, batch_size=len(texts), max_length=self.config.max_seq_length, **kwargs
+            )
+
+
+class OnnxEncoder:
+    # Модель в ONNX Runtime: токенизация здесь, пулинг по маске и нормализация -
+    # так же, как в encode у jina-embeddings-v3.
+    def __init__(self, path: str, onnx_path: str, config: InferenceConfig):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if config.intra_op_threads:
+            options.intra_op_num_threads = config.intra_op_threads
+        if config.inter_op_threads:
+            options.inter_op_num_threads = config.inter_op_threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.inputs = {node.name for node in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+        self.tasks = model_tasks(path)
+        self.config = config
+
+    def encode(self, texts: list[str], task: str = None, **kwargs) -> np.ndarray:
+        tokens = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.config.max_seq_length, return_tensors="np"
+        )
+        feed = {
+            name: tokens[name].astype(np.int64) for name in ("input_ids", "attention_mask") if name in self.inputs
+        }
+        if "task_id" in self.inputs:
+            feed["task_id"] = np.array(self.tasks.index(task or TASKS[-1]), dtype=np.int64)
+        hidden = self.session.run(None, feed)[0]
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+
+def model_tasks(path: str) -> list[str]:
+    try:
+        with open(os.path.join(path, "config.json"), encoding="utf-8") as file:
+            return json.load(file).get("lora_adaptations") or TASKS
+    except (OSError, ValueError):
+        return TASKS
+
+
+def onnx_model(path: str, quantized: bool) -> str:
+    # Используется ONNX-экспорт из папки модели (onnx/model.onnx, у jina он
+    # есть) или HH_ONNX_PATH; int8-версия строится один раз и кладется в кэш.
+    source = ONNX_PATH or os.path.join(path, "onnx", "model.onnx")
+    if not os.path.exists(source):
+        raise FileNotFoundError(
+            f"Нет ONNX-модели {source}: экспортируйте ее (optimum-cli export onnx) или задайте HH_ONNX_PATH"
+        )
+    if not quantized:
+        return source
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    # Веса лежат во внешнем файле рядом с .onnx, и ссылка на него пишется по
+    # имени: модель собирается во временной папке и переносится целиком.
+    model_id = os.path.basename(path.rstrip("/"))
+    target_dir = os.path.join(ONNX_DIR, f"{model_id}-int8")
+    target = os.path.join(target_dir, "model.onnx")
+    if not os.path.exists(target):
+        os.makedirs(ONNX_DIR, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f"{model_id}-int8.", dir=ONNX_DIR)
+        try:
+            quantize_dynamic(
+                source, os.path.join(staging, "model.onnx"), weight_type=QuantType.QInt8, use_external_data_format=True
+            )
+            try:
+                os.replace(staging, target_dir)
+            except OSError:
+                # Другой процесс уже положил готовую модель.
+                if not os.path.exists(target):
+                    raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+    return target
+
+
+def load_encoder(path: str, config: InferenceConfig = None):
+    config = config or InferenceConfig()
+    if config.backend not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд {config.backend!r}, доступны: {', '.join(BACKENDS)}")
+    if config.backend.startswith("onnx"):
+        return OnnxEncoder(path, onnx_model(path, config.backend == "onnx-int8"), config)
+
+    from transformers import AutoModel
+
+    configure_threads(config)
+    model = AutoModel.from_pretrained(path, trust_remote_code=True)
+    model.eval()
+    if config.backend == "int8":
+        model = quantize(model)
+    return TorchEncoder(model, config)
+
+
+def load_generator(path: str, config: InferenceConfig = None, **kwargs):
+    config = config or InferenceConfig()
+    if config.llm_dtype not in LLM_DTYPES:
+        raise ValueError(f"Неизвестный тип весов LLM {config.llm_dtype!r}, доступны: fp32, bf16, int8")
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+
+    configure_threads(config)
+    dtype = torch.bfloat16 if config.llm_dtype == "bf16" else torch.float32
+    model = AutoModelForCausalLM.from_pretrained(path, torch_dtype=dtype, low_cpu_mem_usage=True)
+    model.eval()
+    if config.llm_dtype == "int8":
+        model = quantize(model)
+    return pipeline("text-generation", model=model, tokenizer=AutoTokenizer.from_pretrained(path), **kwargs)
+
+
+def drift(reference: np.ndarray, vectors: np.ndarray) -> dict:
+    # Насколько векторы бэкенда отличаются от fp32: косинус с эталоном для
+    # каждой строки и доля строк, у которых ближайший сосед не изменился.
+    reference = reference / np.maximum(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    cosine = (reference * vectors).sum(axis=1)
+
+    def neighbours(matrix: np.ndarray) -> np.ndarray:
+        similarity = matrix @ matrix.T
+        np.fill_diagonal(similarity, -np.inf)
+        return similarity.argmax(axis=1)
+
+    same = neighbours(reference) == neighbours(vectors) if len(reference) > 1 else np.ones(len(reference), bool)
+    return {
+        "mean_cosine": float(cosine.mean()) if len(cosine) else 1.0,
+        "min_cosine": float(cosine.min()) if len(cosine) else 1.0,
+        "neighbour_agreement": float(same.mean()) if len(same) else 1.0,
+    }
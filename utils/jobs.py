@@ -0,0 +1,248 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+
+JOB_WORKERS = int(os.environ.get("HH_JOB_WORKERS", 1))
+TORCH_THREADS = int(os.environ.get("HH_TORCH_THREADS", max(1, (os.cpu_count() or 1) // JOB_WORKERS)))
+MAX_PENDING = int(os.environ.get("HH_JOB_QUEUE", 8))
+LATENCY_WINDOW = 100
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    key: str = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float = None
+    finished_at: float = None
+    stage: str = "queued"
+    done: int = 0
+    total: int = 0
+    partial: object = None
+    future: Future = None
+
+    @property
+    def finished(self) -> bool:
+        return self.future.done()
+
+    @property
+    def wait_seconds(self) -> float:
+        return (self.started_at or time.time()) - self.submitted_at
+
+    def result(self, timeout: float = None):
+        return self.future.result(timeout)
+
+
+# Код ниже выполняется внутри процессов пула.
+_progress_queue = None
+
+
+def limit_threads(threads: int):
+    # torch ограничен своей долей ядер, чтобы воркеры не делили одни и те же потоки.
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    try:
+        import torch
+    except ImportError:
+        pass
+    else:
+        torch.set_num_threads(threads)
+
+
+def init_worker(threads: int, progress_queue):
+    # Модели грузятся один раз на процесс.
+    global _progress_queue
+    _progress_queue = progress_queue
+    limit_threads(threads)
+
+    from .summarization import warm_up
+
+    warm_up(background=False)
+
+
+def _warm_up(progress):
+    # Пустая задача: поднимает воркеры пула, веса грузит init_worker.
+    return None
+
+
+def _summarize(progress, *args, **kwargs):
+    from .summarization import summarize
+
+    return summarize(*args, **kwargs)
+
+
+def _clusterize(progress, *args, **kwargs):
+    from .summarization import clusterize
+
+    return clusterize(*args, **kwargs)
+
+
+def _paraphrase(progress, *args, **kwargs):
+    from .summarization import ParaphraseStats, paraphrase_batch
+
+    stats = ParaphraseStats()
+    return paraphrase_batch(*args, stats=stats, **kwargs), stats
+
+
+def _summarize_groups(progress, *args, **kwargs):
+    from .summarization import EMBEDDING_CACHE, ParaphraseStats, get_embedding_cache, summarize_groups
+
+    stats = ParaphraseStats()
+    summaries = summarize_groups(*args, stats=stats, progress=progress, **kwargs)
+    # Кэш эмбеддингов живет в воркере, поэтому его статистика едет вместе с результатом.
+    return summaries, stats, get_embedding_cache().stats() if EMBEDDING_CACHE else None
+
+
+JOBS = {
+    "warm_up": _warm_up,
+    "summarize": _summarize,
+    "clusterize": _clusterize,
+    "paraphrase": _paraphrase,
+    "summarize_groups": _summarize_groups,
+}
+
+
+def run_job(job_id: str, kind: str, args: tuple, kwargs: dict):
+    _progress_queue.put(("started", job_id, time.time()))
+
+    def progress(stage: str, done: int, total: int, partial=None):
+        _progress_queue.put(("progress", job_id, stage, done, total, partial))
+
+    from .metrics import get_registry
+
+    try:
+        return JOBS[kind](progress, *args, **kwargs)
+    finally:
+        # Метрики воркера уезжают в основной процесс и сливаются с его реестром.
+        _progress_queue.put(("metrics", job_id, get_registry().drain()))
+
+
+class JobManager:
+    # Пул процессов для суммаризации. Задачи с одинаковым key склеиваются,
+    # прогресс и частичные результаты приходят через очередь и разбираются
+    # фоновым потоком, так что страница только читает поля Job.
+    def __init__(self, workers: int = JOB_WORKERS, threads: int = TORCH_THREADS, max_pending: int = MAX_PENDING):
+        self._context = multiprocessing.get_context("spawn")
+        self.workers = workers
+        self.threads = threads
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._by_key = {}
+        self._latencies = []
+        self._waits = []
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # У каждого пула своя очередь прогресса: воркер, убитый посреди записи,
+        # оставляет блокировку очереди занятой, и новый пул на ней бы повис.
+        progress = self._context.Queue()
+        threading.Thread(target=self._drain, args=(progress,), name="jobs-progress", daemon=True).start()
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=self._context,
+            initializer=init_worker,
+            initargs=(self.threads, progress),
+        )
+
+    def submit(self, kind: str, *args, key: str = None, **kwargs) -> Job:
+        with self._lock:
+            if key is not None and key in self._by_key and not self._by_key[key].finished:
+                return self._by_key[key]
+            pending = sum(not job.finished for job in self._jobs.values())
+            if pending >= self.max_pending:
+                raise QueueFull(f"В очереди уже {pending} задач")
+
+            job = Job(id=uuid.uuid4().hex, kind=kind, key=key)
+            try:
+                job.future = self._executor.submit(run_job, job.id, kind, args, kwargs)
+            except BrokenProcessPool:
+                # Упавший воркер (OOM, ошибка загрузки модели) ломает пул насовсем:
+                # задачи в нем уже завершились ошибкой, пул создается заново.
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+                self.restarts += 1
+                job.future = self._executor.submit(run_job, job.id, kind, args, kwargs)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._by_key[key] = job
+        job.future.add_done_callback(lambda _: self._finish(job))
+        return job
+
+    def _finish(self, job: Job):
+        with self._lock:
+            job.finished_at = time.time()
+            job.stage = "failed" if job.future.cancelled() or job.future.exception() else "done"
+            self.completed += job.stage == "done"
+            self.failed += job.stage == "failed"
+            self._latencies = (self._latencies + [job.finished_at - job.submitted_at])[-LATENCY_WINDOW:]
+            self._waits = (self._waits + [job.wait_seconds])[-LATENCY_WINDOW:]
+            self._jobs.pop(job.id, None)
+            if self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
+
+    def _drain(self, progress):
+        while True:
+            try:
+                message = progress.get()
+            except (EOFError, OSError):
+                return
+            if message[0] == "metrics":
+                # Задача к этому моменту может быть уже снята с учета.
+                from .metrics import get_registry
+
+                get_registry().merge(message[2])
+                continue
+            with self._lock:
+                job = self._jobs.get(message[1])
+                if job is None:
+                    continue
+                if message[0] == "started":
+                    job.started_at = message[2]
+                    job.stage = "running"
+                else:
+                    _, _, job.stage, job.done, job.total, partial = message
+                    if partial is not None:
+                        job.partial = partial
+
+    def stats(self) -> dict:
+        with self._lock:
+            queued = sum(job.started_at is None for job in self._jobs.values())
+            latencies, waits = list(self._latencies), list(self._waits)
+        return {
+            "queued": queued,
+            "running": len(self._jobs) - queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "restarts": self.restarts,
+            "mean_wait": sum(waits) / len(waits) if waits else 0.0,
+            "mean_latency": sum(latencies) / len(latencies) if latencies else 0.0,
+            "max_latency": max(latencies, default=0.0),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_shared_manager = None
+_shared_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    global _shared_manager
+    with _shared_lock:
+        if _shared_manager is None:
+            _shared_manager = JobManager()
+        return _shared_manager
@@ -0,0 +1,276 @@
+import bisect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+METRICS_LOG = os.environ.get("HH_METRICS_LOG")
+METRICS_FILE = os.environ.get("HH_METRICS_FILE")
+METRICS_PORT = int(os.environ.get("HH_METRICS_PORT", 0))
+PROFILER = os.environ.get("HH_PROFILE", "")
+# ?profile= в адресе страницы пишет отчеты на диск сервера, поэтому включается оператором.
+PROFILE_QUERY = os.environ.get("HH_PROFILE_QUERY", "0") == "1"
+PROFILERS = ("cprofile", "pyinstrument")
+PROFILE_DIR = os.environ.get("HH_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "hh_profiles"))
+PREFIX = "hh_"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+logger = logging.getLogger("hh.metrics")
+
+
+def label_key(labels: dict) -> tuple:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def format_labels(key: tuple, extra: dict = None) -> str:
+    pairs = list(key) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Registry:
+    # Счетчики и гистограммы в памяти процесса. Запись - словарь под
+    # threading.Lock, так что инструментирование горячих путей почти бесплатно.
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, label_key(labels))
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Счетчики корзин, затем сумма и число наблюдений.
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 3)
+            histogram[position] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    @contextmanager
+    def span(self, stage: str, **labels):
+        # Время стадии идет в гистограмму stage_seconds и в JSON-лог.
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            self.observe("stage_seconds", seconds, stage=stage)
+            if failed:
+                self.inc("stage_failures_total", stage=stage)
+            if logger.isEnabledFor(logging.INFO):
+                event = {"event": "span", "stage": stage, "seconds": round(seconds, 6), "failed": failed, **labels}
+                logger.info(json.dumps(event, ensure_ascii=False, default=str))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": [[name, list(key), value] for (name, key), value in self._counters.items()],
+                "histograms": [[name, list(key), list(values)] for (name, key), values in self._histograms.items()],
+            }
+
+    def merge(self, snapshot: dict):
+        # Метрики из процессов пула приходят снимком и складываются с локальными.
+        with self._lock:
+            for name, key, value in snapshot["counters"]:
+                key = (name, tuple(map(tuple, key)))
+                self._counters[key] = self._counters.get(key, 0) + value
+            for name, key, values in snapshot["histograms"]:
+                key = (name, tuple(map(tuple, key)))
+                current = self._histograms.setdefault(key, [0] * len(values))
+                for idx, value in enumerate(values):
+                    current[idx] += value
+
+    def drain(self) -> dict:
+        snapshot = self.snapshot()
+        self.reset()
+        return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get((name, label_key(labels)), 0)
+
+    def histogram(self, name: str, **labels) -> tuple[int, float]:
+        # (число наблюдений, сумма)
+        with self._lock:
+            values = self._histograms.get((name, label_key(labels)))
+        return (values[-1], values[-2]) if values else (0, 0.0)
+
+    def prometheus(self) -> str:
+        # Текстовый формат Prometheus 0.0.4.
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(values)) for key, values in self._histograms.items())
+        lines, typed = [], set()
+        for (name, key), value in counters:
+            metric = PREFIX + name
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{format_labels(key)} {value}")
+        for (name, key), values in histograms:
+            metric = PREFIX + name
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            cumulative = 0
+            for bound, count in zip([*self.buckets, "+Inf"], values[: len(self.buckets) + 1]):
+                cumulative += count
+                lines.append(f"{metric}_bucket{format_labels(key, {'le': bound})} {cumulative}")
+            lines.append(f"{metric}_sum{format_labels(key)} {values[-2]}")
+            lines.append(f"{metric}_count{format_labels(key)} {values[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        # Файл для textfile-коллектора node_exporter; замена атомарная.
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            file.write(self.prometheus())
+        os.replace(f"{path}.tmp", path)
+
+
+_shared_registry = None
+_shared_lock = threading.Lock()
+
+
+def get_registry() -> Registry:
+    global _shared_registry
+    with _shared_lock:
+        if _shared_registry is None:
+            _shared_registry = Registry()
+            configure()
+        return _shared_registry
+
+
+def inc(name: str, value: float = 1, **labels):
+    get_registry().inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels):
+    get_registry().observe(name, value, **labels)
+
+
+def span(stage: str, **labels):
+    return get_registry().span(stage, **labels)
+
+
+def export():
+    if METRICS_FILE:
+        get_registry().write_prometheus(METRICS_FILE)
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        if message.startswith("{"):
+            return json.dumps({"ts": round(record.created, 3), **json.loads(message)}, ensure_ascii=False)
+        return json.dumps({"ts": round(record.created, 3), "message": message}, ensure_ascii=False)
+
+
+def configure(log_path: str = METRICS_LOG, port: int = METRICS_PORT):
+    if log_path and not any(getattr(handler, "_hh_metrics", False) for handler in logger.handlers):
+        handler = logging.FileHandler(log_path, encoding="utf-8")
+        handler.setFormatter(JSONFormatter())
+        handler._hh_metrics = True
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    if port:
+        serve_prometheus(port)
+
+
+_server = None
+
+
+def serve_prometheus(port: int, host: str = "0.0.0.0"):
+    # Отдельный HTTP-поток с /metrics: Streamlit не дает добавить свой маршрут.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    global _server
+    if _server is not None:
+        return _server
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = get_registry().prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        _server = ThreadingHTTPServer((host, port), Handler)
+    except OSError:
+        # Порт уже занят другим процессом Streamlit: метрики отдает он.
+        return None
+    threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
+
+
+def profile(name: str, profiler: str = None):
+    # Профилирование одного запроса: cProfile пишет .prof, pyinstrument - .html.
+    # Выключенный хук - это nullcontext, без накладных расходов.
+    profiler = PROFILER if profiler is None else profiler
+    if not profiler:
+        return nullcontext()
+    return _profile(name, profiler)
+
+
+@contextmanager
+def _profile(name: str, profiler: str):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stem = os.path.join(PROFILE_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}")
+    if profiler == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            profiler = "cprofile"
+        else:
+            session = Profiler(async_mode="enabled")
+            session.start()
+            try:
+                yield f"{stem}.html"
+            finally:
+                session.stop()
+                with open(f"{stem}.html", "w", encoding="utf-8") as file:
+                    file.write(session.output_html())
+            return
+
+    import cProfile
+
+    session = cProfile.Profile()
+    session.enable()
+    try:
+        yield f"{stem}.prof"
+    finally:
+        session.disable()
+        session.dump_stats(f"{stem}.prof")
@@ -1,10 +1,35 @@
 import asyncio
 import aiohttp
+import json
+import os
 import random
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from .cache import ResponseCache, query_key
+from .metrics import get_registry
+from .ratelimit import RateLimiter, get_rate_limiter, parse_retry_after
+from .store import VacancyStore
 
 NUMBER_OF_PAGES = 100
 MAX_ATTEMPS = 3
-WAIT_TIME = 3
+MAX_REQUEUES = 2
+
+# HH_API_URL подменяет API, например локальной заглушкой из benchmarks/hh_stub.py.
+API_URL = os.environ.get("HH_API_URL", "https://api.hh.ru/vacancies")
+AREA = "113"
+MAX_PER_PAGE = 100
+RESULT_CAP = 2000
+SEARCH_PERIOD = timedelta(days=30)
+MIN_SLICE = timedelta(hours=1)
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+# Инкрементальный обход: окно начинается чуть раньше отметки, чтобы не потерять
+# вакансии на границе; полная сверка с выдачей выполняется раз в RECONCILE_INTERVAL.
+WATERMARK_OVERLAP = timedelta(hours=1)
+RECONCILE_INTERVAL = float(os.environ.get("HH_RECONCILE_INTERVAL", 7 * 24 * 60 * 60))
+RECONCILE_COVERAGE = 0.98
 
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/85.0.4183.121 Safari/537.36",
@@ -14,48 +39,371 @@ USER_AGENTS = [
 ]
 
 
-async def fetch_page(
-    session: aiohttp.ClientSession, url: str, params: dict, semaphore: asyncio.Semaphore
-):
-    for attempt in range(MAX_ATTEMPS):
-        async with semaphore:
-            headers = {"User-Agent": random.choice(USER_AGENTS)}
+@dataclass
+class CrawlStats:
+    requests: int = 0
+    baseline_requests: int = 0
+    found: int = 0
+    slices: int = 0
+    duplicates: int = 0
+    requeued: int = 0
+    lost_pages: int = 0
+    new: int = 0
+    closed: int = 0
+    # Счетчики одного обхода: у общего лимитера и кэша ответов они за все время процесса.
+    http_requests: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    seconds: float = 0.0
+
+    @property
+    def saved_requests(self) -> int:
+        # Отрицательное значение означает, что ради полной выдачи
+        # пришлось нарезать запрос и сделать больше обращений к API.
+        return self.baseline_requests - self.requests
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.http_requests / self.seconds if self.seconds > 0 else 0.0
+
 
+def status_class(status: int) -> str:
+    if status in (304, 429):
+        return str(status)
+    if status in (0, 599):
+        return "error"
+    return f"{status // 100}xx"
+
+
+async def request_page(
+    session: aiohttp.ClientSession,
+    url: str,
+    params: dict,
+    limiter: RateLimiter = None,
+    cache: ResponseCache = None,
+    stats: CrawlStats = None,
+) -> tuple[bool, dict]:
+    # Возвращает (retryable, data): retryable=True означает, что страницу
+    # стоит вернуть в очередь, а не считать окончательно недоступной.
+    metrics = get_registry()
+    if stats is None:
+        stats = CrawlStats()
+    entry = cache.lookup(url, params) if cache is not None else None
+    if entry is not None and (entry.fresh or cache.offline):
+        metrics.inc("http_cache_total", result="hit")
+        stats.cache_hits += 1
+        return False, entry.data
+    if cache is not None and cache.offline:
+        metrics.inc("http_cache_total", result="miss")
+        stats.cache_misses += 1
+        return False, None
+
+    if limiter is None:
+        limiter = get_rate_limiter()
+
+    for attempt in range(MAX_ATTEMPS):
+        headers = {"User-Agent": random.choice(USER_AGENTS)}
+        if entry is not None:
+            headers.update(entry.conditional_headers())
+        started_at = await limiter.acquire()
+        status, retry_after = 0, None
+        stats.http_requests += 1
+        if attempt:
+            metrics.inc("http_retries_total")
+        try:
             async with session.get(url, params=params, headers=headers) as response:
-                if response.status == 200:
-                    return await response.json()
-                elif response.status == 429:
-                    await asyncio.sleep(2**attempt)
-                elif response.status == 403 or response.status == 400:
-                    return None
-                else:
-                    response.raise_for_status()
-        await asyncio.sleep(random.uniform(0.5, 1.5))
+                status = response.status
+                if status == 200:
+                    metrics.inc("http_response_bytes_total", len(await response.read()))
+                    data = await response.json()
+                    if cache is not None:
+                        metrics.inc("http_cache_total", result="miss")
+                        stats.cache_misses += 1
+                        cache.save(url, params, data, response.headers)
+                    return False, data
+                if status == 304 and entry is not None:
+                    metrics.inc("http_cache_total", result="revalidated")
+                    stats.cache_hits += 1
+                    cache.revalidate(url, params, response.headers)
+                    return False, entry.data
+                if status == 429:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                elif status in (400, 403, 404):
+                    return False, None
+        except (aiohttp.ClientError, aiohttp.ContentTypeError, json.JSONDecodeError, asyncio.TimeoutError):
+            # Оборванный или не-JSON ответ с кодом 200 повторяется как сетевая
+            # ошибка, после всех попыток страница считается потерянной.
+            status = 599
+        finally:
+            limiter.release(started_at, status, retry_after)
+            metrics.inc("http_requests_total", status=status_class(status))
+            metrics.observe("http_request_seconds", time.monotonic() - started_at)
 
+        if attempt < MAX_ATTEMPS - 1:
+            await asyncio.sleep(limiter.retry_delay(attempt))
+    return True, None
 
-async def parse_job(
-    job_title: str = "", number_of_pages: int = NUMBER_OF_PAGES
+
+async def fetch_page(
+    session: aiohttp.ClientSession,
+    url: str,
+    params: dict,
+    limiter: RateLimiter = None,
+    cache: ResponseCache = None,
+):
+    _, data = await request_page(session, url, params, limiter, cache)
+    return data
+
+
+async def fetch_pages(
+    session: aiohttp.ClientSession,
+    url: str,
+    pages: list[dict],
+    limiter: RateLimiter,
+    stats: CrawlStats,
+    cache: ResponseCache = None,
+    on_page=None,
 ) -> list:
+    # Если передан on_page, ответы отдаются по мере готовности и не копятся в списке.
+    queue = asyncio.Queue()
+    for idx, params in enumerate(pages):
+        queue.put_nowait((idx, params, 0))
+    responses = [None] * len(pages)
+
+    async def worker():
+        while True:
+            try:
+                idx, params, requeues = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            retryable, data = await request_page(session, url, params, limiter, cache, stats)
+            if data is not None and on_page is not None:
+                on_page(data)
+            elif data is not None:
+                responses[idx] = data
+            elif retryable and requeues < MAX_REQUEUES:
+                stats.requeued += 1
+                queue.put_nowait((idx, params, requeues + 1))
+            elif retryable:
+                stats.lost_pages += 1
+
+    workers = min(len(pages), limiter.max_concurrency)
+    await asyncio.gather(*[worker() for _ in range(workers)])
+    return responses
+
+
+def plan_pages(
+    pages: int, per_page: int = MAX_PER_PAGE, max_pages: int = NUMBER_OF_PAGES
+) -> range:
+    # Нулевая страница уже получена при разведке, API не отдает
+    # больше RESULT_CAP вакансий на один запрос.
+    reachable = RESULT_CAP // per_page
+    return range(1, max(min(pages, reachable, max_pages), 1))
+
+
+def split_window(window: tuple[datetime, datetime]) -> list[tuple[datetime, datetime]]:
+    date_from, date_to = window
+    if date_to - date_from <= MIN_SLICE:
+        return [window]
+    middle = date_from + (date_to - date_from) / 2
+    return [(date_from, middle), (middle, date_to)]
+
+
+def window_params(window: tuple[datetime, datetime]) -> dict:
+    date_from, date_to = window
+    return {
+        "date_from": date_from.strftime(DATE_FORMAT),
+        "date_to": date_to.strftime(DATE_FORMAT),
+    }
+
+
+async def crawl_slice(
+    session: aiohttp.ClientSession,
+    url: str,
+    params: dict,
+    limiter: RateLimiter,
+    stats: CrawlStats,
+    emit,
+    max_pages: int = NUMBER_OF_PAGES,
+    window: tuple[datetime, datetime] = None,
+    cache: ResponseCache = None,
+    root: bool = True,
+):
+    slice_params = dict(params)
+    if window is not None:
+        slice_params.update(window_params(window))
+
+    stats.requests += 1
+    [first] = await fetch_pages(
+        session, url, [{**slice_params, "page": 0}], limiter, stats, cache
+    )
+    if not first:
+        return
+
+    items = first.get("items", [])
+    found = first.get("found", len(items))
+    pages = first.get("pages", 1)
+
+    # found выдачи - по первой странице верхнего вызова, в том числе для окна
+    # инкрементального обхода; вложенные окна его не перезаписывают.
+    if root:
+        stats.found = found
+
+    per_page = int(params["per_page"])
+    if found > RESULT_CAP and max_pages * per_page > RESULT_CAP:
+        if window is None:
+            # Округляем вверх до часа, чтобы окна (и ключи кэша) были стабильны.
+            now = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+            slices = [(now - SEARCH_PERIOD, now)]
+        else:
+            slices = split_window(window)
+
+        if slices != [window]:
+            stats.slices += len(slices)
+            await asyncio.gather(
+                *[
+                    crawl_slice(
+                        session, url, params, limiter, stats, emit, max_pages, part, cache, root=False
+                    )
+                    for part in slices
+                ]
+            )
+            return
+
+    emit(items)
+    planned = [{**slice_params, "page": page} for page in plan_pages(pages, per_page, max_pages)]
+    stats.requests += len(planned)
+    await fetch_pages(
+        session, url, planned, limiter, stats, cache,
+        on_page=lambda resp: emit(resp.get("items", [])),
+    )
+
+
+def unique_items(items: list, stats: CrawlStats = None, seen: set = None) -> list:
+    if seen is None:
+        seen = set()
     data = []
-    url = "https://api.hh.ru/vacancies"
-    semaphore = asyncio.Semaphore(WAIT_TIME)
-
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        for page in range(number_of_pages):
-            params = {"text": job_title, "area": "113", "per_page": "10", "page": page}
-            tasks.append(fetch_page(session, url, params, semaphore))
-
-        responses = await asyncio.gather(*tasks)
-
-        for resp in responses:
-            if resp is None:
-                continue
-            elif resp and "items" in resp and len(resp["items"]) > 0:
-                data.extend(resp["items"])
+    for item in items:
+        key = item.get("id")
+        if key is not None and key in seen:
+            if stats is not None:
+                stats.duplicates += 1
+            continue
+        seen.add(key)
+        data.append(item)
     return data
 
 
+async def iter_pages(
+    job_title: str = "",
+    number_of_pages: int = NUMBER_OF_PAGES,
+    per_page: int = MAX_PER_PAGE,
+    stats: CrawlStats = None,
+    limiter: RateLimiter = None,
+    cache: ResponseCache = None,
+    session: aiohttp.ClientSession = None,
+    since: datetime = None,
+):
+    if stats is None:
+        stats = CrawlStats()
+    if limiter is None:
+        limiter = get_rate_limiter()
+    stats.baseline_requests += number_of_pages
+
+    url = API_URL
+    params = {"text": job_title, "area": AREA, "per_page": str(per_page)}
+    pages = asyncio.Queue()
+    seen = set()
+
+    # Переданную сессию (общий пул соединений для многих запросов) не закрываем.
+    async with nullcontext(session) if session is not None else aiohttp.ClientSession() as session:
+
+        async def crawl():
+            started_at = time.monotonic()
+            try:
+                # С since обходится только окно от отметки до текущего часа.
+                window = None
+                if since is not None:
+                    now = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+                    window = (since, now)
+                await crawl_slice(
+                    session, url, params, limiter, stats, pages.put_nowait,
+                    number_of_pages, window, cache,
+                )
+            finally:
+                stats.seconds += time.monotonic() - started_at
+                pages.put_nowait(None)
+
+        task = asyncio.create_task(crawl())
+        try:
+            while (items := await pages.get()) is not None:
+                items = unique_items(items, stats, seen)
+                if items:
+                    yield items
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        await task
+
+
+async def parse_job(
+    job_title: str = "",
+    number_of_pages: int = NUMBER_OF_PAGES,
+    per_page: int = MAX_PER_PAGE,
+    stats: CrawlStats = None,
+    limiter: RateLimiter = None,
+    cache: ResponseCache = None,
+    session: aiohttp.ClientSession = None,
+    store: VacancyStore = None,
+) -> list:
+    with get_registry().span("parse_job", incremental=store is not None):
+        if store is not None:
+            return await sync_job(job_title, store, number_of_pages, per_page, stats, limiter, cache, session)
+        data = []
+        async for items in iter_pages(job_title, number_of_pages, per_page, stats, limiter, cache, session):
+            data.extend(items)
+        return data
+
+
+async def sync_job(
+    job_title: str,
+    store: VacancyStore,
+    number_of_pages: int = NUMBER_OF_PAGES,
+    per_page: int = MAX_PER_PAGE,
+    stats: CrawlStats = None,
+    limiter: RateLimiter = None,
+    cache: ResponseCache = None,
+    session: aiohttp.ClientSession = None,
+    reconcile_interval: float = RECONCILE_INTERVAL,
+) -> list:
+    # Инкрементальный режим parse_job: запрашиваются только вакансии новее
+    # отметки запроса, они сливаются в хранилище, а результатом служат все
+    # открытые вакансии запроса из хранилища.
+    if stats is None:
+        stats = CrawlStats()
+    key = query_key(job_title, AREA)
+    watermark, _, reconciled_at = store.watermark(key)
+    started_at = time.time()
+    full = watermark is None or reconciled_at is None or started_at - reconciled_at >= reconcile_interval
+    since = None if full else watermark - WATERMARK_OVERLAP
+
+    seen = set()
+    async for items in iter_pages(job_title, number_of_pages, per_page, stats, limiter, cache, session, since):
+        stats.new += store.merge(key, items, started_at)
+        seen.update(item.get("id") for item in items)
+
+    # Закрывать пропавшие можно только по полной и непотерянной выдаче.
+    reconciled = full and stats.lost_pages == 0 and len(seen) >= stats.found * RECONCILE_COVERAGE
+    if reconciled:
+        stats.closed += store.close_missing(key, seen, started_at)
+    stats.closed += store.close_expired(key, SEARCH_PERIOD, started_at)
+    # С потерянными страницами отметка не двигается, и следующий обход их повторит.
+    if stats.lost_pages == 0:
+        store.advance(key, started_at, reconciled)
+    return store.items(key)
+
+
 def get_key_words(keywords: list[str] = None) -> str:
     if keywords is None:
         keywords = []
@@ -1,12 +1,16 @@
+import os
 import re
-import nltk
-from nltk.corpus import stopwords
+from functools import lru_cache
+from itertools import product
+
+import numpy as np
 import pandas as pd
 
+from .metrics import get_registry
 
-nltk.download("stopwords")
-nltk.download("punkt_tab")
-russian_stopwords = stopwords.words("russian")
+NLTK_DATA_PATH = os.environ.get(
+    "NLTK_DATA_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "nltk_data")
+)
 
 EXP_LEVELS = {
     "Нет опыта": 0,
@@ -15,6 +19,7 @@ EXP_LEVELS = {
     "Более 6 лет": 3,
 }
 SELECTED_COLUMNS = [
+    "id",
     "premium",
     "name",
     "has_test",
@@ -34,6 +39,54 @@ SELECTED_COLUMNS = [
     "address_lat",
     "address_lng",
 ]
+NUMERIC_COLUMNS = ["salary_from", "salary_to", "address_lat", "address_lng"]
+SALARY_COLUMNS = ["salary_from", "salary_to", "salary_currency"]
+# id нужен дедупликации, но кадры без него остаются допустимым входом.
+OPTIONAL_COLUMNS = ["id"]
+FLAG_COLUMNS = ["premium", "has_test", "response_letter_required"]
+CATEGORICAL_COLUMNS = ["area_name", "schedule_name", "professional_roles_name", "employment_name"]
+EXPERIENCE_DTYPE = pd.CategoricalDtype(list(EXP_LEVELS), ordered=True)
+TRUE_VALUES = [True, "True", "true"]
+DEFAULT_CURRENCY = "RUR"
+# Приблизительные курсы к рублю; USD оставлен равным 100, как в исходном правиле.
+CURRENCY_RATES = {
+    "RUR": 1.0,
+    "RUB": 1.0,
+    "USD": 100.0,
+    "EUR": 105.0,
+    "KZT": 0.2,
+    "UAH": 2.4,
+    "BYR": 30.0,
+    "BYN": 30.0,
+    "UZS": 0.008,
+    "AZN": 59.0,
+    "GEL": 37.0,
+    "KGS": 1.15,
+}
+MISSING = object()
+
+
+@lru_cache(maxsize=None)
+def get_russian_stopwords() -> list[str]:
+    # Данные NLTK кладутся в образ при сборке, поэтому сеть не нужна,
+    # а сам nltk (импорт которого занимает секунды) нужен только как запасной путь.
+    path = os.path.join(NLTK_DATA_PATH, "corpora", "stopwords", "russian")
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as file:
+            return [line.strip() for line in file if line.strip()]
+
+    import nltk
+    from nltk.corpus import stopwords
+
+    if NLTK_DATA_PATH not in nltk.data.path:
+        nltk.data.path.insert(0, NLTK_DATA_PATH)
+    return stopwords.words("russian")
+
+
+def __getattr__(name: str):
+    if name == "russian_stopwords":
+        return get_russian_stopwords()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def flatten(entry: dict, prefix: str = None, ignore_keys: list = None) -> dict:
@@ -84,42 +137,215 @@ def merge_entries(entries: list[dict]) -> dict:
     return merged_entries
 
 
-def fill_gaps(df: pd.DataFrame) -> pd.DataFrame:
-    df["salary_from"] = pd.to_numeric(df["salary_from"], errors="coerce")
-    df["salary_to"] = pd.to_numeric(df["salary_to"], errors="coerce")
+def column_paths(column: str) -> list[tuple[str, ...]]:
+    # Все способы разбить плоское имя колонки на путь в JSON:
+    # "snippet_requirement" -> ("snippet_requirement",), ("snippet", "requirement").
+    parts = column.split("_")
+    paths = []
+    for cuts in product([False, True], repeat=len(parts) - 1):
+        path, current = [], parts[0]
+        for part, cut in zip(parts[1:], cuts):
+            if cut:
+                path.append(current)
+                current = part
+            else:
+                current = f"{current}_{part}"
+        path.append(current)
+        paths.append(tuple(path))
+    return sorted(paths, key=len)
+
+
+def walk(value, path: tuple[str, ...]):
+    for idx, key in enumerate(path):
+        if isinstance(value, list):
+            # Как во flatten: при нескольких элементах списка побеждает последний.
+            for element in reversed(value):
+                if isinstance(element, dict):
+                    found = walk(element, path[idx:])
+                    if found is not MISSING:
+                        return found
+            return MISSING
+        if not isinstance(value, dict):
+            return MISSING
+        value = value.get(key, MISSING)
+        if value is MISSING:
+            return MISSING
+    if isinstance(value, list):
+        scalars = [element for element in value if not isinstance(element, (dict, list))]
+        return scalars[-1] if scalars else MISSING
+    if isinstance(value, dict):
+        return MISSING
+    return value
+
+
+def resolve(entry: dict, paths: list[tuple[str, ...]]) -> tuple[tuple[str, ...], object]:
+    for path in paths:
+        value = walk(entry, path)
+        if value is not MISSING:
+            return path, value
+    return None, MISSING
+
+
+def compile_getter(path: tuple[str, ...], paths: list[tuple[str, ...]]):
+    # Быстрый доступ по уже найденному пути; списки и неожиданные
+    # структуры уходят в общий walk с семантикой flatten.
+    head, tail = path[0], path[1:]
+
+    def getter(entry: dict):
+        value = entry.get(head, MISSING)
+        if value is MISSING:
+            return resolve(entry, paths)[1]
+        for key in tail:
+            if type(value) is dict:
+                value = value.get(key, MISSING)
+            elif value is None:
+                # Промежуточный объект пуст (например, "salary": null).
+                return MISSING
+            else:
+                return walk(entry, path)
+        if type(value) is dict or type(value) is list:
+            return walk(entry, path)
+        return value
+
+    return getter
+
+
+def compile_extractor(columns: list[str] = SELECTED_COLUMNS):
+    candidates = {column: column_paths(column) for column in columns}
+    learned = {}
+
+    def getter_for(column: str, entries: list[dict]):
+        paths = candidates[column]
+        if column not in learned:
+            for entry in entries:
+                path, _ = resolve(entry, paths)
+                if path is not None:
+                    learned[column] = path
+                    break
+            else:
+                return lambda entry: resolve(entry, paths)[1]
+        return compile_getter(learned[column], paths)
+
+    def extract(entries: list[dict]) -> pd.DataFrame:
+        size = len(entries)
+        data = {}
+        for column in columns:
+            getter = getter_for(column, entries)
+            if column in NUMERIC_COLUMNS:
+                array = np.full(size, np.nan, dtype=np.float64)
+                for idx, value in enumerate(map(getter, entries)):
+                    if value is not MISSING and value is not None:
+                        try:
+                            array[idx] = value
+                        except (TypeError, ValueError):
+                            pass
+            else:
+                array = np.empty(size, dtype=object)
+                array[:] = [pd.NA if value is MISSING else value for value in map(getter, entries)]
+            data[column] = array
+        return pd.DataFrame(data, columns=columns)
 
-    df["salary_to"] = df["salary_to"].fillna(df["salary_from"])
-    df["salary_from"] = df["salary_from"].fillna(df["salary_to"])
-    df["salary_currency"] = df["salary_currency"].fillna("RUR")
+    return extract
 
-    df["salary_from"] = df["salary_from"].fillna(0).astype(int)
 
-    df["salary"] = df["salary_from"] * df["salary_currency"].apply(
-        lambda x: 1 if x == "RUR" else 100
+extract_frame = compile_extractor(SELECTED_COLUMNS)
+
+
+def salary_in_rub(
+    salary_from: pd.Series, salary_to: pd.Series, currency: pd.Series
+) -> np.ndarray:
+    low = pd.to_numeric(salary_from, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    high = pd.to_numeric(salary_to, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    low = np.where(np.isnan(low), high, low)
+    # Валюта без курса в таблице считается как неуказанная зарплата.
+    rates = (
+        currency.astype(object)
+        .fillna(DEFAULT_CURRENCY)
+        .map(CURRENCY_RATES)
+        .to_numpy(dtype=np.float64, na_value=np.nan)
+    )
+    salary = np.trunc(np.nan_to_num(low)) * rates
+    return np.nan_to_num(salary).round().astype(np.int64)
+
+
+def gap_free_columns(
+    df: pd.DataFrame, columns: list[str]
+) -> tuple[dict[str, object], np.ndarray]:
+    data = {}
+    for column in columns:
+        if column in SALARY_COLUMNS or (column in OPTIONAL_COLUMNS and column not in df.columns):
+            continue
+        if column in ("address_lat", "address_lng"):
+            data[column] = pd.to_numeric(df[column], errors="coerce").to_numpy(
+                dtype=np.float64, na_value=np.nan
+            )
+        else:
+            data[column] = df[column].array
+    data["salary"] = salary_in_rub(
+        df["salary_from"], df["salary_to"], df["salary_currency"]
+    )
+    keep = ~(np.isnan(data["address_lat"]) | np.isnan(data["address_lng"]))
+    return data, keep
+
+
+def fill_gaps(df: pd.DataFrame) -> pd.DataFrame:
+    data, keep = gap_free_columns(df, df.columns)
+    rows = np.flatnonzero(keep)
+    return pd.DataFrame(
+        {column: values.take(rows) for column, values in data.items()}, index=df.index[rows]
     )
 
-    df = df.drop(["salary_from", "salary_to", "salary_currency"], axis=1)
-    df["address_lat"] = pd.to_numeric(df["address_lat"], errors="coerce")
-    df["address_lng"] = pd.to_numeric(df["address_lng"], errors="coerce")
 
-    df = df.dropna(subset=["address_lat", "address_lng"])
-    return df
+def flag_mask(values) -> np.ndarray:
+    return pd.Series(values).isin(TRUE_VALUES).to_numpy(dtype=np.int8)
 
 
 def process_dataframe(
     df: pd.DataFrame, selected_columns: list[str] = SELECTED_COLUMNS
 ) -> pd.DataFrame:
-    df = df[selected_columns]
-    df = fill_gaps(df.copy())
-    df["has_test"] = df["has_test"].apply(lambda x: 1 if x == "True" else 0)
-    df["premium"] = df["premium"].apply(lambda x: 1 if x == "True" else 0)
-    df["response_letter_required"] = df["response_letter_required"].apply(
-        lambda x: 1 if x == "True" else 0
-    )
-    df["is_salary_set"] = df["salary"].apply(
-        lambda x: "Не указана" if x == 0 else "Указана"
-    )
-    df["exp_sort"] = df["experience_name"].apply(lambda x: EXP_LEVELS[str(x)])
-    df = df.sort_values(by="exp_sort", ascending=True)
-    df = df.drop("exp_sort", axis=1)
-    return df
+    # Фильтрация и сортировка по опыту собираются в один массив индексов,
+    # чтобы каждая колонка копировалась ровно один раз.
+    data, keep = gap_free_columns(df, selected_columns)
+    experience = pd.Categorical(data["experience_name"], dtype=EXPERIENCE_DTYPE)
+    codes = np.where(experience.codes < 0, len(EXP_LEVELS), experience.codes)
+    rows = np.flatnonzero(keep)
+    rows = rows[np.argsort(codes[rows], kind="stable")]
+
+    result = {}
+    for column, values in data.items():
+        if column in FLAG_COLUMNS:
+            result[column] = flag_mask(values.take(rows))
+        elif column == "experience_name":
+            result[column] = experience.take(rows)
+        elif column in CATEGORICAL_COLUMNS:
+            result[column] = pd.Categorical(values.take(rows))
+        else:
+            result[column] = values.take(rows)
+    result["is_salary_set"] = np.where(result["salary"] == 0, "Не указана", "Указана")
+    return pd.DataFrame(result, index=df.index[rows])
+
+
+def process_page(
+    items: list[dict], selected_columns: list[str] = SELECTED_COLUMNS
+) -> pd.DataFrame:
+    metrics = get_registry()
+    with metrics.span("extract"):
+        if selected_columns is SELECTED_COLUMNS:
+            df = extract_frame(items)
+        else:
+            df = compile_extractor(selected_columns)(items)
+    with metrics.span("process_dataframe"):
+        return process_dataframe(df, selected_columns)
+
+
+def concat_chunks(chunks: list[pd.DataFrame]) -> pd.DataFrame:
+    chunks = [chunk for chunk in chunks if not chunk.empty]
+    if not chunks:
+        return pd.DataFrame()
+    df = pd.concat(chunks, ignore_index=True)
+    # У чанков разные наборы категорий, после concat такие колонки становятся object.
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    df["experience_name"] = df["experience_name"].astype(EXPERIENCE_DTYPE)
+    return df.sort_values(by="experience_name", kind="stable")
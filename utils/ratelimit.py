@@ -0,0 +1,152 @@
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+RATE = 10.0
+BURST = 10
+CONCURRENCY = 3
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 16
+TARGET_LATENCY = 2.0
+INCREASE = 1.0
+DECREASE = 0.5
+RETRY_BASE = 0.5
+RETRY_CAP = 30.0
+POLL_INTERVAL = 0.02
+
+
+def parse_retry_after(value: str) -> float:
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max((moment - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class RateLimiter:
+    # Состояние защищено threading.Lock, а ожидание идет через asyncio.sleep:
+    # так один объект можно делить между сессиями и event loop'ами
+    # (Streamlit создает новый loop на каждый перезапуск скрипта).
+    def __init__(
+        self,
+        rate: float = RATE,
+        burst: int = BURST,
+        concurrency: float = CONCURRENCY,
+        min_concurrency: int = MIN_CONCURRENCY,
+        max_concurrency: int = MAX_CONCURRENCY,
+        target_latency: float = TARGET_LATENCY,
+        retry_base: float = RETRY_BASE,
+        retry_cap: float = RETRY_CAP,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = float(concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._cooldown_until = 0.0
+        self._in_flight = 0
+
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self._started_at = None
+        self._finished_at = None
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _try_acquire(self) -> float:
+        now = time.monotonic()
+        with self._lock:
+            if now < self._cooldown_until:
+                return self._cooldown_until - now
+            if self._in_flight >= int(self.concurrency):
+                return POLL_INTERVAL
+            self._refill(now)
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+            self._in_flight += 1
+            if self._started_at is None:
+                self._started_at = now
+            return 0.0
+
+    async def acquire(self) -> float:
+        while True:
+            delay = self._try_acquire()
+            if delay == 0.0:
+                return time.monotonic()
+            await asyncio.sleep(delay)
+
+    def release(self, started_at: float, status: int = 200, retry_after: float = None):
+        now = time.monotonic()
+        latency = now - started_at
+        with self._lock:
+            self._in_flight -= 1
+            self.requests += 1
+            self._finished_at = now
+
+            if status == 429:
+                self.throttled += 1
+                self.concurrency = max(self.min_concurrency, self.concurrency * DECREASE)
+                if retry_after is not None:
+                    self._cooldown_until = max(self._cooldown_until, now + retry_after)
+            elif status >= 500:
+                self.errors += 1
+                self.concurrency = max(self.min_concurrency, self.concurrency * DECREASE)
+            elif latency > self.target_latency:
+                self.concurrency = max(self.min_concurrency, self.concurrency * DECREASE)
+            else:
+                self.concurrency = min(
+                    self.max_concurrency, self.concurrency + INCREASE / self.concurrency
+                )
+
+    def retry_delay(self, attempt: int) -> float:
+        # "Full jitter": случайная задержка в пределах экспоненциального окна.
+        return random.uniform(0, min(self.retry_cap, self.retry_base * 2**attempt))
+
+    @property
+    def requests_per_second(self) -> float:
+        if self._started_at is None or self._finished_at is None:
+            return 0.0
+        elapsed = self._finished_at - self._started_at
+        return self.requests / elapsed if elapsed > 0 else float(self.requests)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "concurrency": int(self.concurrency),
+            "requests_per_second": round(self.requests_per_second, 2),
+        }
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter()
+        return _shared_limiter
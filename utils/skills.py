@@ -0,0 +1,315 @@
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .history import ALL_LEVELS
+from .processing import EXPERIENCE_DTYPE, get_russian_stopwords
+
+TEXT_COLUMNS = ["snippet_requirement", "snippet_responsibility"]
+MAX_PATTERN_TOKENS = 4
+# Разделители слов: пунктуация, кроме + # . -, чтобы c++, c#, .net, node.js
+# и scikit-learn оставались одним словом. Класс перечислен явно, \w в RE2 медленный.
+SEPARATORS = r"[!-\x22$-*,/:-@\[-`{-~«»„“”‘’—–…№•·\s\x{a0}]+"
+# Навык -> синонимы. Синонимы нормализуются так же, как текст вакансий,
+# поэтому регистр и пунктуация в них не важны; само название тоже синоним.
+SKILLS = {
+    "Python": ["питон", "пайтон"],
+    "Java": [],
+    "JavaScript": ["js", "java script", "ecmascript"],
+    "TypeScript": [],
+    "Go": ["golang"],
+    "C++": ["cpp", "плюсы"],
+    "C#": ["c sharp", "csharp"],
+    ".NET": ["dotnet", "asp.net", "net core"],
+    "PHP": [],
+    "Kotlin": [],
+    "Swift": [],
+    "Rust": [],
+    "Scala": [],
+    "Ruby": ["ruby on rails", "rails"],
+    "1С": ["1c", "1с предприятие"],
+    "SQL": ["t-sql", "pl/sql", "plsql", "tsql"],
+    "PostgreSQL": ["postgres", "postgre", "постгрес"],
+    "MySQL": ["mariadb"],
+    "MS SQL": ["mssql", "sql server", "ms sql server"],
+    "Oracle": [],
+    "ClickHouse": ["кликхаус"],
+    "MongoDB": ["mongo"],
+    "Redis": [],
+    "Elasticsearch": ["elastic", "elk", "opensearch"],
+    "Kafka": ["apache kafka", "кафка"],
+    "RabbitMQ": ["rabbit"],
+    "Spark": ["apache spark", "pyspark"],
+    "Hadoop": ["hdfs"],
+    "Hive": ["apache hive"],
+    "Airflow": ["apache airflow"],
+    "Django": ["drf", "django rest framework"],
+    "Flask": [],
+    "FastAPI": ["fast api"],
+    "Spring": ["spring boot", "spring framework"],
+    "React": ["react.js", "reactjs"],
+    "Vue": ["vue.js", "vuejs"],
+    "Angular": [],
+    "Node.js": ["nodejs"],
+    "HTML": ["html5"],
+    "CSS": ["css3", "scss", "sass"],
+    "REST API": ["rest", "restful"],
+    "GraphQL": [],
+    "gRPC": [],
+    "Микросервисы": ["микросервисная архитектура", "микросервисов", "микросервисной", "microservices"],
+    "Docker": ["докер", "docker compose", "docker-compose"],
+    "Kubernetes": ["k8s", "кубернетес"],
+    "CI/CD": ["ci cd", "gitlab ci", "jenkins", "github actions"],
+    "Git": ["гит"],
+    "GitLab": [],
+    "GitHub": [],
+    "Linux": ["линукс"],
+    "Unix": [],
+    "Bash": ["shell-скрипты"],
+    "Ansible": [],
+    "Terraform": [],
+    "AWS": ["amazon web services"],
+    "Nginx": [],
+    "Prometheus": [],
+    "Grafana": ["графана"],
+    "pandas": ["пандас"],
+    "NumPy": [],
+    "scikit-learn": ["sklearn", "scikit learn"],
+    "PyTorch": ["torch"],
+    "TensorFlow": ["keras"],
+    "Машинное обучение": ["machine learning", "машинного обучения"],
+    "Глубокое обучение": ["deep learning", "нейронные сети", "нейросети", "нейронных сетей"],
+    "NLP": ["обработка естественного языка"],
+    "Computer Vision": ["компьютерное зрение", "компьютерного зрения"],
+    "Статистика": ["математическая статистика", "статистики", "математической статистики"],
+    "Excel": ["эксель", "ms excel"],
+    "Power BI": ["powerbi"],
+    "Tableau": [],
+    "Jira": ["джира"],
+    "Confluence": [],
+    "ООП": ["oop", "объектно-ориентированного программирования"],
+    "SOLID": [],
+    "Паттерны проектирования": ["паттернов проектирования", "design patterns"],
+    "Алгоритмы": ["алгоритмов", "структуры данных", "структур данных"],
+    "Unit-тесты": [
+        "unit tests",
+        "unit-тестов",
+        "юнит-тесты",
+        "юнит-тестов",
+        "модульные тесты",
+        "модульных тестов",
+        "автотесты",
+        "автотестов",
+        "pytest",
+        "junit",
+    ],
+    "Selenium": [],
+    "Figma": ["фигма"],
+    "Английский язык": ["английский", "английского", "english"],
+    "Agile": ["scrum", "kanban", "скрам"],
+}
+
+
+def split_words(words: pa.Array, stopwords: list[str] = None) -> tuple[np.ndarray, pa.Array]:
+    # Нормализация одного слова выдачи: теги, ссылки, регистр, пунктуация.
+    # Слово может распасться на несколько ("python/django") или исчезнуть
+    # (стоп-слово, одна пунктуация). Возвращает число частей и сами части подряд.
+    words = pc.replace_substring_regex(words, r"<[^<]+?>", " ")
+    words = pc.replace_substring_regex(words, r"http\S+", " ")
+    parts = pc.split_pattern_regex(pc.utf8_lower(words), SEPARATORS)
+    owners = pc.list_parent_indices(parts).to_numpy()
+    # Точка и дефис по краям - конец предложения или переноса, а не часть навыка.
+    flat = pc.utf8_ltrim(pc.utf8_rtrim(pc.list_flatten(parts), characters=".-"), characters="-")
+    keep = pc.not_equal(flat, "")
+    if stopwords:
+        keep = pc.and_(keep, pc.invert(pc.is_in(flat, value_set=pa.array(stopwords, type=pa.string()))))
+    keep = keep.to_numpy(zero_copy_only=False)
+    return np.bincount(owners[keep], minlength=len(words)), flat.filter(keep)
+
+
+def tokenize(
+    texts: pa.Array, stopwords: list[str] = None, vocabulary: pa.Array = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, pa.Array]:
+    # Возвращает (номер строки, позиция, код слова, словарь) для значимых слов.
+    # Тексты режутся только по пробелам (ASCII-разбиение безопасно для UTF-8),
+    # а регулярки выполняются над словарем уникальных слов, который на порядки
+    # меньше текста. С vocabulary коды берутся из него, и раскрываются только
+    # слова, в которых есть известные части; позиции нужны, чтобы проверить,
+    # что слова шаблона стоят в тексте подряд.
+    tokens = pc.ascii_split_whitespace(texts)
+    rows = pc.list_parent_indices(tokens).to_numpy()
+    encoded = pc.dictionary_encode(pc.list_flatten(tokens))
+    lengths, parts = split_words(encoded.dictionary, stopwords)
+    encoded_parts = pc.dictionary_encode(parts)
+    part_codes = encoded_parts.indices.to_numpy().astype(np.int64)
+    words = encoded_parts.dictionary
+    if vocabulary is not None:
+        lookup = pc.index_in(words, value_set=vocabulary).fill_null(-1).to_numpy()
+        part_codes, words = lookup.astype(np.int64)[part_codes], vocabulary
+    offsets = np.cumsum(lengths) - lengths
+
+    indices = encoded.indices.to_numpy()
+    counts = lengths[indices]
+    starts = np.cumsum(counts) - counts
+    if vocabulary is None:
+        selected = np.flatnonzero(counts)
+    else:
+        owners = np.repeat(np.arange(len(lengths)), lengths)
+        interesting = np.zeros(len(lengths), dtype=bool)
+        interesting[owners[part_codes >= 0]] = True
+        selected = np.flatnonzero(interesting[indices])
+    indices, counts, rows, starts = indices[selected], counts[selected], rows[selected], starts[selected]
+
+    # Каждое выбранное вхождение раскрывается в свои части (обычно ровно одну).
+    inner = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+    codes = part_codes[np.repeat(offsets[indices], counts) + inner]
+    return np.repeat(rows.astype(np.int64), counts), np.repeat(starts, counts) + inner, codes, words
+
+
+class SkillMatcher:
+    # Многошаблонный поиск по словам: каждый синоним - последовательность
+    # кодов слов, текст переводится в те же коды, и для каждой длины шаблона
+    # все окна проверяются одним векторным searchsorted. Это тот же линейный
+    # проход, что у автомата Ахо-Корасик, но без цикла Python по символам.
+    def __init__(self, skills: dict = SKILLS, stopwords: list[str] = None):
+        self.stopwords = get_russian_stopwords() if stopwords is None else stopwords
+        self.names = list(skills)
+        synonyms = [(skill, text) for skill, name in enumerate(self.names) for text in [name, *skills[name]]]
+        rows, _, codes, self.vocabulary = tokenize(
+            pa.array([text for _, text in synonyms], type=pa.string()), self.stopwords
+        )
+        self.base = len(self.vocabulary) + 1
+        if self.base ** MAX_PATTERN_TOKENS >= 2**63:
+            raise ValueError("Словарь навыков слишком велик для 64-битных ключей")
+        patterns = {}
+        for row, (skill, text) in enumerate(synonyms):
+            pattern = tuple(codes[rows == row])
+            if not pattern or len(pattern) > MAX_PATTERN_TOKENS:
+                continue
+            # Первый навык с таким синонимом побеждает.
+            patterns.setdefault(pattern, skill)
+
+        self.patterns = {}
+        for length in sorted({len(pattern) for pattern in patterns}):
+            keys = np.array(
+                [self.key(pattern) for pattern in patterns if len(pattern) == length], dtype=np.int64
+            )
+            ids = np.array([skill for pattern, skill in patterns.items() if len(pattern) == length])
+            order = np.argsort(keys)
+            self.patterns[length] = (keys[order], ids[order])
+
+    def key(self, pattern: tuple) -> int:
+        value = 0
+        for code in pattern:
+            value = value * self.base + int(code)
+        return value
+
+    def match(self, texts: pa.Array) -> tuple[np.ndarray, np.ndarray]:
+        # Уникальные пары (номер текста, номер навыка).
+        rows, positions, codes, _ = tokenize(texts, self.stopwords, self.vocabulary)
+        # Дальше участвуют только слова из словаря навыков (обычно малая доля текста);
+        # окно из length слов допустимо, если их позиции в тексте идут подряд.
+        known = codes >= 0
+        rows, positions, codes = rows[known], positions[known], codes[known]
+
+        found = []
+        for length, (keys, ids) in self.patterns.items():
+            count = len(codes) - length + 1
+            if count <= 0:
+                continue
+            if length == 1:
+                starts = np.arange(len(codes))
+            else:
+                span = positions[length - 1 :] - positions[:count]
+                starts = np.flatnonzero((span == length - 1) & (rows[length - 1 :] == rows[:count]))
+            window = codes[starts]
+            for offset in range(1, length):
+                window = window * self.base + codes[starts + offset]
+            index = np.minimum(np.searchsorted(keys, window), len(keys) - 1)
+            hit = keys[index] == window
+            found.append(rows[starts[hit]] * len(self.names) + ids[index[hit]])
+
+        # Повторы навыка в одном тексте схлопываются битовой картой текст x навык,
+        # это быстрее, чем np.unique по миллионам пар.
+        seen = np.zeros(len(texts) * len(self.names), dtype=bool)
+        for pairs in found:
+            seen[pairs] = True
+        return np.divmod(np.flatnonzero(seen), len(self.names))
+
+
+@dataclass
+class SkillReport:
+    vacancies: pd.Series
+    frequencies: pd.DataFrame
+    cooccurrence: pd.DataFrame
+
+    @property
+    def shares(self) -> pd.DataFrame:
+        # Доля вакансий уровня, в которых упомянут навык.
+        return self.frequencies.div(self.vacancies.replace(0, np.nan), axis=1).fillna(0.0)
+
+
+def skill_texts(df: pd.DataFrame, columns: list[str] = TEXT_COLUMNS) -> pa.Array:
+    parts = [
+        pa.array(df[column], type=pa.string(), from_pandas=True)
+        for column in columns
+        if column in df.columns
+    ]
+    if not parts:
+        return pa.array([""] * len(df), type=pa.string())
+    # Перевод строки между колонками: шаблон не склеит конец одной с началом другой.
+    return pc.binary_join_element_wise(*parts, " \n ", null_handling="replace", null_replacement="")
+
+
+_shared_matcher = None
+_shared_lock = threading.Lock()
+
+
+def get_skill_matcher() -> SkillMatcher:
+    global _shared_matcher
+    with _shared_lock:
+        if _shared_matcher is None:
+            _shared_matcher = SkillMatcher()
+        return _shared_matcher
+
+
+def skill_report(
+    df: pd.DataFrame, matcher: SkillMatcher = None, columns: list[str] = TEXT_COLUMNS
+) -> SkillReport:
+    from scipy.sparse import csr_matrix
+
+    if matcher is None:
+        matcher = get_skill_matcher()
+    rows, skills = matcher.match(skill_texts(df, columns))
+    names = np.array(matcher.names, dtype=object)
+
+    # Частоты по уровням опыта одним bincount; последний столбец - все вакансии.
+    levels = list(EXPERIENCE_DTYPE.categories)
+    experience = pd.Categorical(df["experience_name"], dtype=EXPERIENCE_DTYPE) if "experience_name" in df else None
+    codes = np.full(len(df), len(levels), dtype=np.int64)
+    if experience is not None:
+        codes[experience.codes >= 0] = experience.codes[experience.codes >= 0]
+    table = np.bincount(
+        codes[rows] * len(names) + skills, minlength=(len(levels) + 1) * len(names)
+    ).reshape(len(levels) + 1, len(names))
+    present = np.flatnonzero(table.sum(axis=0))
+    present = present[np.argsort(-table.sum(axis=0)[present], kind="stable")]
+    frequencies = pd.DataFrame(table[: len(levels), present].T, index=names[present], columns=levels)
+    frequencies[ALL_LEVELS] = table[:, present].sum(axis=0)
+    vacancies = pd.Series(np.bincount(codes, minlength=len(levels) + 1)[: len(levels)], index=levels)
+    vacancies[ALL_LEVELS] = len(df)
+
+    # Совместная встречаемость: M^T M по разреженной матрице вакансия x навык.
+    position = np.full(len(names), -1)
+    position[present] = np.arange(len(present))
+    matrix = csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, position[skills])), shape=(len(df), len(present))
+    )
+    cooccurrence = pd.DataFrame(
+        (matrix.T @ matrix).toarray(), index=names[present], columns=names[present]
+    )
+    return SkillReport(vacancies=vacancies, frequencies=frequencies, cooccurrence=cooccurrence)
@@ -0,0 +1,107 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .processing import EXPERIENCE_DTYPE
+
+COUNT_COLUMNS = ["schedule_name", "experience_name", "employment_name", "is_salary_set"]
+HISTOGRAM_BINS = 40
+WHISKER = 1.5
+QUANTILES = [0.25, 0.5, 0.75]
+
+
+@dataclass
+class Aggregates:
+    total: int
+    counts: dict
+    overall: pd.Series
+    salary: pd.DataFrame
+    histogram: pd.DataFrame
+    overall_histogram: pd.DataFrame
+    bin_width: float
+
+
+def category_counts(values) -> pd.Series:
+    categorical = pd.Categorical(values)
+    counts = np.bincount(categorical.codes[categorical.codes >= 0], minlength=len(categorical.categories))
+    return pd.Series(counts, index=categorical.categories.astype(object)).loc[lambda s: s > 0]
+
+
+def segment_stats(salary: np.ndarray) -> dict:
+    # salary уже отсортирована: квантили и усы считаются по срезу без копий.
+    q1, median, q3 = np.quantile(salary, QUANTILES)
+    iqr = q3 - q1
+    inside = salary[
+        np.searchsorted(salary, q1 - WHISKER * iqr, "left") : np.searchsorted(salary, q3 + WHISKER * iqr, "right")
+    ]
+    return {
+        "count": len(salary),
+        "mean": salary.mean(),
+        "min": salary[0],
+        "q1": q1,
+        "median": median,
+        "q3": q3,
+        "max": salary[-1],
+        # Как в plotly: усы доходят до крайних точек внутри 1.5 IQR.
+        "lowerfence": inside[0],
+        "upperfence": inside[-1],
+        "outliers": len(salary) - len(inside),
+    }
+
+
+def aggregate(df: pd.DataFrame, bins: int = HISTOGRAM_BINS) -> Aggregates:
+    counts = {column: category_counts(df[column]) for column in COUNT_COLUMNS if column in df.columns}
+
+    # Одна сортировка по (уровень опыта, зарплата): каждая группа становится
+    # непрерывным отсортированным срезом, из которого берутся все статистики.
+    salary = df["salary"].to_numpy(dtype=np.float64)
+    experience = pd.Categorical(df["experience_name"], dtype=EXPERIENCE_DTYPE)
+    levels = list(EXPERIENCE_DTYPE.categories)
+    paid = salary > 0
+    codes = np.where(experience.codes < 0, len(levels), experience.codes)[paid]
+    salary = salary[paid]
+    order = np.lexsort((salary, codes))
+    salary, codes = salary[order], codes[order]
+    bounds = np.searchsorted(codes, np.arange(len(levels) + 2))
+
+    overall = pd.Series(segment_stats(np.sort(salary)) if len(salary) else {"count": 0}, dtype=np.float64)
+    rows, index = [], []
+    for code, level in enumerate(levels):
+        segment = salary[bounds[code] : bounds[code + 1]]
+        if len(segment):
+            rows.append(segment_stats(segment))
+            index.append(level)
+    salary_stats = pd.DataFrame(rows, index=pd.Index(index, name="experience_name"))
+
+    # Гистограмма по общим корзинам: один bincount по паре (уровень, корзина).
+    if len(salary):
+        edges = np.histogram_bin_edges(salary, bins=bins)
+        positions = np.clip(np.searchsorted(edges, salary, "right") - 1, 0, bins - 1)
+        table = np.bincount(codes * bins + positions, minlength=(len(levels) + 1) * bins)
+        table = table.reshape(len(levels) + 1, bins)
+        centers = (edges[:-1] + edges[1:]) / 2
+        bin_width = edges[1] - edges[0]
+    else:
+        table = np.zeros((len(levels) + 1, bins), dtype=np.int64)
+        centers = np.zeros(bins)
+        bin_width = 0.0
+
+    # Вакансии без уровня опыта попадают только в общую гистограмму.
+    histogram = pd.DataFrame(
+        {
+            "experience_name": np.repeat(levels, bins),
+            "salary": np.tile(centers, len(levels)),
+            "count": table[: len(levels)].reshape(-1),
+        }
+    )
+    overall_histogram = pd.DataFrame({"salary": centers, "count": table.sum(axis=0)})
+    return Aggregates(
+        total=len(df),
+        counts=counts,
+        overall=overall,
+        salary=salary_stats,
+        histogram=histogram[histogram["count"] > 0].reset_index(drop=True),
+        overall_histogram=overall_histogram[overall_histogram["count"] > 0].reset_index(drop=True),
+        bin_width=bin_width,
+    )
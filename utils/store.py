@@ -0,0 +1,200 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from .cache import CACHE_DIR, dumps, loads
+
+STORE_PATH = os.environ.get("HH_STORE_PATH", os.path.join(CACHE_DIR, "vacancies.sqlite"))
+PUBLISHED_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
+
+
+def utc_published(value: str) -> str:
+    # hh.ru отдает published_at со смещением (+0300); в базе хранится UTC,
+    # чтобы строки сравнивались и сортировались как даты.
+    try:
+        published = datetime.strptime(value, PUBLISHED_FORMAT)
+    except (TypeError, ValueError):
+        return None
+    if published.utcoffset() is not None:
+        published = published - published.utcoffset()
+    return published.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+class VacancyStore:
+    # Локальная копия выдачи: вакансия хранится один раз по id, а запросы
+    # ссылаются на нее через query_vacancies. Открыта вакансия или закрыта,
+    # решается отдельно для каждого запроса: сверка одного запроса не трогает
+    # выдачу другого. Для каждого запроса помнится самая свежая дата
+    # публикации (high-water mark) и время последней сверки.
+    def __init__(self, path: str = STORE_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS vacancies (
+                id TEXT PRIMARY KEY,
+                published_at TEXT,
+                data BLOB NOT NULL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS vacancies_published ON vacancies (published_at);
+            CREATE TABLE IF NOT EXISTS query_vacancies (
+                query TEXT NOT NULL,
+                id TEXT NOT NULL,
+                last_seen REAL,
+                closed_at REAL,
+                PRIMARY KEY (query, id)
+            );
+            CREATE TABLE IF NOT EXISTS watermarks (
+                query TEXT PRIMARY KEY,
+                published_at TEXT,
+                synced_at REAL,
+                reconciled_at REAL
+            );"""
+        )
+        # Базы прежней схемы: статус вакансии переезжает в query_vacancies.
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(query_vacancies)")}
+        for column in ("last_seen", "closed_at"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE query_vacancies ADD COLUMN {column} REAL")
+        self._conn.commit()
+
+    def merge(self, query: str, items: list[dict], seen_at: float = None) -> int:
+        # Возвращает число вакансий, новых для этого запроса. Повторно
+        # найденная вакансия обновляется и снова считается открытой в запросе.
+        seen_at = seen_at or time.time()
+        rows = [
+            (str(item["id"]), utc_published(item.get("published_at")), dumps(item), seen_at, seen_at)
+            for item in items
+            if item.get("id") is not None
+        ]
+        with self._lock:
+            self._conn.executemany(
+                """INSERT INTO vacancies (id, published_at, data, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    published_at = excluded.published_at,
+                    data = excluded.data,
+                    last_seen = excluded.last_seen""",
+                rows,
+            )
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO query_vacancies (query, id) VALUES (?, ?)",
+                [(query, row[0]) for row in rows],
+            )
+            new = cursor.rowcount
+            self._conn.executemany(
+                "UPDATE query_vacancies SET last_seen = ?, closed_at = NULL WHERE query = ? AND id = ?",
+                [(seen_at, query, row[0]) for row in rows],
+            )
+            self._conn.commit()
+        return new
+
+    def watermark(self, query: str) -> tuple[datetime, float, float]:
+        # (последняя дата публикации по местному времени, время синхронизации, время сверки)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT published_at, synced_at, reconciled_at FROM watermarks WHERE query = ?", (query,)
+            ).fetchone()
+        if row is None:
+            return None, None, None
+        published_at, synced_at, reconciled_at = row
+        if published_at:
+            published_at = datetime.strptime(published_at, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+            published_at = published_at.astimezone().replace(tzinfo=None)
+        return published_at, synced_at, reconciled_at
+
+    def advance(self, query: str, synced_at: float = None, reconciled: bool = False):
+        # Отметка берется из самих вакансий запроса, а не из часов клиента.
+        synced_at = synced_at or time.time()
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO watermarks (query, published_at, synced_at, reconciled_at)
+                VALUES (
+                    ?,
+                    (SELECT MAX(v.published_at) FROM vacancies v
+                     JOIN query_vacancies q ON q.id = v.id WHERE q.query = ?),
+                    ?, ?
+                )
+                ON CONFLICT (query) DO UPDATE SET
+                    published_at = excluded.published_at,
+                    synced_at = excluded.synced_at,
+                    reconciled_at = COALESCE(excluded.reconciled_at, watermarks.reconciled_at)""",
+                (query, query, synced_at, synced_at if reconciled else None),
+            )
+            self._conn.commit()
+
+    def close_missing(self, query: str, seen_ids, closed_at: float = None) -> int:
+        # Сверка: открытые вакансии запроса, которых не было в полной выдаче, закрыты.
+        closed_at = closed_at or time.time()
+        seen_ids = {str(key) for key in seen_ids}
+        with self._lock:
+            open_ids = [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT id FROM query_vacancies WHERE query = ? AND closed_at IS NULL", (query,)
+                )
+            ]
+            missing = [(closed_at, query, key) for key in open_ids if key not in seen_ids]
+            self._conn.executemany(
+                "UPDATE query_vacancies SET closed_at = ? WHERE query = ? AND id = ?", missing
+            )
+            self._conn.commit()
+        return len(missing)
+
+    def close_expired(self, query: str, period: timedelta, closed_at: float = None) -> int:
+        # Без поднятия вакансия уходит из поиска через срок публикации:
+        # такие закрываются без обращений к API.
+        closed_at = closed_at or time.time()
+        published_before = datetime.fromtimestamp(closed_at, timezone.utc).replace(tzinfo=None) - period
+        with self._lock:
+            cursor = self._conn.execute(
+                """UPDATE query_vacancies SET closed_at = ?
+                WHERE query = ? AND closed_at IS NULL
+                AND id IN (SELECT id FROM vacancies WHERE published_at < ?)""",
+                (closed_at, query, published_before.strftime("%Y-%m-%dT%H:%M:%S")),
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def items(self, query: str, include_closed: bool = False) -> list[dict]:
+        condition = "" if include_closed else "AND q.closed_at IS NULL"
+        with self._lock:
+            rows = self._conn.execute(
+                f"""SELECT v.data FROM vacancies v JOIN query_vacancies q ON q.id = v.id
+                WHERE q.query = ? {condition} ORDER BY v.published_at DESC""",
+                (query,),
+            ).fetchall()
+        return [loads(row[0]) for row in rows]
+
+    def stats(self) -> dict:
+        # Открытой считается вакансия, открытая хотя бы в одном запросе.
+        with self._lock:
+            total = self._conn.execute("SELECT COUNT(*) FROM vacancies").fetchone()[0]
+            opened = self._conn.execute(
+                "SELECT COUNT(DISTINCT id) FROM query_vacancies WHERE closed_at IS NULL"
+            ).fetchone()[0]
+            queries = self._conn.execute("SELECT COUNT(*) FROM watermarks").fetchone()[0]
+        return {"vacancies": total, "open": opened, "closed": total - opened, "queries": queries}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+def get_vacancy_store() -> VacancyStore:
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = VacancyStore()
+        return _shared_store
@@ -0,0 +1,47 @@
+import hashlib
+import re
+
+import numpy as np
+
+STUB_DIM = 64
+
+
+def token_index(token: str, dim: int = STUB_DIM) -> int:
+    return int.from_bytes(hashlib.md5(token.encode("utf-8")).digest()[:4], "little") % dim
+
+
+class StubEncoder:
+    # Детерминированный "bag of words" вместо jina: похожие тексты получают
+    # похожие векторы, чего достаточно для проверки кластеризации.
+    def __init__(self, dim: int = STUB_DIM):
+        self.dim = dim
+
+    def encode(self, texts: list[str], task: str = None, **kwargs) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                vectors[row, token_index(token, self.dim)] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class StubTokenizer:
+    def __call__(self, text: str, **kwargs) -> dict:
+        return {"input_ids": list(range(len(text.split())))}
+
+
+class StubGenerator:
+    # Вместо генерации возвращает исходное предложение из промпта с заглавной буквы.
+    tokenizer = StubTokenizer()
+
+    def __init__(self, marker: str = "Paraphrased:"):
+        self.marker = marker
+
+    def __call__(self, prompts, **kwargs):
+        if isinstance(prompts, str):
+            prompts = [prompts]
+        outputs = []
+        for prompt in prompts:
+            body = prompt.split(self.marker)[0].strip().splitlines()[-1].strip()
+            outputs.append([{"generated_text": body[:1].upper() + body[1:]}])
+        return outputs
@@ -1,23 +1,126 @@
+import hashlib
+import os
 import re
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
-from transformers import AutoModel, pipeline
-from langchain.llms import HuggingFacePipeline
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
+
+from .cache import CACHE_DIR, EmbeddingCache, SQLiteStore, dumps, loads
+from .clustering import cluster_embeddings, representative_indices, reservoir_sample
+from .inference import InferenceConfig, encode_texts, inference_mode, load_encoder, load_generator
+from .metrics import get_registry
+
+EMBEDDING_MODEL_PATH = os.environ.get("EMBEDDING_MODEL_PATH", "/app/models/jina-embeddings-v3")
+LLM_PATH = os.environ.get("LLM_PATH", "/app/models/Vikhr-Llama-3.2-1B-Instruct")
+EMBEDDING_TASK = "text-matching"
+EMBEDDING_CACHE = os.environ.get("EMBEDDING_CACHE", "1") == "1"
+BATCH_SIZE = 64
+STUB_MODELS = os.environ.get("HH_STUB_MODELS", "0") == "1"
+# Бэкенд энкодера, обрезка, батчи, потоки и тип весов LLM - из переменных HH_* в utils.inference.
+INFERENCE = InferenceConfig()
+
+PARAPHRASE_BATCH_SIZE = 8
+PARAPHRASE_MAX_NEW_TOKENS = 64
+PARAPHRASE_CACHE = os.environ.get("PARAPHRASE_CACHE", "1") == "1"
+PARAPHRASE_CACHE_TTL = 30 * 24 * 60 * 60
+PARAPHRASE_PROMPT = """Rewrite the following sentence with the same meaning but different wording:
+        
+        {text}
+        
+        Paraphrased:"""
+
+_models_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _load_embedding_model():
+    if STUB_MODELS:
+        from .stub_models import StubEncoder
+
+        return StubEncoder()
+
+    return load_encoder(EMBEDDING_MODEL_PATH, INFERENCE)
+
+
+@lru_cache(maxsize=None)
+def _load_pipe():
+    if STUB_MODELS:
+        from .stub_models import StubGenerator
+
+        return StubGenerator()
+
+    pipe = load_generator(
+        LLM_PATH,
+        INFERENCE,
+        max_new_tokens=1024,
+        temperature=0.3,
+        repetition_penalty=1.1,
+    )
+    # Для батчей у decoder-only модели нужен паддинг слева.
+    if pipe.tokenizer.pad_token is None:
+        pipe.tokenizer.pad_token = pipe.tokenizer.eos_token
+    pipe.tokenizer.padding_side = "left"
+    return pipe
+
+
+@lru_cache(maxsize=None)
+def _load_llm():
+    from langchain.llms import HuggingFacePipeline
+
+    return HuggingFacePipeline(pipeline=_load_pipe())
+
+
+# Модели загружаются при первом обращении и живут одну на процесс;
+# блокировка не дает двум сессиям Streamlit грузить веса параллельно.
+def get_embedding_model():
+    with _models_lock:
+        return _load_embedding_model()
+
+
+def get_pipe():
+    with _models_lock:
+        return _load_pipe()
+
+
+def get_llm():
+    with _models_lock:
+        return _load_llm()
+
+
+@lru_cache(maxsize=None)
+def get_embedding_cache(task: str = EMBEDDING_TASK) -> EmbeddingCache:
+    model_id = os.path.basename(EMBEDDING_MODEL_PATH.rstrip("/")) + INFERENCE.encoder_suffix
+    path = os.path.join(CACHE_DIR, "embeddings", f"{model_id}-{task}")
+    return EmbeddingCache(path, model_id=model_id, task=task)
+
+
+@lru_cache(maxsize=None)
+def get_paraphrase_cache() -> SQLiteStore:
+    return SQLiteStore(os.path.join(CACHE_DIR, "paraphrases.sqlite"))
+
+
+def warm_up(background: bool = True) -> threading.Thread:
+    def load():
+        get_embedding_model()
+        get_pipe()
+
+    if not background:
+        load()
+        return None
+    thread = threading.Thread(target=load, name="models-warm-up", daemon=True)
+    thread.start()
+    return thread
 
 
-embedding_model = AutoModel.from_pretrained(
-    "/app/models/jina-embeddings-v3", trust_remote_code=True
-)
-pipe = pipeline(
-    "text-generation",
-    model="/app/models/Vikhr-Llama-3.2-1B-Instruct",
-    max_new_tokens=1024,
-    temperature=0.3,
-    repetition_penalty=1.1,
-)
-llm = HuggingFacePipeline(pipeline=pipe)
+def __getattr__(name: str):
+    loaders = {"embedding_model": get_embedding_model, "pipe": get_pipe, "llm": get_llm}
+    if name in loaders:
+        return loaders[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def clean_text(text: str) -> str:
@@ -30,6 +133,9 @@ def clean_text(text: str) -> str:
 
 
 def process_output(text: str) -> str:
+    text = text.strip()
+    if not text:
+        return text
     if text[-1] == ",":
         text = text[:-1]
     if len(text.split(" ")[-1]) < 3:
@@ -37,51 +143,223 @@ def process_output(text: str) -> str:
     return text
 
 
-def generate_embeddings(texts: list[str]) -> np.ndarray:
-    return embedding_model.encode(texts, task="text-matching")
+def encode_batched(texts: list[str], task: str = EMBEDDING_TASK, batch_size: int = BATCH_SIZE) -> np.ndarray:
+    # Батчи собираются по корзинам длины, см. utils.inference.length_buckets.
+    return encode_texts(get_embedding_model(), texts, task, INFERENCE, batch_size).astype(np.float16)
+
+
+def generate_embeddings(
+    texts: list[str], task: str = EMBEDDING_TASK, cache: EmbeddingCache = None
+) -> np.ndarray:
+    with get_registry().span("embeddings", sentences=len(texts)):
+        return _generate_embeddings(texts, task, cache)
+
+
+def _generate_embeddings(texts: list[str], task: str, cache: EmbeddingCache) -> np.ndarray:
+    if cache is None and EMBEDDING_CACHE:
+        cache = get_embedding_cache(task)
+
+    # Одинаковые сниппеты кодируются один раз и затем разворачиваются обратно.
+    positions = {}
+    inverse = np.array([positions.setdefault(text, len(positions)) for text in texts], dtype=np.int64)
+    unique = list(positions)
+    if not unique:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    if cache is None:
+        vectors, missing = None, list(range(len(unique)))
+    else:
+        vectors, missing = cache.lookup(unique)
+
+    metrics = get_registry()
+    metrics.inc("embedding_cache_total", len(unique) - len(missing), result="hit")
+    metrics.inc("embedding_cache_total", len(missing), result="miss")
+    if missing:
+        metrics.inc("sentences_encoded_total", len(missing))
+        encoded = encode_batched([unique[idx] for idx in missing], task=task)
+        if cache is not None:
+            cache.add([unique[idx] for idx in missing], encoded)
+        if vectors is None:
+            vectors = np.zeros((len(unique), encoded.shape[1]), dtype=np.float16)
+        vectors[missing] = encoded
+
+    # Через float16 проходят и попадания, и промахи, чтобы результат не зависел от кэша.
+    return vectors.astype(np.float32)[inverse]
+
+
+def select_representatives(
+    sentences: list[str], embeddings: np.ndarray, n_clusters: int = 5
+) -> list[str]:
+    if len(sentences) == 0:
+        return []
+    with get_registry().span("kmeans", sentences=len(sentences)):
+        labels, centers = cluster_embeddings(embeddings, n_clusters)
+    return [str(sentences[idx]) for idx in representative_indices(embeddings, labels, centers)]
 
 
 def clusterize(data: pd.Series, sample_size: int = None, n_clusters: int = 5):
     sentences = data.dropna().astype(str).apply(clean_text).to_list()
 
     if sample_size is not None:
-        sentences = np.random.choice(sentences, sample_size).tolist()
+        sentences = reservoir_sample(sentences, sample_size)
+
+    embeddings = generate_embeddings(sentences)
+    return select_representatives(sentences, embeddings, n_clusters)
+
+
+def clusterize_groups(
+    df: pd.DataFrame,
+    group_column: str,
+    text_column: str,
+    sample_size: int = None,
+    n_clusters: int = 5,
+) -> dict:
+    rows = df[[group_column, text_column]].dropna()
+    # Стабильная сортировка по группе делает каждую группу непрерывным
+    # срезом общей матрицы эмбеддингов, то есть view без копирования.
+    codes, groups = pd.factorize(rows[group_column], sort=False)
+    order = np.argsort(codes, kind="stable")
+    sentences = rows[text_column].astype(str).map(clean_text).to_numpy()[order].tolist()
+    codes = codes[order]
 
     embeddings = generate_embeddings(sentences)
 
-    from sklearn.cluster import KMeans
+    result = {}
+    bounds = np.searchsorted(codes, np.arange(len(groups) + 1))
+    for code, group in enumerate(groups):
+        start, end = bounds[code], bounds[code + 1]
+        group_sentences = sentences[start:end]
+        group_embeddings = embeddings[start:end]
+        if sample_size is not None:
+            sample = np.sort(reservoir_sample(range(end - start), sample_size))
+            group_sentences = [group_sentences[idx] for idx in sample]
+            group_embeddings = group_embeddings[sample]
+        result[group] = select_representatives(group_sentences, group_embeddings, n_clusters)
+    return result
+
+
+@dataclass
+class ParaphraseStats:
+    sentences: int = 0
+    cached: int = 0
+    generated_tokens: int = 0
+    seconds: float = 0.0
+
+    @property
+    def latency_per_summary(self) -> float:
+        generated = self.sentences - self.cached
+        return self.seconds / generated if generated else 0.0
 
-    kmeans = KMeans(n_clusters=n_clusters, random_state=0)
-    kmeans.fit(embeddings)
-    clusters = kmeans.labels_
+    @property
+    def tokens_per_second(self) -> float:
+        return self.generated_tokens / self.seconds if self.seconds else 0.0
 
-    cluster_centers = kmeans.cluster_centers_
-    summarized_sentences = []
-    for i in range(n_clusters):
-        cluster_points = np.where(clusters == i)[0]
-        cluster_embeddings = embeddings[cluster_points]
-        center_embedding = cluster_centers[i]
-        distances = np.linalg.norm(cluster_embeddings - center_embedding, axis=1)
-        representative_index = cluster_points[np.argmin(distances)]
-        summarized_sentences.append(str(sentences[representative_index]))
 
-    return summarized_sentences
+def paraphrase_key(text: str, max_new_tokens: int = PARAPHRASE_MAX_NEW_TOKENS) -> str:
+    model_id = "stub" if STUB_MODELS else os.path.basename(LLM_PATH.rstrip("/")) + INFERENCE.llm_suffix
+    payload = f"{model_id}\0{PARAPHRASE_PROMPT}\0{max_new_tokens}\0{text}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def count_tokens(pipe, text: str) -> int:
+    tokenizer = getattr(pipe, "tokenizer", None)
+    if tokenizer is None:
+        return len(text.split())
+    return len(tokenizer(text)["input_ids"])
+
+
+def paraphrase_batch(
+    texts: list[str],
+    batch_size: int = PARAPHRASE_BATCH_SIZE,
+    max_new_tokens: int = PARAPHRASE_MAX_NEW_TOKENS,
+    stats: ParaphraseStats = None,
+) -> list[str]:
+    if stats is None:
+        stats = ParaphraseStats()
+    cache = get_paraphrase_cache() if PARAPHRASE_CACHE else None
+
+    unique = list(dict.fromkeys(texts))
+    results = {}
+    for text in unique:
+        row = cache.get(paraphrase_key(text, max_new_tokens)) if cache is not None else None
+        if row is not None and row[1] > time.time():
+            results[text] = loads(row[0])
+    stats.sentences += len(unique)
+    stats.cached += len(results)
+    metrics = get_registry()
+    metrics.inc("paraphrase_cache_total", len(results), result="hit")
+    metrics.inc("paraphrase_cache_total", len(unique) - len(results), result="miss")
+
+    missing = [text for text in unique if text not in results]
+    if missing:
+        pipe = get_pipe()
+        started = time.perf_counter()
+        with metrics.span("paraphrase", sentences=len(missing)), inference_mode():
+            outputs = pipe(
+                [PARAPHRASE_PROMPT.format(text=text) for text in missing],
+                batch_size=batch_size,
+                max_new_tokens=max_new_tokens,
+                return_full_text=False,
+            )
+        stats.seconds += time.perf_counter() - started
+        for text, output in zip(missing, outputs):
+            generated = output[0]["generated_text"]
+            tokens = count_tokens(pipe, generated)
+            stats.generated_tokens += tokens
+            metrics.inc("generated_tokens_total", tokens)
+            results[text] = process_output(generated)
+            if cache is not None:
+                cache.put(paraphrase_key(text, max_new_tokens), dumps(results[text]), PARAPHRASE_CACHE_TTL)
+
+    return [results[text] for text in texts]
 
 
 def paraphrase(text: str) -> str:
-    prompt = PromptTemplate.from_template(
-        """Rewrite the following sentence with the same meaning but different wording:
-        
-        {text}
-        
-        Paraphrased:"""
-    )
-    chain = LLMChain(llm=llm, prompt=prompt)
-    result = chain.invoke({"text": text})
-    return process_output(result["text"])
+    return paraphrase_batch([text])[0]
 
 
 def summarize(data: pd.Series, sample_size: int = None, n_clusters: int = 5):
     summarized_sentences = clusterize(data, sample_size, n_clusters)
-    summary = [paraphrase(sentence) for sentence in summarized_sentences]
-    return summary
+    return paraphrase_batch(summarized_sentences)
+
+
+def summarize_groups(
+    df: pd.DataFrame,
+    group_column: str,
+    text_columns: list[str],
+    sample_size: int = None,
+    n_clusters: int = 5,
+    stats: ParaphraseStats = None,
+    progress=None,
+) -> dict:
+    group_names = df[group_column].dropna().unique()
+    clusters = {}
+    for done, text_column in enumerate(text_columns, 1):
+        clusters[text_column] = clusterize_groups(df, group_column, text_column, sample_size, n_clusters)
+        if progress is not None:
+            progress("clusterize", done, len(text_columns), None)
+
+    def assemble(paraphrased: dict) -> dict:
+        # Пока перефразирование не закончено, на месте выжимки стоит исходный представитель.
+        return {
+            text_column: {
+                group: [paraphrased.get(sentence, sentence) for sentence in clusters[text_column].get(group, [])]
+                for group in group_names
+            }
+            for text_column in text_columns
+        }
+
+    # Все представители со всех групп и колонок уходят в LLM одним батчем.
+    # Если нужен прогресс, батч режется на куски по размеру батча модели,
+    # так что пропускная способность не меняется.
+    representatives = [
+        sentence for groups in clusters.values() for sentences in groups.values() for sentence in sentences
+    ]
+    step = PARAPHRASE_BATCH_SIZE if progress is not None else max(len(representatives), 1)
+    paraphrased = {}
+    for start in range(0, len(representatives), step):
+        chunk = representatives[start : start + step]
+        paraphrased.update(zip(chunk, paraphrase_batch(chunk, stats=stats)))
+        if progress is not None:
+            progress("paraphrase", start + len(chunk), len(representatives), assemble(paraphrased))
+    return assemble(paraphrased)